@@ -1,17 +1,61 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
+import errno
 import json
+import socket
+import threading
+import time
+import zlib
 from . import (
-    urllib_request,
     urlencode,
-    HTTPError,
-    URLError,
     USER_AGENT,)
 from .exc import (
-    APIError,)
+    APIError,
+    TransportError,)
+from .transport import UrllibTransport
+
+try:
+    import http.client as http_client
+
+except ImportError:
+    import httplib as http_client
+
+try:
+    import ssl
+
+except ImportError:
+    ssl = None
 
 API_BASE_URL = 'api.datasift.com/'
 
+# The number of bytes to read from a response at a time.
+READ_SIZE = 16384
+
+# The timeout in seconds for API calls, and for particular endpoints that
+# are much quicker or slower than most.
+DEFAULT_TIMEOUT = 10
+ENDPOINT_TIMEOUTS = {
+    'validate': 5,
+    'dpu': 5,
+    'usage': 5,
+    'historics/get': 5,
+    'push/get': 5,
+    'push/validate': 5,
+    'historics/prepare': 30,
+    'push/log': 20,
+}
+
+
+# The transport used by the default client.
+_urllib_transport = UrllibTransport()
+
+
+def get_timeout(endpoint):
+    """
+    Get the default timeout for calls to an endpoint.
+    """
+    return ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+
 
 #-----------------------------------------------------------------------------
 # The ApiClient class.
@@ -22,32 +66,184 @@ class ApiClient(object):
     """
 
     @staticmethod
-    def call(username, api_key, endpoint, params={}, user_agent=USER_AGENT):
+    def call(username, api_key, endpoint, params={}, user_agent=USER_AGENT,
+             timeout=None):
+        """
+        Make a call to a DataSift API endpoint. The timeout defaults to the
+        one for the endpoint.
+        """
+        return ApiClient._call(_urllib_transport, 'http://' + API_BASE_URL,
+                               username, api_key, endpoint, params, user_agent,
+                               timeout)
+
+    @staticmethod
+    def call_stream(username, api_key, endpoint, params={},
+                    user_agent=USER_AGENT, timeout=None):
+        """
+        Make a call to a DataSift API endpoint without reading the response
+        body. Returns the same dict as call, but with a 'body' iterator over
+        the decoded body in chunks in place of 'data'. The body must be read
+        to the end or closed.
+        """
+        return ApiClient._call_stream(_urllib_transport, 'http://' + API_BASE_URL,
+                                      username, api_key, endpoint, params,
+                                      user_agent, timeout)
+
+    @staticmethod
+    def _call(transport, base_url, username, api_key, endpoint, params,
+              user_agent, timeout):
+        """
+        Make a call to an endpoint through a Transport.
+        """
+        timings = {}
+        resp = ApiClient._send(transport, base_url, username, api_key, endpoint,
+                               params, user_agent, timeout, timings)
+        try:
+            content, wire_bytes = ApiClient._read_body(resp, resp.headers)
+
+        except (http_client.HTTPException, socket.error) as err:
+            raise APIError('Request failed: %s' % err, 503)
+
+        finally:
+            resp.close()
+
+        return ApiClient._build_response(resp.status, content, resp.headers,
+                                         wire_bytes, timings)
+
+    @staticmethod
+    def _call_stream(transport, base_url, username, api_key, endpoint, params,
+                     user_agent, timeout):
+        """
+        Make a call to an endpoint through a Transport without reading the
+        response body.
+        """
+        timings = {}
+        resp = ApiClient._send(transport, base_url, username, api_key, endpoint,
+                               params, user_agent, timeout, timings)
+
+        def iter_body():
+            try:
+                for chunk in ApiClient._iter_body(resp, resp.headers):
+                    yield chunk
+
+            except (http_client.HTTPException, socket.error) as err:
+                raise APIError('Request failed: %s' % err, 503)
+
+            finally:
+                resp.close()
+
+        return ApiClient._build_stream_response(resp.status, iter_body(),
+                                                resp.headers, timings)
+
+    @staticmethod
+    def _send(transport, base_url, username, api_key, endpoint, params,
+              user_agent, timeout, timings):
         """
-        Make a call to a DataSift API endpoint.
+        Send a request to an endpoint and return the TransportResponse once
+        its headers have arrived. The size of the request and the time taken
+        to connect and to the first byte of the response are put in the
+        timings dict.
         """
-        url = 'http://%s%s.json' % (API_BASE_URL, endpoint)
+        if timeout is None:
+            timeout = get_timeout(endpoint)
+
+        url = '%s%s.json' % (base_url, endpoint)
         headers = {
             'Auth': '%s:%s' % (username, api_key),
             'User-Agent': user_agent,
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Accept-Encoding': 'gzip',
         }
         # http://dev.datasift.com/docs/rest-api/things-every-developer-should-know#Formatting%20Parameters
         # "Parameters need to be formatted in UTF-8."
-        req = urllib_request.Request(url,
-                                     urlencode(params).encode('utf-8'),
-                                     headers)
+        body = urlencode(params).encode('utf-8')
+        timings['request_bytes'] = len(body)
+        start = time.time()
 
         try:
-            resp = urllib_request.urlopen(req, None, 10)
-
-        except HTTPError as err:
-            resp = err
+            resp = transport.request('POST', url, body, headers, timeout)
 
-        except URLError as err:
+        except TransportError as err:
             raise APIError('Request failed: %s' % err, 503)
 
+        timings['connect_time'] = resp.connect_time
+        timings['first_byte_time'] = time.time() - start
+        return resp
+
+    @staticmethod
+    def _read_body(resp, headers):
+        """
+        Read a response body, decompressing it as it arrives if it is
+        gzipped. Returns the decoded body and the number of bytes that came
+        over the wire.
+        """
+        counter = [0]
+        content = b''.join(ApiClient._iter_body(resp, headers, counter))
+        return content, counter[0]
+
+    @staticmethod
+    def _iter_body(resp, headers, counter=None):
+        """
+        Read a response body in chunks, decompressing them as they arrive if
+        it is gzipped, and yield the decoded chunks. The number of bytes that
+        came over the wire is added to counter[0] if a counter is given.
+        """
+        decompressor = None
+        if 'gzip' in (headers.get('content-encoding') or '').lower():
+            # Expect a gzip header rather than a bare deflate stream
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        try:
+            while True:
+                chunk = resp.read(READ_SIZE)
+                if not chunk:
+                    break
+
+                if counter is not None:
+                    counter[0] += len(chunk)
+
+                if decompressor is not None:
+                    chunk = decompressor.decompress(chunk)
+
+                yield chunk
+
+            if decompressor is not None:
+                yield decompressor.flush()
+
+        except zlib.error as err:
+            raise APIError('Failed to decompress the response: %s' % err, 503)
+
+    @staticmethod
+    def _build_stream_response(response_code, body, headers, timings=None):
+        """
+        Put a response body iterator together with the details of the
+        response in the dict returned by call_stream.
+        """
+        retval = {
+            'response_code': response_code,
+            'body': body,
+            'rate_limit': headers.get('x-ratelimit-limit'),
+            'rate_limit_remaining': headers.get('x-ratelimit-remaining'),
+            'retry_after': headers.get('retry-after')}
+
+        if timings is not None:
+            retval.update(timings)
+
+        return retval
+
+    @staticmethod
+    def _build_response(response_code, content, headers, wire_bytes=None,
+                        timings=None):
+        """
+        Decode a response body and put it together with the details of the
+        response in the dict returned by call. The wire_bytes is the size of
+        the body as received, if it was compressed, and the timings dict
+        holds the request size and timings measured by the client.
+        """
+        if wire_bytes is None:
+            wire_bytes = len(content)
+
         # Handle a response with no data
-        content = resp.read()
         if len(content) == 0:
             data = json.loads('{}')
 
@@ -55,12 +251,396 @@ class ApiClient(object):
             data = json.loads(content.decode('utf-8'))
 
             if not data:
-                raise APIError('Failed to decode the response', resp.getcode())
+                raise APIError('Failed to decode the response', response_code)
 
         retval = {
-            'response_code': resp.getcode(),
+            'response_code': response_code,
             'data': data,
-            'rate_limit': resp.headers.get('x-ratelimit-limit'),
-            'rate_limit_remaining': resp.headers.get('x-ratelimit-remaining')}
+            'rate_limit': headers.get('x-ratelimit-limit'),
+            'rate_limit_remaining': headers.get('x-ratelimit-remaining'),
+            'retry_after': headers.get('retry-after'),
+            'wire_bytes': wire_bytes,
+            'decoded_bytes': len(content)}
+
+        if timings is not None:
+            retval.update(timings)
 
         return retval
+
+
+#-----------------------------------------------------------------------------
+# The TransportApiClient class.
+#-----------------------------------------------------------------------------
+class TransportApiClient(ApiClient):
+    """
+    An API client that makes its requests through the given Transport, such
+    as an HttpClientTransport or, for tests and benchmarks, a
+    MemoryTransport. Select it with User.set_api_client.
+    """
+
+    def __init__(self, transport, base_url=API_BASE_URL, use_ssl=True):
+        self._transport = transport
+        protocol = 'http'
+        if use_ssl:
+            protocol = 'https'
+
+        self._base_url = '%s://%s' % (protocol, base_url)
+
+    def get_transport(self):
+        """
+        Get the Transport used by this client.
+        """
+        return self._transport
+
+    def call(self, username, api_key, endpoint, params={}, user_agent=USER_AGENT,
+             timeout=None):
+        """
+        Make a call to a DataSift API endpoint. The timeout defaults to the
+        one for the endpoint.
+        """
+        return self._call(self._transport, self._base_url, username, api_key,
+                          endpoint, params, user_agent, timeout)
+
+    def call_stream(self, username, api_key, endpoint, params={},
+                    user_agent=USER_AGENT, timeout=None):
+        """
+        Make a call to a DataSift API endpoint without reading the response
+        body. See ApiClient.call_stream.
+        """
+        return self._call_stream(self._transport, self._base_url, username,
+                                 api_key, endpoint, params, user_agent, timeout)
+
+
+#-----------------------------------------------------------------------------
+# The ConnectionPool class.
+#-----------------------------------------------------------------------------
+class ConnectionPool(object):
+    """
+    A pool of keep-alive HTTP(S) connections to a single host. Up to size
+    idle connections are kept for reuse, and connections that have been idle
+    for longer than idle_timeout seconds are closed rather than reused. New
+    connections look the host up in the given DnsCache, if any.
+    """
+
+    def __init__(self, host, port=None, use_ssl=True, size=4,
+                 idle_timeout=30, timeout=10, ssl_context=None,
+                 dns_cache=None):
+        self._dns_cache = dns_cache
+        self._host = host
+        self._port = port
+        self._use_ssl = use_ssl
+        self._size = size
+        self._idle_timeout = idle_timeout
+        self._timeout = timeout
+        self._ssl_context = ssl_context
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Get a connection from the pool, opening a new one if there are no
+        usable idle connections. Returns a (connection, reused) tuple.
+        """
+        now = time.time()
+        stale = []
+        conn = None
+        with self._lock:
+            while self._idle:
+                idle_conn, last_used = self._idle.pop()
+                if now - last_used <= self._idle_timeout:
+                    conn = idle_conn
+                    break
+
+                stale.append(idle_conn)
+
+        for idle_conn in stale:
+            idle_conn.close()
+
+        if conn is not None:
+            return conn, True
+
+        return self._connect(), False
+
+    def put(self, conn):
+        """
+        Return a connection to the pool once its response has been read.
+        """
+        with self._lock:
+            if len(self._idle) < self._size:
+                self._idle.append((conn, time.time()))
+                return
+
+        conn.close()
+
+    def discard(self, conn):
+        """
+        Close a connection that can't be reused.
+        """
+        conn.close()
+
+    def close(self):
+        """
+        Close all idle connections.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+
+        for conn, last_used in idle:
+            conn.close()
+
+    def resolve(self):
+        """
+        Look the host up in the DnsCache ahead of the first connection.
+        Returns False if there is no DnsCache or the lookup failed.
+        """
+        if self._dns_cache is None:
+            return False
+
+        port = self._port
+        if port is None:
+            port = 443 if self._use_ssl else 80
+
+        try:
+            self._dns_cache.resolve(self._host, port)
+
+        except socket.error:
+            return False
+
+        return True
+
+    def prewarm(self, count=1):
+        """
+        Open connections ahead of time, including the TLS handshake, and
+        keep them idle in the pool until up to count are idle. Returns the
+        number of connections opened, stopping at the first that fails.
+        """
+        opened = 0
+        while self.get_idle_count() < min(count, self._size):
+            conn = self._connect()
+            try:
+                conn.connect()
+
+            except (http_client.HTTPException, socket.error):
+                conn.close()
+                break
+
+            self.put(conn)
+            opened += 1
+
+        return opened
+
+    def get_idle_count(self):
+        """
+        Get the number of idle connections in the pool.
+        """
+        with self._lock:
+            return len(self._idle)
+
+    def _connect(self):
+        conn = self._create()
+        if self._dns_cache is not None:
+            # http.client opens its socket with _create_connection, which
+            # Python 2 doesn't have, so there the cache is not used
+            conn._create_connection = self._dns_cache.create_connection
+
+        return conn
+
+    def _create(self):
+        if self._use_ssl:
+            if self._ssl_context is None and hasattr(ssl, 'create_default_context'):
+                self._ssl_context = ssl.create_default_context()
+
+            if self._ssl_context is None:
+                return http_client.HTTPSConnection(self._host, self._port,
+                                                   timeout=self._timeout)
+
+            return http_client.HTTPSConnection(self._host, self._port,
+                                               timeout=self._timeout,
+                                               context=self._ssl_context)
+
+        return http_client.HTTPConnection(self._host, self._port,
+                                          timeout=self._timeout)
+
+
+#-----------------------------------------------------------------------------
+# The PooledApiClient class.
+#-----------------------------------------------------------------------------
+class PooledApiClient(ApiClient):
+    """
+    An API client that keeps HTTPS connections to the API open and reuses
+    them, so calls after the first don't pay for a new TCP connection and TLS
+    handshake. Select it with User.set_api_client. Instances are safe to
+    share between threads.
+    """
+
+    def __init__(self, base_url=API_BASE_URL, use_ssl=True, pool_size=4,
+                 idle_timeout=30, timeout=10, ssl_context=None, dns_cache=None):
+        """
+        Initialise a PooledApiClient. The base_url has the same form as
+        API_BASE_URL and may include a port, for example 'localhost:8080/'.
+        New connections look the host up in the given DnsCache, if any.
+        """
+        netloc, path = (base_url.split('/', 1) + [''])[:2]
+        port = None
+        if ':' in netloc:
+            netloc, port = netloc.rsplit(':', 1)
+            port = int(port)
+
+        self._path = '/' + path
+        self._pool = ConnectionPool(netloc, port, use_ssl, pool_size,
+                                    idle_timeout, timeout, ssl_context,
+                                    dns_cache)
+
+    def get_pool(self):
+        """
+        Get the ConnectionPool used by this client.
+        """
+        return self._pool
+
+    def close(self):
+        """
+        Close the pooled connections.
+        """
+        self._pool.close()
+
+    def call(self, username, api_key, endpoint, params={}, user_agent=USER_AGENT,
+             timeout=None):
+        """
+        Make a call to a DataSift API endpoint. The timeout defaults to the
+        one for the endpoint.
+        """
+        timings = {}
+        conn, resp = self._send(username, api_key, endpoint, params, user_agent,
+                                timeout, timings)
+        try:
+            content, wire_bytes = self._read_body(resp, resp.msg)
+
+        except (http_client.HTTPException, socket.error) as err:
+            self._pool.discard(conn)
+            raise APIError('Request failed: %s' % err, 503)
+
+        except APIError:
+            self._pool.discard(conn)
+            raise
+
+        self._release(conn, resp)
+        return self._build_response(resp.status, content, resp.msg, wire_bytes,
+                                    timings)
+
+    def call_stream(self, username, api_key, endpoint, params={},
+                    user_agent=USER_AGENT, timeout=None):
+        """
+        Make a call to a DataSift API endpoint without reading the response
+        body. Returns the same dict as call, but with a 'body' iterator over
+        the decoded body in chunks in place of 'data'. The connection goes
+        back to the pool once the body has been read to the end, and is
+        closed if the iterator is closed before that.
+        """
+        timings = {}
+        conn, resp = self._send(username, api_key, endpoint, params, user_agent,
+                                timeout, timings)
+
+        def iter_body():
+            complete = False
+            try:
+                for chunk in self._iter_body(resp, resp.msg):
+                    yield chunk
+
+                complete = True
+
+            except (http_client.HTTPException, socket.error) as err:
+                raise APIError('Request failed: %s' % err, 503)
+
+            finally:
+                if complete:
+                    self._release(conn, resp)
+
+                else:
+                    self._pool.discard(conn)
+
+        return self._build_stream_response(resp.status, iter_body(), resp.msg,
+                                           timings)
+
+    def _send(self, username, api_key, endpoint, params, user_agent, timeout,
+              timings):
+        """
+        Send a request on a pooled connection and return the connection and
+        the response once its headers have arrived. The size of the request,
+        the time taken to open a new connection and the time to the first
+        byte of the response are put in the timings dict.
+        """
+        if timeout is None:
+            timeout = get_timeout(endpoint)
+
+        path = '%s%s.json' % (self._path, endpoint)
+        body = urlencode(params).encode('utf-8')
+        headers = {
+            'Auth': '%s:%s' % (username, api_key),
+            'User-Agent': user_agent,
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Accept-Encoding': 'gzip',
+        }
+
+        retried = False
+        while True:
+            conn, reused = self._pool.get()
+            timings['request_bytes'] = len(body)
+            timings['connect_time'] = None
+            start = time.time()
+            sent = False
+            try:
+                self._set_timeout(conn, timeout)
+                if conn.sock is None:
+                    conn.connect()
+                    timings['connect_time'] = time.time() - start
+
+                conn.request('POST', path, body, headers)
+                sent = True
+                resp = conn.getresponse()
+                timings['first_byte_time'] = time.time() - start
+                return conn, resp
+
+            except (http_client.HTTPException, socket.error) as err:
+                self._pool.discard(conn)
+                if reused and not retried and self._is_stale(err, sent):
+                    # The server closed the idle connection without
+                    # answering, so the request can go on a new one
+                    retried = True
+                    continue
+
+                raise APIError('Request failed: %s' % err, 503)
+
+    @staticmethod
+    def _is_stale(err, sent):
+        """
+        Returns True if an error shows that the server had closed a pooled
+        connection before any of the response arrived. Anything else, such
+        as a timeout waiting for the response, may mean the request was
+        acted on and must not be sent again.
+        """
+        if isinstance(err, http_client.BadStatusLine):
+            # RemoteDisconnected is a BadStatusLine in Python 3
+            return True
+
+        return not sent and isinstance(err, socket.error) and \
+            getattr(err, 'errno', None) in (errno.ECONNRESET, errno.EPIPE)
+
+    def _release(self, conn, resp):
+        """
+        Return a connection to the pool once its response has been read,
+        unless the server is closing it.
+        """
+        if resp.will_close:
+            self._pool.discard(conn)
+
+        else:
+            self._pool.put(conn)
+
+    @staticmethod
+    def _set_timeout(conn, timeout):
+        """
+        Set the timeout of a pooled connection for the next request.
+        """
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
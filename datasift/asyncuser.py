@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+Awaitable access to the DataSift REST API for asyncio applications.
+
+Requires Python 3.5+. This module is not imported by the rest of the
+library, so the library itself keeps working on older Pythons.
+"""
+import asyncio
+import ssl
+import time
+import zlib
+from . import urlencode, USER_AGENT
+from .apiclient import ApiClient, API_BASE_URL, get_timeout
+from .exc import APIError, InvalidDataError
+from .historic import Historic
+from .push import PushSubscription
+
+
+class _StaleConnectionError(EOFError):
+    """
+    Raised when the server closed a connection before any of the response
+    arrived, so the request can safely be sent again on a new one.
+    """
+
+
+#-----------------------------------------------------------------------------
+# The AsyncApiClient class.
+#-----------------------------------------------------------------------------
+class AsyncApiClient(object):
+    """
+    An asyncio API client that sends calls over keep-alive HTTP/1.1
+    connections. At most max_concurrency calls are in flight at once and up
+    to pool_size idle connections are kept for reuse.
+    """
+
+    def __init__(self, base_url=API_BASE_URL, use_ssl=True, pool_size=10,
+                 max_concurrency=100, idle_timeout=30, timeout=None,
+                 ssl_context=None):
+        netloc, path = (base_url.split('/', 1) + [''])[:2]
+        port = 443 if use_ssl else 80
+        if ':' in netloc:
+            netloc, port = netloc.rsplit(':', 1)
+            port = int(port)
+
+        if use_ssl and ssl_context is None:
+            ssl_context = ssl.create_default_context()
+
+        self._host = netloc
+        self._port = port
+        self._path = '/' + path
+        self._ssl_context = ssl_context if use_ssl else None
+        self._pool_size = pool_size
+        self._max_concurrency = max_concurrency
+        self._idle_timeout = idle_timeout
+        self._timeout = timeout
+        self._idle = []
+        self._semaphore = None
+
+    async def call(self, username, api_key, endpoint, params={}, user_agent=USER_AGENT,
+                   timeout=None):
+        """
+        Make a call to a DataSift API endpoint. Returns the same dict as
+        ApiClient.call. The timeout defaults to the one given to the
+        constructor, or else the one for the endpoint.
+        """
+        if timeout is None:
+            timeout = self._timeout
+
+        if timeout is None:
+            timeout = get_timeout(endpoint)
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        path = '%s%s.json' % (self._path, endpoint)
+        body = urlencode(params).encode('utf-8')
+        headers = {
+            'Auth': '%s:%s' % (username, api_key),
+            'User-Agent': user_agent,
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Accept-Encoding': 'gzip',
+        }
+
+        async with self._semaphore:
+            try:
+                return await asyncio.wait_for(
+                    self._call(path, body, headers), timeout)
+
+            except asyncio.TimeoutError:
+                raise APIError('Request failed: timed out', 503)
+
+    async def close(self):
+        """
+        Close the idle connections.
+        """
+        idle, self._idle = self._idle, []
+        for reader, writer, last_used in idle:
+            writer.close()
+
+    def get_idle_count(self):
+        """
+        Get the number of idle connections.
+        """
+        return len(self._idle)
+
+    async def _call(self, path, body, headers):
+        retried = False
+        while True:
+            reader, writer, reused = await self._get_connection()
+            try:
+                status, resp_headers, content, will_close = await self._request(
+                    reader, writer, path, body, headers)
+
+            except _StaleConnectionError as err:
+                writer.close()
+                if reused and not retried:
+                    # The server closed the idle connection without
+                    # answering, so the request can go on a new one
+                    retried = True
+                    continue
+
+                raise APIError('Request failed: %s' % err, 503)
+
+            except asyncio.CancelledError:
+                # Timed out, so the response may still arrive on this
+                # connection and it can't be used again
+                writer.close()
+                raise
+
+            except (OSError, EOFError, asyncio.IncompleteReadError, ValueError) as err:
+                writer.close()
+                raise APIError('Request failed: %s' % err, 503)
+
+            break
+
+        if will_close or len(self._idle) >= self._pool_size:
+            writer.close()
+
+        else:
+            self._idle.append((reader, writer, time.time()))
+
+        wire_bytes = len(content)
+        if 'gzip' in resp_headers.get('content-encoding', '').lower():
+            try:
+                content = zlib.decompress(content, 16 + zlib.MAX_WBITS)
+
+            except zlib.error as err:
+                raise APIError('Failed to decompress the response: %s' % err, 503)
+
+        return ApiClient._build_response(status, content, resp_headers, wire_bytes)
+
+    async def _get_connection(self):
+        now = time.time()
+        while self._idle:
+            reader, writer, last_used = self._idle.pop()
+            if now - last_used <= self._idle_timeout and not reader.at_eof():
+                return reader, writer, True
+
+            writer.close()
+
+        try:
+            reader, writer = await asyncio.open_connection(
+                self._host, self._port, ssl=self._ssl_context)
+
+        except OSError as err:
+            raise APIError('Request failed: %s' % err, 503)
+
+        return reader, writer, False
+
+    async def _request(self, reader, writer, path, body, headers):
+        lines = ['POST %s HTTP/1.1' % path, 'Host: %s' % self._host,
+                 'Content-Length: %d' % len(body)]
+        for key in headers:
+            lines.append('%s: %s' % (key, headers[key]))
+
+        try:
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+            await writer.drain()
+
+        except (ConnectionResetError, BrokenPipeError) as err:
+            raise _StaleConnectionError(err)
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise _StaleConnectionError('Connection closed by the server')
+
+        version, status = status_line.decode('latin-1').split(None, 2)[:2]
+        resp_headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+
+            key, value = line.decode('latin-1').split(':', 1)
+            resp_headers[key.strip().lower()] = value.strip()
+
+        connection = resp_headers.get('connection', '').lower()
+        will_close = connection == 'close' or (version == 'HTTP/1.0' and
+                                               connection != 'keep-alive')
+
+        if 'chunked' in resp_headers.get('transfer-encoding', '').lower():
+            content = await self._read_chunked(reader)
+
+        elif 'content-length' in resp_headers:
+            content = await reader.readexactly(int(resp_headers['content-length']))
+
+        else:
+            content = await reader.read()
+            will_close = True
+
+        return int(status), resp_headers, content, will_close
+
+    @staticmethod
+    async def _read_chunked(reader):
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                # Skip any trailers
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+
+                return b''.join(chunks)
+
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+
+
+#-----------------------------------------------------------------------------
+# The AsyncUser class.
+#-----------------------------------------------------------------------------
+class AsyncUser(object):
+    """
+    An AsyncUser provides awaitable versions of the API calls of a User. The
+    objects it works with are the usual Definition, Historic and Push
+    objects belonging to that user, and the rate limit details of each call
+    are recorded on the user as usual.
+    """
+
+    def __init__(self, user, api_client=None, max_concurrency=100):
+        """
+        Initialise an AsyncUser for the given User. Uses an AsyncApiClient
+        allowing max_concurrency calls in flight unless an API client is
+        supplied.
+        """
+        if api_client is None:
+            api_client = AsyncApiClient(max_concurrency=max_concurrency)
+
+        self._user = user
+        self._api_client = api_client
+
+    def get_user(self):
+        """
+        Get the User this object makes calls for.
+        """
+        return self._user
+
+    async def close(self):
+        """
+        Close the API client's connections.
+        """
+        await self._api_client.close()
+
+    async def call_api(self, endpoint, params):
+        """
+        Make a call to a DataSift API endpoint, waiting for the user's
+        RateLimiter without blocking the event loop if it has one.
+        """
+        rate_limiter = self._user.get_rate_limiter()
+        if rate_limiter is not None:
+            delay = rate_limiter.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        res = await self._api_client.call(
+            self._user.get_username(), self._user.get_api_key(), endpoint,
+            params, self._user.get_useragent())
+
+        return self._user._handle_response(res)
+
+    async def get_usage(self, period='hour'):
+        """
+        Get usage data for the user.
+        """
+        return await self.call_api('usage', {'period': period})
+
+    async def compile(self, definition):
+        """
+        Compile a Definition, storing the hash, created at date and DPU on it
+        as Definition.compile does.
+        """
+        if not definition._csdl:
+            raise InvalidDataError('Cannot compile an empty definition')
+
+        try:
+            definition._on_compiled(await self.call_api(
+                'compile', {'csdl': definition._csdl}))
+
+        except APIError as e:
+            definition._on_compile_error(e)
+
+    async def validate(self, definition):
+        """
+        Validate a Definition, storing the created at date and DPU on it as
+        Definition.validate does.
+        """
+        if not definition._csdl:
+            raise InvalidDataError('Cannot validate an empty definition')
+
+        try:
+            definition._on_validated(await self.call_api(
+                'validate', {'csdl': definition._csdl}))
+
+        except APIError as e:
+            definition._on_compile_error(e)
+
+    async def get_hash(self, definition):
+        """
+        Get the hash of a Definition, compiling it first if necessary.
+        """
+        if definition._hash is None:
+            await self.compile(definition)
+
+        return definition._hash
+
+    async def prepare_historic(self, historic):
+        """
+        Prepare a Historic query as Historic.prepare does.
+        """
+        params = historic._get_prepare_params()
+
+        try:
+            historic._on_prepared(await self.call_api('historics/prepare', params))
+
+        except APIError as e:
+            historic._on_api_error(e)
+
+    async def get_historic(self, playback_id):
+        """
+        Get an existing Historics query from the API.
+        """
+        return Historic(self._user, await self.call_api(
+            'historics/get', {'id': playback_id}))
+
+    async def get_push_subscription(self, subscription_id):
+        """
+        Get a Push subscription from the API.
+        """
+        return PushSubscription(self._user, await self.call_api(
+            'push/get', {'id': subscription_id}))
+
+    async def subscribe(self, push_definition, hash_type, hash_, name):
+        """
+        Subscribe a PushDefinition to a stream hash or historic playback ID
+        as PushDefinition.subscribe does.
+        """
+        return PushSubscription(self._user, await self.call_api(
+            'push/create',
+            push_definition._get_subscribe_params(hash_type, hash_, name)))
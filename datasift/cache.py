@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from .localdb import LocalDatabase
+
+
+#-----------------------------------------------------------------------------
+# The CompileCache class.
+#-----------------------------------------------------------------------------
+class CompileCache(object):
+    """
+    A CompileCache remembers the hash, created at date and DPU returned for
+    each CSDL string, so a new Definition of the same CSDL doesn't need a
+    compile or validate call. It holds up to max_size entries, dropping the
+    least recently used first, and entries expire ttl seconds after they
+    were stored. A PersistentCompileCache can be given as the store behind
+    it, which is then looked in on a miss and written to on every put.
+    """
+
+    FIELDS = ('hash', 'created_at', 'dpu')
+
+    def __init__(self, max_size=1000, ttl=3600, store=None):
+        self._store = store
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, csdl, field):
+        """
+        Get the cached details for a CSDL string as a dict with hash,
+        created_at and dpu keys, counting a hit if it includes the given
+        field. Returns None and counts a miss otherwise.
+        """
+        with self._lock:
+            entry = self._entries.pop(csdl, None)
+            if entry is not None and entry[0] <= time.time():
+                entry = None
+
+            if entry is not None:
+                # Move it to the most recently used end
+                self._entries[csdl] = entry
+
+            if entry is not None and entry[1].get(field) is not None:
+                self._hits += 1
+                return dict(entry[1])
+
+        details = None
+        if self._store is not None:
+            details = self._store.get(csdl, field)
+
+        with self._lock:
+            if details is None:
+                self._misses += 1
+                return None
+
+            self._hits += 1
+            self._add(csdl, details)
+            return dict(details)
+
+    def put(self, csdl, hash_=None, created_at=None, dpu=None):
+        """
+        Store the details for a CSDL string. Details passed as None keep
+        their cached values, so a validate result can be added to a compile
+        result and the other way round.
+        """
+        with self._lock:
+            self._add(csdl, {'hash': hash_, 'created_at': created_at, 'dpu': dpu})
+
+        if self._store is not None:
+            self._store.put(csdl, hash_, created_at, dpu)
+
+    def remove(self, csdl):
+        """
+        Forget the details for a CSDL string.
+        """
+        with self._lock:
+            self._entries.pop(csdl, None)
+
+        if self._store is not None:
+            self._store.remove(csdl)
+
+    def clear(self):
+        """
+        Forget all cached details, including those in the store.
+        """
+        with self._lock:
+            self._entries.clear()
+
+        if self._store is not None:
+            self._store.clear()
+
+    def get_store(self):
+        """
+        Get the store behind this cache, if any.
+        """
+        return self._store
+
+    def get_stats(self):
+        """
+        Get the number of hits, misses and cached entries.
+        """
+        with self._lock:
+            return {'hits': self._hits,
+                    'misses': self._misses,
+                    'size': len(self._entries)}
+
+    def _add(self, csdl, details):
+        # Must be called with the lock held
+        now = time.time()
+        entry = self._entries.pop(csdl, None)
+        if entry is not None and entry[0] > now:
+            for key in self.FIELDS:
+                if details[key] is None:
+                    details[key] = entry[1][key]
+
+        self._entries[csdl] = (now + self._ttl, details)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(False)
+
+
+#-----------------------------------------------------------------------------
+# The PersistentCompileCache class.
+#-----------------------------------------------------------------------------
+class PersistentCompileCache(object):
+    """
+    A compile cache kept in an SQLite database file, so compile results
+    survive restarts and are shared by all processes using the same file.
+    Entries are keyed by the SHA-256 digest of the CSDL and expire ttl
+    seconds after they were stored. It can be used on its own or as the
+    store behind a CompileCache.
+    """
+
+    def __init__(self, path, ttl=86400, timeout=30):
+        self._ttl = ttl
+        self._db = LocalDatabase(path, [
+            'CREATE TABLE IF NOT EXISTS compile_cache ('
+            'digest TEXT PRIMARY KEY, hash TEXT, created_at TEXT, dpu REAL, '
+            'expires REAL)'], timeout)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get_path(self):
+        """
+        Get the path of the database file.
+        """
+        return self._db.get_path()
+
+    def get(self, csdl, field):
+        """
+        Get the cached details for a CSDL string as a dict with hash,
+        created_at and dpu keys, counting a hit if it includes the given
+        field. Returns None and counts a miss otherwise.
+        """
+        row = self._db.connect().execute(
+            'SELECT hash, created_at, dpu FROM compile_cache '
+            'WHERE digest = ? AND expires > ?', (self._digest(csdl), time.time())).fetchone()
+
+        details = None
+        if row is not None:
+            details = self._to_details(row)
+
+        with self._lock:
+            if details is None or details[field] is None:
+                self._misses += 1
+                return None
+
+            self._hits += 1
+            return details
+
+    def put(self, csdl, hash_=None, created_at=None, dpu=None):
+        """
+        Store the details for a CSDL string. Details passed as None keep
+        their cached values.
+        """
+        digest = self._digest(csdl)
+        now = time.time()
+        details = {'hash': hash_, 'created_at': created_at, 'dpu': dpu}
+        with self._db.transaction() as conn:
+            row = conn.execute(
+                'SELECT hash, created_at, dpu FROM compile_cache '
+                'WHERE digest = ? AND expires > ?', (digest, now)).fetchone()
+            if row is not None:
+                cached = self._to_details(row)
+                for key in CompileCache.FIELDS:
+                    if details[key] is None:
+                        details[key] = cached[key]
+
+            if details['created_at'] is not None:
+                details['created_at'] = details['created_at'].strftime('%Y-%m-%d %H:%M:%S')
+
+            conn.execute('DELETE FROM compile_cache WHERE expires <= ?', (now,))
+            conn.execute(
+                'INSERT OR REPLACE INTO compile_cache (digest, hash, created_at, '
+                'dpu, expires) VALUES (?, ?, ?, ?, ?)',
+                (digest, details['hash'], details['created_at'], details['dpu'],
+                 now + self._ttl))
+
+    def remove(self, csdl):
+        """
+        Forget the details for a CSDL string.
+        """
+        with self._db.transaction() as conn:
+            conn.execute('DELETE FROM compile_cache WHERE digest = ?',
+                         (self._digest(csdl),))
+
+    def clear(self):
+        """
+        Forget all cached details.
+        """
+        with self._db.transaction() as conn:
+            conn.execute('DELETE FROM compile_cache')
+
+    def get_stats(self):
+        """
+        Get the number of hits and misses in this process and the number of
+        entries in the database.
+        """
+        size = self._db.connect().execute(
+            'SELECT COUNT(*) FROM compile_cache WHERE expires > ?',
+            (time.time(),)).fetchone()[0]
+
+        with self._lock:
+            return {'hits': self._hits,
+                    'misses': self._misses,
+                    'size': size}
+
+    @staticmethod
+    def _digest(csdl):
+        if not isinstance(csdl, bytes):
+            csdl = csdl.encode('utf-8')
+
+        return hashlib.sha256(csdl).hexdigest()
+
+    @staticmethod
+    def _to_details(row):
+        hash_, created_at, dpu = row
+        if created_at is not None:
+            created_at = datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S')
+
+        return {'hash': hash_, 'created_at': created_at, 'dpu': dpu}
+
+
+#-----------------------------------------------------------------------------
+# The ResponseCache class.
+#-----------------------------------------------------------------------------
+class ResponseCache(object):
+    """
+    A read-through cache for the responses of read endpoints, used by
+    User.call_api. Each endpoint has its own TTL, and endpoints without one
+    are never cached. A call that changes a Push subscription or Historics
+    query drops the cached responses for the same id, along with the cached
+    lists that could include it, so the user's own changes are never hidden
+    by the cache.
+    """
+
+    DEFAULT_TTLS = {
+        'historics/get': 10,
+        'push/get': 10,
+        'push/log': 10,
+        'usage': 60,
+    }
+
+    # The cached endpoints whose responses each call changes.
+    INVALIDATES = {
+        'historics/prepare': ('historics/get',),
+        'historics/start': ('historics/get',),
+        'historics/stop': ('historics/get',),
+        'historics/update': ('historics/get',),
+        'historics/delete': ('historics/get',),
+        'push/create': ('push/get', 'push/log'),
+        'push/update': ('push/get', 'push/log'),
+        'push/pause': ('push/get', 'push/log'),
+        'push/resume': ('push/get', 'push/log'),
+        'push/stop': ('push/get', 'push/log'),
+        'push/delete': ('push/get', 'push/log'),
+    }
+
+    def __init__(self, ttls=None, max_size=1000):
+        """
+        Initialise a ResponseCache holding up to max_size responses. The
+        ttls dict maps endpoints to the number of seconds their responses
+        are kept, overriding DEFAULT_TTLS; a TTL of None turns caching off
+        for an endpoint.
+        """
+        self._ttls = dict(self.DEFAULT_TTLS)
+        if ttls is not None:
+            self._ttls.update(ttls)
+
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        # Bumped for an (endpoint, id) whenever a change drops its responses
+        self._generations = {}
+
+    def get(self, endpoint, params):
+        """
+        Get a copy of the cached response data for a call, or None if there
+        is none.
+        """
+        key = self._get_key(endpoint, params)
+        if key is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[0] <= time.time():
+                self._misses += 1
+                return None
+
+            self._entries[key] = entry
+            self._hits += 1
+            return copy.deepcopy(entry[1])
+
+    def get_generation(self, endpoint, params):
+        """
+        Get the generation of the cached response for a call, which changes
+        whenever a change drops it. Take it before making the call, and
+        pass it to put so that a response which may predate a change is not
+        stored.
+        """
+        key = self._get_key(endpoint, params)
+        if key is None:
+            return None
+
+        with self._lock:
+            return self._generations.get(self._get_scope(key), 0)
+
+    def put(self, endpoint, params, data, generation=None):
+        """
+        Store the response data for a call if the endpoint is cached, unless
+        a change has dropped its responses since the given generation.
+        """
+        key = self._get_key(endpoint, params)
+        if key is None:
+            return
+
+        with self._lock:
+            if generation is not None and \
+                    self._generations.get(self._get_scope(key), 0) != generation:
+                return
+
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + self._ttls[endpoint],
+                                  copy.deepcopy(data))
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(False)
+
+    def invalidate(self, endpoint, params):
+        """
+        Drop the cached responses changed by a call to an endpoint. Those for
+        the same id and those for calls without an id, such as lists, are
+        dropped.
+        """
+        if endpoint not in self.INVALIDATES:
+            return
+
+        affected = self.INVALIDATES[endpoint]
+        id_ = params.get('id')
+        with self._lock:
+            for scope in set((key, i) for key in affected for i in (id_, None)):
+                self._generations[scope] = self._generations.get(scope, 0) + 1
+
+            for key in list(self._entries):
+                if key[0] in affected:
+                    key_id = dict(key[1]).get('id')
+                    if key_id is None or key_id == id_:
+                        del self._entries[key]
+                        self._invalidations += 1
+
+    def clear(self):
+        """
+        Drop all cached responses.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """
+        Get the number of hits, misses, responses dropped by changes and
+        cached responses.
+        """
+        with self._lock:
+            return {'hits': self._hits,
+                    'misses': self._misses,
+                    'invalidations': self._invalidations,
+                    'size': len(self._entries)}
+
+    @staticmethod
+    def _get_scope(key):
+        """
+        Get the (endpoint, id) whose generation covers a key.
+        """
+        return key[0], dict(key[1]).get('id')
+
+    def _get_key(self, endpoint, params):
+        """
+        Get the key for a call, or None if it isn't cached.
+        """
+        if self._ttls.get(endpoint) is None:
+            return None
+
+        try:
+            key = (endpoint, tuple(sorted(params.items())))
+            hash(key)
+
+        except TypeError:
+            return None
+
+        return key
@@ -0,0 +1,404 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import heapq
+import threading
+import time
+from collections import deque
+from .exc import InvalidDataError
+from .streamconsumer import StreamConsumer, StreamConsumerEventHandler
+
+try:
+    import queue
+
+except ImportError:
+    import Queue as queue
+
+
+#-----------------------------------------------------------------------------
+# The RestartPolicy class.
+#-----------------------------------------------------------------------------
+class RestartPolicy(object):
+    """
+    Decides whether, and after how long, a consumer that stopped because of an
+    error is restarted by a ConsumerPool. A consumer is given up on once it
+    has been restarted max_restarts times within the last window seconds.
+    """
+
+    def __init__(self, max_restarts=5, window=300, delay=1, max_delay=60):
+        self.max_restarts = max_restarts
+        self.window = window
+        self.delay = delay
+        self.max_delay = max_delay
+
+    def next_delay(self, restarts, now=None):
+        """
+        Given the timestamps of the previous restarts of a consumer, return
+        the number of seconds to wait before restarting it again, or None if
+        it should not be restarted.
+        """
+        if now is None:
+            now = time.time()
+
+        recent = [t for t in restarts if now - t < self.window]
+        if self.max_restarts is not None and len(recent) >= self.max_restarts:
+            return None
+
+        return min(self.delay * (2 ** len(recent)), self.max_delay)
+
+
+#-----------------------------------------------------------------------------
+# The event handler the pool installs on each of its consumers.
+#-----------------------------------------------------------------------------
+class _PoolEventHandler(StreamConsumerEventHandler):
+    """
+    Records every event with the pool before passing it on to the handler
+    supplied for the consumer, if any.
+    """
+
+    def __init__(self, pool, handler):
+        self._pool = pool
+        self._handler = handler
+
+    def _dispatch(self, name, consumer, *args):
+        self._pool._record(consumer, name, args)
+        if self._handler is not None:
+            getattr(self._handler, name)(consumer, *args)
+
+    def on_connect(self, consumer):
+        self._dispatch('on_connect', consumer)
+
+    def on_header(self, consumer, header):
+        self._dispatch('on_header', consumer, header)
+
+    def on_interaction(self, consumer, interaction, hash_):
+        self._dispatch('on_interaction', consumer, interaction, hash_)
+
+    def on_deleted(self, consumer, interaction, hash_):
+        self._dispatch('on_deleted', consumer, interaction, hash_)
+
+    def on_warning(self, consumer, msg):
+        self._dispatch('on_warning', consumer, msg)
+
+    def on_error(self, consumer, msg):
+        self._dispatch('on_error', consumer, msg)
+
+    def on_status(self, consumer, status, data):
+        self._dispatch('on_status', consumer, status, data)
+
+    def on_disconnect(self, consumer):
+        self._dispatch('on_disconnect', consumer)
+
+
+#-----------------------------------------------------------------------------
+# The ConsumerPool class.
+#-----------------------------------------------------------------------------
+class ConsumerPool(object):
+    """
+    A ConsumerPool owns many StreamConsumers for a single user. It starts and
+    stops them as a group, restarts consumers that fail according to a
+    RestartPolicy and provides a merged view of their events and statistics.
+    """
+
+    # Keys of the aggregate statistics, mapped from the event that bumps them.
+    _EVENT_STATS = {
+        'on_connect': 'connects',
+        'on_interaction': 'interactions',
+        'on_deleted': 'deleted',
+        'on_warning': 'warnings',
+        'on_error': 'errors',
+        'on_status': 'statuses',
+        'on_disconnect': 'disconnects',
+    }
+
+    def __init__(self, user, consumer_type=StreamConsumer.TYPE_HTTP,
+                 max_running=None, restart_policy=None,
+                 event_queue_size=10000):
+        """
+        Initialise a ConsumerPool. At most max_running consumers are streaming
+        at any one time, others wait until a running consumer finishes. If no
+        restart policy is given the default RestartPolicy is used.
+        """
+        if max_running is not None and max_running < 1:
+            raise InvalidDataError('The specified max_running value is invalid')
+
+        self._user = user
+        self._consumer_type = consumer_type
+        self._max_running = max_running
+
+        if restart_policy is None:
+            restart_policy = RestartPolicy()
+
+        self._restart_policy = restart_policy
+        self._event_queue_size = event_queue_size
+        self._event_queue = None
+
+        self._lock = threading.Condition(threading.Lock())
+        self._consumers = []
+        self._active = set()
+        self._pending = deque()
+        self._failed = {}
+        self._restarts = {}
+        self._restart_heap = []
+        self._exited = []
+        self._started = False
+        self._stopping = False
+        self._stopped = threading.Event()
+        self._supervisor = None
+        self._stats = dict((key, 0) for key in self._EVENT_STATS.values())
+        self._stats.update({'restarts': 0, 'abandoned': 0, 'dropped_events': 0})
+
+    def add(self, definition, event_handler=None):
+        """
+        Create a consumer for the given definition, which may be anything a
+        StreamConsumer accepts, and add it to the pool. The consumer is
+        started straight away if the pool is running. Returns the consumer.
+        """
+        consumer = StreamConsumer.factory(
+            self._user, self._consumer_type, definition,
+            _PoolEventHandler(self, event_handler))
+
+        with self._lock:
+            self._consumers.append(consumer)
+            self._restarts[consumer] = []
+            if self._started and not self._stopping:
+                self._admit(consumer)
+
+        return consumer
+
+    def remove(self, consumer):
+        """
+        Stop the given consumer and remove it from the pool.
+        """
+        with self._lock:
+            if consumer not in self._restarts:
+                raise InvalidDataError('The consumer does not belong to this pool')
+
+            self._consumers.remove(consumer)
+            del self._restarts[consumer]
+            self._failed.pop(consumer, None)
+            if consumer in self._pending:
+                self._pending.remove(consumer)
+
+        self._stop_consumer(consumer)
+
+    def get_consumers(self):
+        """
+        Get a list of the consumers in this pool.
+        """
+        with self._lock:
+            return list(self._consumers)
+
+    def start(self):
+        """
+        Start all of the consumers in the pool along with the supervisor
+        thread that restarts failed consumers. Returns immediately.
+        """
+        with self._lock:
+            if self._started:
+                raise InvalidDataError('The pool has already been started')
+
+            self._started = True
+            self._stopped.clear()
+            for consumer in self._consumers:
+                self._admit(consumer)
+
+        self._supervisor = threading.Thread(target=self._supervise)
+        self._supervisor.daemon = True
+        self._supervisor.start()
+
+    def stop(self, timeout=5):
+        """
+        Stop every consumer in the pool and wait up to timeout seconds in
+        total for their threads to finish.
+        """
+        with self._lock:
+            if not self._started:
+                return
+
+            self._stopping = True
+            self._pending.clear()
+            del self._restart_heap[:]
+            consumers = list(self._consumers)
+            self._lock.notify_all()
+
+        for consumer in consumers:
+            self._stop_consumer(consumer)
+
+        deadline = time.time() + timeout
+        for consumer in consumers:
+            thread = getattr(consumer, '_thread', None)
+            if thread is not None and thread.is_alive():
+                thread.join(max(0, deadline - time.time()))
+
+        if self._supervisor is not None:
+            self._supervisor.join(max(0, deadline - time.time()))
+            self._supervisor = None
+
+        with self._lock:
+            self._active.clear()
+            self._failed.clear()
+            del self._exited[:]
+            self._started = False
+            self._stopping = False
+
+        self._stopped.set()
+        if self._event_queue is not None:
+            try:
+                self._event_queue.put_nowait(None)
+
+            except queue.Full:
+                pass
+
+    def run(self):
+        """
+        Start the pool if necessary and block until it is stopped, either by
+        another thread calling stop or by a KeyboardInterrupt.
+        """
+        if not self._started:
+            self.start()
+
+        try:
+            # Waiting with a timeout keeps the main thread responsive to
+            # KeyboardInterrupt under Python 2
+            while not self._stopped.is_set():
+                self._stopped.wait(1)
+
+        except KeyboardInterrupt:
+            self.stop()
+
+    def events(self, timeout=None):
+        """
+        Iterate over the events of all consumers in the pool as they arrive,
+        as (consumer, event name, args) tuples. Events are only collected once
+        this has been called. Iteration ends when the pool is stopped, or if
+        no event arrives within timeout seconds.
+        """
+        with self._lock:
+            if self._event_queue is None:
+                self._event_queue = queue.Queue(self._event_queue_size)
+
+            event_queue = self._event_queue
+
+        return self._iter_events(event_queue, timeout)
+
+    @staticmethod
+    def _iter_events(event_queue, timeout):
+        """
+        Generator behind events, kept separate so that the queue exists as
+        soon as events is called rather than on the first iteration.
+        """
+        while True:
+            try:
+                event = event_queue.get(True, timeout)
+
+            except queue.Empty:
+                return
+
+            if event is None:
+                return
+
+            yield event
+
+    def get_stats(self):
+        """
+        Get aggregate statistics for the consumers in the pool.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['consumers'] = len(self._consumers)
+            stats['running'] = len(self._active)
+            stats['pending'] = len(self._pending)
+            stats['failed'] = len(self._failed)
+
+        return stats
+
+    def _admit(self, consumer):
+        """
+        Start the consumer if there's a free slot, otherwise queue it. Must be
+        called with the lock held.
+        """
+        if self._max_running is not None and len(self._active) >= self._max_running:
+            self._pending.append(consumer)
+            return
+
+        self._active.add(consumer)
+        self._failed.pop(consumer, None)
+        consumer.consume()
+
+    @staticmethod
+    def _stop_consumer(consumer):
+        """
+        Stop a consumer if it's running. The consumer may stop on its own
+        between the check and the call, which is fine.
+        """
+        if consumer._is_running(True):
+            try:
+                consumer.stop()
+
+            except InvalidDataError:
+                pass
+
+    def _record(self, consumer, name, args):
+        """
+        Called from the consumer threads for every event.
+        """
+        with self._lock:
+            if name in self._EVENT_STATS:
+                self._stats[self._EVENT_STATS[name]] += 1
+
+            if name == 'on_error':
+                self._failed[consumer] = args[0]
+
+            elif name == 'on_disconnect':
+                self._exited.append(consumer)
+                self._lock.notify_all()
+
+            queue_ = self._event_queue
+
+        if queue_ is not None and name != 'on_header':
+            try:
+                queue_.put_nowait((consumer, name, args))
+
+            except queue.Full:
+                with self._lock:
+                    self._stats['dropped_events'] += 1
+
+    def _supervise(self):
+        """
+        The supervisor thread. Handles consumers whose threads have finished,
+        scheduling restarts for the ones that failed and filling free slots
+        from the pending queue.
+        """
+        with self._lock:
+            while not self._stopping:
+                now = time.time()
+
+                while self._exited:
+                    consumer = self._exited.pop(0)
+                    self._active.discard(consumer)
+                    if consumer in self._failed and consumer in self._restarts:
+                        delay = self._restart_policy.next_delay(
+                            self._restarts[consumer], now)
+                        if delay is None:
+                            self._stats['abandoned'] += 1
+
+                        else:
+                            heapq.heappush(self._restart_heap,
+                                           (now + delay, id(consumer), consumer))
+
+                while self._restart_heap and self._restart_heap[0][0] <= now:
+                    consumer = heapq.heappop(self._restart_heap)[2]
+                    if consumer in self._restarts:
+                        self._restarts[consumer].append(now)
+                        self._stats['restarts'] += 1
+                        self._admit(consumer)
+
+                while self._pending and (self._max_running is None or
+                                         len(self._active) < self._max_running):
+                    self._admit(self._pending.popleft())
+
+                wait = None
+                if self._restart_heap:
+                    wait = max(0, self._restart_heap[0][0] - now)
+
+                self._lock.wait(wait)
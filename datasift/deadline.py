@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import time
+from .exc import DeadlineExceededError
+
+
+#-----------------------------------------------------------------------------
+# The Deadline class.
+#-----------------------------------------------------------------------------
+class Deadline(object):
+    """
+    A Deadline is a latency budget for one or more API calls. Pass the same
+    Deadline to each call in a chain, for example a compile followed by a
+    push subscribe, and each call gets whatever time is left. Calls never
+    wait longer than their own endpoint timeout either.
+    """
+
+    def __init__(self, timeout):
+        """
+        Initialise a Deadline timeout seconds from now.
+        """
+        self._expires = time.time() + timeout
+
+    def remaining(self):
+        """
+        Get the number of seconds left, which is 0 once the deadline has
+        passed.
+        """
+        return max(0, self._expires - time.time())
+
+    def expired(self):
+        """
+        Returns True once the deadline has passed.
+        """
+        return self.remaining() <= 0
+
+    def get_timeout(self, timeout):
+        """
+        Get the timeout for a step that would normally be allowed timeout
+        seconds. Raises DeadlineExceededError if no time is left.
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceededError('The deadline has passed')
+
+        return min(timeout, remaining)
@@ -29,6 +29,58 @@ class Definition(object):
         self._hash = hash_
         self.set(csdl)
 
+    @staticmethod
+    def compile_many(user, csdls, max_concurrency=8):
+        """
+        Compile several CSDL strings concurrently. Returns a list of compiled
+        Definition objects in the order of the CSDL strings, with the
+        exception raised in place of any that failed to compile. An empty
+        CSDL string gets an InvalidDataError without calling the API.
+        """
+        return Definition._call_many(user, csdls, 'compile',
+                                     Definition._on_compiled, max_concurrency)
+
+    @staticmethod
+    def validate_many(user, csdls, max_concurrency=8):
+        """
+        Validate several CSDL strings concurrently. Returns a list of
+        validated Definition objects in the order of the CSDL strings, with
+        the exception raised in place of any that failed to validate. An
+        empty CSDL string gets an InvalidDataError without calling the API.
+        """
+        return Definition._call_many(user, csdls, 'validate',
+                                     Definition._on_validated, max_concurrency)
+
+    @staticmethod
+    def _call_many(user, csdls, endpoint, on_success, max_concurrency):
+        definitions = [Definition(user, csdl) for csdl in csdls]
+        results = iter(user.call_api_many(
+            [(endpoint, {'csdl': definition.get()}) for definition in definitions
+             if definition.get()],
+            max_concurrency))
+
+        retval = []
+        for definition in definitions:
+            if not definition.get():
+                retval.append(InvalidDataError('Cannot %s an empty definition' % endpoint))
+                continue
+
+            res = next(results)
+            try:
+                if isinstance(res, APIError):
+                    definition._on_compile_error(res)
+
+                elif not isinstance(res, Exception):
+                    on_success(definition, res)
+                    res = definition
+
+            except CompileFailedError as e:
+                res = e
+
+            retval.append(res)
+
+        return retval
+
     def get(self):
         """
         Get the definition's CSDL string.
@@ -57,13 +109,15 @@ class Definition(object):
 
         self._csdl = csdl
 
-    def get_hash(self):
+    def get_hash(self, deadline=None):
         """
         Returns the hash for this definition. If the hash has not yet been
-        obtained it compiles the definition first.
+        obtained it is taken from the user's compile cache, or else the
+        definition is compiled first. See User.call_api for the optional
+        Deadline.
         """
-        if self._hash is None:
-            self.compile()
+        if self._hash is None and not self._load_cached('hash'):
+            self.compile(deadline)
 
         return self._hash
 
@@ -84,12 +138,13 @@ class Definition(object):
     def get_created_at(self):
         """
         Returns the date when the stream was first created. If the created at
-        date has not yet been obtained it validates the definition first.
+        date has not yet been obtained it is taken from the user's compile
+        cache, or else the definition is validated first.
         """
         if self._csdl is None:
             raise InvalidDataError('Created at date not available')
 
-        if self._created_at is None:
+        if self._created_at is None and not self._load_cached('created_at'):
             try:
                 self.validate()
 
@@ -101,12 +156,13 @@ class Definition(object):
     def get_total_dpu(self):
         """
         Returns the total DPU of the stream. If the DPU has not yet been
-        obtained it validates the definition first.
+        obtained it is taken from the user's compile cache, or else the
+        definition is validated first.
         """
         if self._csdl is None:
             raise InvalidDataError('Total DPU not available')
 
-        if self._total_dpu is None:
+        if self._total_dpu is None and not self._load_cached('dpu'):
             try:
                 self.validate()
 
@@ -115,68 +171,117 @@ class Definition(object):
 
         return self._total_dpu
 
-    def compile(self):
+    def compile(self, deadline=None):
         """
         Call the DataSift API to compile this definition. If compilation
-        succeeds we store the details in the response.
+        succeeds we store the details in the response. See User.call_api for
+        the optional Deadline.
         """
         if not self._csdl:
             raise InvalidDataError('Cannot compile an empty definition')
 
         try:
-            res = self._user.call_api('compile', {'csdl': self._csdl})
-
-            if not 'hash' in res:
-                raise CompileFailedError('Compiled successfully but no hash in the response')
-            self._hash = res['hash']
-
-            if not 'created_at' in res:
-                raise CompileFailedError('Compiled successfully but no created_at in the response')
-            self._created_at = datetime.strptime(res['created_at'], '%Y-%m-%d %H:%M:%S')
-
-            if not 'dpu' in res:
-                raise CompileFailedError('Compiled successfully but no DPU in the response')
-            self._total_dpu = res['dpu']
+            self._on_compiled(self._user.call_api('compile', {'csdl': self._csdl},
+                                                  deadline))
 
         except APIError as e:
-            msg, code = e.args
-            self.clear_hash()
-
-            if code == 400:
-                raise CompileFailedError(msg)
-            else:
-                raise CompileFailedError('Unexpected APIError code: %d [%s]' % (code, msg))
+            self._on_compile_error(e)
 
-    def validate(self):
+    def validate(self, deadline=None):
         """
         Call the DataSift API to validate this definition. If validation
-        succeeds we store the details in the response.
+        succeeds we store the details in the response. See User.call_api for
+        the optional Deadline.
         """
         if not self._csdl:
             raise InvalidDataError('Cannot validate an empty definition')
 
         try:
-            res = self._user.call_api('validate', {'csdl': self._csdl})
+            self._on_validated(self._user.call_api('validate', {'csdl': self._csdl},
+                                                   deadline))
 
-            if not 'created_at' in res:
-                raise CompileFailedError('Validated successfully but no created_at in the response')
+        except APIError as e:
+            self._on_compile_error(e)
 
-            self._created_at = datetime.strptime(res['created_at'], '%Y-%m-%d %H:%M:%S')
+    def _load_cached(self, field):
+        """
+        Fill in the details of this definition from the user's compile cache.
+        Returns True if the cache had the given field.
+        """
+        cache = self._user.get_compile_cache()
+        if cache is None or not self._csdl:
+            return False
 
-            if not 'dpu' in res:
-                raise CompileFailedError('Validated successfully but no DPU in the response')
+        entry = cache.get(self._csdl, field)
+        if entry is None:
+            return False
 
-            self._total_dpu = res['dpu']
+        if self._hash is None:
+            self._hash = entry['hash']
 
-        except APIError as e:
-            self.clear_hash()
-            msg, code = e.args
+        if self._created_at is None:
+            self._created_at = entry['created_at']
+
+        if self._total_dpu is None:
+            self._total_dpu = entry['dpu']
 
-            if code == 400:
-                raise CompileFailedError(msg)
+        return True
+
+    def _on_compiled(self, res):
+        """
+        Store the details from a successful compile response.
+        """
+        if not 'hash' in res:
+            raise CompileFailedError('Compiled successfully but no hash in the response')
+        self._hash = res['hash']
 
-            else:
-                raise CompileFailedError('Unexpected APIError code: %d [%s]' % (code, msg))
+        if not 'created_at' in res:
+            raise CompileFailedError('Compiled successfully but no created_at in the response')
+        self._created_at = datetime.strptime(res['created_at'], '%Y-%m-%d %H:%M:%S')
+
+        if not 'dpu' in res:
+            raise CompileFailedError('Compiled successfully but no DPU in the response')
+        self._total_dpu = res['dpu']
+
+        cache = self._user.get_compile_cache()
+        if cache is not None:
+            cache.put(self._csdl, self._hash, self._created_at, self._total_dpu)
+
+    def _on_validated(self, res):
+        """
+        Store the details from a successful validate response.
+        """
+        if not 'created_at' in res:
+            raise CompileFailedError('Validated successfully but no created_at in the response')
+
+        self._created_at = datetime.strptime(res['created_at'], '%Y-%m-%d %H:%M:%S')
+
+        if not 'dpu' in res:
+            raise CompileFailedError('Validated successfully but no DPU in the response')
+
+        self._total_dpu = res['dpu']
+
+        cache = self._user.get_compile_cache()
+        if cache is not None:
+            cache.put(self._csdl, None, self._created_at, self._total_dpu)
+
+    def _on_compile_error(self, e):
+        """
+        Turn an APIError from a compile or validate call into a
+        CompileFailedError.
+        """
+        msg, code = e.args
+        self.clear_hash()
+
+        cache = self._user.get_compile_cache()
+        if cache is not None:
+            cache.remove(self._csdl)
+
+        if code == 400:
+            raise CompileFailedError(msg)
+
+        else:
+            raise CompileFailedError('Unexpected APIError code: %d [%s]' % (code, msg))
 
     def get_dpu_breakdown(self):
         """
@@ -197,6 +302,24 @@ class Definition(object):
         """
         Call the DataSift API to get buffered interactions.
         """
+        retval = self._user.call_api('stream', self._get_buffered_params(count, from_id))
+
+        if not 'stream' in retval:
+            raise APIError('No data in the response', -1)
+
+        return retval['stream']
+
+    def iter_buffered(self, count=None, from_id=None):
+        """
+        Call the DataSift API to get buffered interactions, returning an
+        iterator that parses each interaction as it arrives. Use this rather
+        than get_buffered for a large count, as only one interaction at a
+        time is held in memory.
+        """
+        return self._user.iter_api('stream', self._get_buffered_params(count, from_id),
+                                   'stream')
+
+    def _get_buffered_params(self, count, from_id):
         if not self._csdl:
             raise InvalidDataError('Cannot get buffered interactions for an empty definition')
 
@@ -207,12 +330,7 @@ class Definition(object):
         if from_id is not None:
             params['interaction_id'] = from_id
 
-        retval = self._user.call_api('stream', params)
-
-        if not 'stream' in retval:
-            raise APIError('No data in the response', -1)
-
-        return retval['stream']
+        return params
 
     def create_historic(self, start, end, sources, sample, name):
         """
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import socket
+import threading
+import time
+
+try:
+    import ssl
+
+except ImportError:
+    ssl = None
+
+
+#-----------------------------------------------------------------------------
+# The StreamEndpoints class.
+#-----------------------------------------------------------------------------
+class StreamEndpoints(object):
+    """
+    A set of candidate stream base URLs for a User. The endpoints are probed
+    in the background for their connect and first byte latency, and each new
+    stream connection goes to the fastest healthy one. An endpoint that
+    keeps failing is taken out of rotation for a while so that consumers
+    fail over to the next one instead of backing off.
+    """
+
+    def __init__(self, user, base_urls, probe_interval=60, probe_timeout=5,
+                 failover_after=2, failure_penalty=300):
+        """
+        Initialise a StreamEndpoints object for the given base URLs, in order
+        of preference. An endpoint is marked unhealthy for failure_penalty
+        seconds after failover_after consecutive failures.
+        """
+        self._user = user
+        self._base_urls = list(base_urls)
+        self._probe_interval = probe_interval
+        self._probe_timeout = probe_timeout
+        self._failover_after = failover_after
+        self._failure_penalty = failure_penalty
+
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._failures = dict((url, 0) for url in self._base_urls)
+        self._unhealthy_until = dict((url, 0) for url in self._base_urls)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get_base_urls(self):
+        """
+        Get the candidate base URLs.
+        """
+        return list(self._base_urls)
+
+    def get_latencies(self):
+        """
+        Get the results of the last probe as a dict mapping each base URL to
+        a (connect time, first byte time) tuple, or None if the probe failed.
+        """
+        with self._lock:
+            return dict(self._latencies)
+
+    def get_best(self):
+        """
+        Get the base URL of the fastest healthy endpoint. Endpoints that have
+        not been probed yet rank after the probed ones, in the order given.
+        If no endpoint is healthy the first one is returned.
+        """
+        now = time.time()
+        with self._lock:
+            healthy = [url for url in self._base_urls
+                       if self._unhealthy_until[url] <= now and
+                       self._latencies.get(url, 0) is not None]
+            if not healthy:
+                return self._base_urls[0]
+
+            def rank(url):
+                if url not in self._latencies:
+                    return (1, self._base_urls.index(url))
+
+                return (0, sum(self._latencies[url]))
+
+            return min(healthy, key=rank)
+
+    def report_success(self, base_url):
+        """
+        Record a successful connection to the given endpoint.
+        """
+        with self._lock:
+            if base_url in self._failures:
+                self._failures[base_url] = 0
+
+    def report_failure(self, base_url):
+        """
+        Record a failed connection to the given endpoint. Returns True if the
+        endpoint has now been taken out of rotation and a different healthy
+        endpoint is available to fail over to.
+        """
+        with self._lock:
+            if base_url not in self._failures:
+                return False
+
+            self._failures[base_url] += 1
+            if self._failures[base_url] < self._failover_after:
+                return False
+
+            now = time.time()
+            self._failures[base_url] = 0
+            self._unhealthy_until[base_url] = now + self._failure_penalty
+            for url in self._base_urls:
+                if self._unhealthy_until[url] <= now and \
+                        self._latencies.get(url, 0) is not None:
+                    return True
+
+            return False
+
+    def probe(self):
+        """
+        Probe every endpoint now and record the results.
+        """
+        for url in self._base_urls:
+            try:
+                latency = self._probe_one(url)
+
+            except (socket.error, EnvironmentError):
+                latency = None
+
+            with self._lock:
+                self._latencies[url] = latency
+
+    def start(self):
+        """
+        Start probing the endpoints in a background thread, once straight
+        away and then every probe_interval seconds.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background probing.
+        """
+        self._stop.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+
+        if thread is not None:
+            thread.join()
+
+    def is_probing(self):
+        """
+        Returns True if the endpoints are being probed in the background.
+        """
+        with self._lock:
+            return self._thread is not None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.probe()
+            self._stop.wait(self._probe_interval)
+
+    @staticmethod
+    def _split_address(base_url, use_ssl):
+        """
+        Get the (host, port) tuple for a base URL such as
+        'stream.datasift.com/' or 'localhost:8080/'.
+        """
+        netloc = base_url.split('/', 1)[0]
+        if ':' in netloc:
+            host, port = netloc.rsplit(':', 1)
+            return host, int(port)
+
+        if use_ssl:
+            return netloc, 443
+
+        return netloc, 80
+
+    def _probe_one(self, base_url):
+        """
+        Measure the time to connect to an endpoint and the time from then
+        until the first byte of a response arrives.
+        """
+        use_ssl = self._user.use_ssl()
+        host, port = self._split_address(base_url, use_ssl)
+
+        started = time.time()
+        sock = socket.create_connection((host, port), self._probe_timeout)
+        try:
+            connected = time.time()
+            if use_ssl:
+                if not hasattr(ssl, 'create_default_context'):
+                    # Python is too old to verify the handshake, so only the
+                    # connect time can be measured
+                    return connected - started, 0
+
+                sock = ssl.create_default_context().wrap_socket(
+                    sock, server_hostname=host)
+
+            sock.sendall(('HEAD / HTTP/1.1\r\nHost: %s\r\nUser-Agent: %s\r\n'
+                          'Connection: close\r\n\r\n' %
+                          (host, self._user.get_useragent())).encode('utf-8'))
+            if not sock.recv(1):
+                raise socket.error('Connection closed by %s' % base_url)
+
+            return connected - started, time.time() - connected
+
+        finally:
+            sock.close()
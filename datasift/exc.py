@@ -16,6 +16,14 @@ class APIError(Exception):
     pass
 
 
+class CircuitOpenError(APIError):
+    """
+    Thrown when calls to an API endpoint are not being made because recent
+    calls to it have failed.
+    """
+    pass
+
+
 class CompileFailedError(Exception):
     """
     Thrown when compilation of a definition fails.
@@ -23,6 +31,13 @@ class CompileFailedError(Exception):
     pass
 
 
+class DeadlineExceededError(Exception):
+    """
+    Thrown when an API call can't be completed before its deadline.
+    """
+    pass
+
+
 class InvalidDataError(Exception):
     """
     Thrown whenever invalid data is detected.
@@ -42,3 +57,11 @@ class StreamError(Exception):
     Thrown for errors to do with the streaming API.
     """
     pass
+
+
+class TransportError(Exception):
+    """
+    Thrown by a Transport when a request couldn't be sent or no response
+    was received.
+    """
+    pass
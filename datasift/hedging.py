@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import math
+import threading
+import time
+from collections import deque
+from .retry import RetryPolicy
+
+try:
+    import queue
+
+except ImportError:
+    import Queue as queue
+
+
+#-----------------------------------------------------------------------------
+# The HedgePolicy class.
+#-----------------------------------------------------------------------------
+class HedgePolicy(object):
+    """
+    A HedgePolicy cuts the tail latency of calls to read endpoints. If a
+    call hasn't finished by the endpoint's observed quantile latency (the
+    p95 by default) an identical second request is sent, and whichever
+    response arrives first is used. The slower request is left to finish in
+    the background and its response is dropped; with a PooledApiClient it
+    runs on a different connection, which goes back to the pool afterwards.
+
+    Hedges are only sent once min_samples latencies have been seen for the
+    endpoint, for at most max_ratio of calls, and only when the rate limit
+    can spare a call.
+    """
+
+    def __init__(self, endpoints=None, quantile=0.95, min_samples=20,
+                 window=200, max_ratio=0.1, min_rate_limit_remaining=100):
+        """
+        Initialise a HedgePolicy for the given endpoints, which default to
+        the read endpoints that are safe to call twice. Without a
+        RateLimiter on the user a hedge is only sent while the last known
+        rate limit remaining is above min_rate_limit_remaining.
+        """
+        if endpoints is None:
+            endpoints = RetryPolicy.READ_ENDPOINTS
+
+        self._endpoints = frozenset(endpoints)
+        self._quantile = quantile
+        self._min_samples = min_samples
+        self._window = window
+        self._max_ratio = max_ratio
+        self._min_rate_limit_remaining = min_rate_limit_remaining
+        self._latencies = {}
+        self._calls = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def is_hedged(self, endpoint):
+        """
+        Returns True if calls to the given endpoint may be hedged.
+        """
+        return endpoint in self._endpoints
+
+    def get_delay(self, endpoint):
+        """
+        Get the time after which a call to the endpoint is hedged, or None if
+        too few calls have been seen to tell.
+        """
+        with self._lock:
+            latencies = self._latencies.get(endpoint)
+            if latencies is None or len(latencies) < self._min_samples:
+                return None
+
+            ordered = sorted(latencies)
+
+        index = int(math.ceil(self._quantile * len(ordered))) - 1
+        return ordered[max(0, index)]
+
+    def record(self, endpoint, latency):
+        """
+        Record the latency of a finished request to an endpoint.
+        """
+        with self._lock:
+            if endpoint not in self._latencies:
+                self._latencies[endpoint] = deque(maxlen=self._window)
+
+            self._latencies[endpoint].append(latency)
+
+    def get_stats(self):
+        """
+        Get the number of calls made through this policy, the number that
+        were hedged and the number where the hedge answered first.
+        """
+        with self._lock:
+            return {'calls': self._calls,
+                    'hedges': self._hedges,
+                    'hedge_wins': self._hedge_wins}
+
+    def run(self, user, endpoint, request):
+        """
+        Make a call to an endpoint for a user, where request is a function
+        that sends one request and returns the API client's response dict.
+        """
+        delay = self.get_delay(endpoint)
+        with self._lock:
+            self._calls += 1
+
+        if delay is None:
+            started = time.time()
+            res = request()
+            self.record(endpoint, time.time() - started)
+            return res
+
+        results = queue.Queue()
+        self._start(endpoint, request, results, False)
+        try:
+            return self._get_result(results.get(True, delay))
+
+        except queue.Empty:
+            pass
+
+        if not self._may_hedge(user):
+            return self._get_result(results.get())
+
+        self._start(endpoint, request, results, True)
+
+        hedge, res, err = results.get()
+        if err is not None:
+            # Give the other request the chance to succeed
+            hedge, res, err = results.get()
+
+        if err is None and hedge:
+            with self._lock:
+                self._hedge_wins += 1
+
+        return self._get_result((hedge, res, err))
+
+    def _start(self, endpoint, request, results, hedge):
+        def send():
+            started = time.time()
+            try:
+                res = request()
+
+            except Exception as e:
+                results.put((hedge, None, e))
+
+            else:
+                self.record(endpoint, time.time() - started)
+                results.put((hedge, res, None))
+
+        thread = threading.Thread(target=send)
+        thread.daemon = True
+        thread.start()
+
+    @staticmethod
+    def _get_result(result):
+        hedge, res, err = result
+        if err is not None:
+            raise err
+
+        return res
+
+    def _may_hedge(self, user):
+        """
+        Decide whether a hedge may be sent now, counting it if so.
+        """
+        with self._lock:
+            if self._hedges + 1 > self._max_ratio * self._calls:
+                return False
+
+        rate_limiter = user.get_rate_limiter()
+        if rate_limiter is not None:
+            if not rate_limiter.try_reserve():
+                return False
+
+        else:
+            try:
+                remaining = int(user.get_rate_limit_remaining())
+
+            except (TypeError, ValueError):
+                remaining = -1
+
+            if 0 <= remaining <= self._min_rate_limit_remaining:
+                return False
+
+        with self._lock:
+            self._hedges += 1
+
+        return True
@@ -4,6 +4,7 @@ from datetime import datetime
 from .exc import (
     InvalidDataError,
     APIError,)
+from .paging import PageIterator, fetch_all
 
 
 #-----------------------------------------------------------------------------
@@ -42,6 +43,86 @@ class Historic:
 
         return retval
 
+    @staticmethod
+    def list_all(user, per_page=20, max_concurrency=8):
+        """
+        Get all of the Historics queries in the given user's account in the
+        same form as list. The first page gives the number of pages, and the
+        rest are fetched concurrently using up to max_concurrency threads.
+        """
+        def fetch_page(page):
+            res = Historic.list(user, page, per_page)
+            return res['historics'], res['count']
+
+        historics, count = fetch_all(fetch_page, per_page, max_concurrency)
+        return {'count': count, 'historics': historics}
+
+    @staticmethod
+    def iter_list(user, per_page=20, prefetch=1):
+        """
+        Iterate over all of the Historics queries in the given user's
+        account, fetching up to prefetch pages ahead in the background.
+        """
+        def fetch_page(page):
+            res = Historic.list(user, page, per_page)
+            return res['historics'], res['count']
+
+        return PageIterator(fetch_page, per_page, prefetch)
+
+    @staticmethod
+    def get_many(user, playback_ids, max_concurrency=8):
+        """
+        Get several Historics queries from the API concurrently. Returns a
+        list of Historic objects in the order of the playback IDs, with the
+        exception raised in place of any that couldn't be fetched.
+        """
+        results = user.call_api_many(
+            [('historics/get', {'id': playback_id}) for playback_id in playback_ids],
+            max_concurrency)
+
+        retval = []
+        for res in results:
+            try:
+                if isinstance(res, APIError):
+                    Historic._on_api_error(res)
+
+                elif not isinstance(res, Exception):
+                    res = Historic(user, res)
+
+            except (APIError, InvalidDataError) as e:
+                res = e
+
+            retval.append(res)
+
+        return retval
+
+    @staticmethod
+    def stop_many(user, playback_ids, max_concurrency=8):
+        """
+        Stop several Historics queries concurrently. Returns a list with None
+        for each query that was stopped, or the exception raised when
+        stopping it, in the order of the playback IDs.
+        """
+        results = user.call_api_many(
+            [('historics/stop', {'id': playback_id}) for playback_id in playback_ids],
+            max_concurrency)
+
+        retval = []
+        for res in results:
+            try:
+                if isinstance(res, APIError):
+                    Historic._on_command_error(res)
+
+                elif not isinstance(res, Exception):
+                    res = None
+
+            except (APIError, InvalidDataError) as e:
+                res = e
+
+            retval.append(res)
+
+        return retval
+
     def __init__(self, user, hash_, start=None, end=None, sources=None, sample=None, name=None):
         """
         Construct a new Historic query object from the supplied data. If the
@@ -271,16 +352,26 @@ class Historic:
                 }))
 
         except APIError as e:
-            m, c = e.args
-            if c == 400:
-                # Missing or invalid parameters
-                raise InvalidDataError(m)
-            else:
-                raise APIError('Unexpected APIError code: %d [%s]' % (c, m))
+            self._on_api_error(e)
+
+    def prepare(self, deadline=None):
+        """
+        Call the DataSift API to prepare this historic query. See
+        User.call_api for the optional Deadline.
+        """
+        params = self._get_prepare_params()
+
+        try:
+            self._on_prepared(self._user.call_api('historics/prepare', params,
+                                                  deadline))
+
+        except APIError as e:
+            self._on_api_error(e)
 
-    def prepare(self):
+    def _get_prepare_params(self):
         """
-        Call the DataSift API to prepare this historic query.
+        Check that this historic query can be prepared and get the parameters
+        for the historics/prepare call.
         """
         if self._deleted:
             raise InvalidDataError('Cannot prepare a deleted Historics query')
@@ -288,36 +379,43 @@ class Historic:
         if self._playback_id is not False:
             raise InvalidDataError('This historic query has already been prepared')
 
-        try:
-            res = self._user.call_api(
-                'historics/prepare',
-                {
-                    'hash': self._hash,
-                    'start': self._start,
-                    'end': self._end,
-                    'name': self._name,
-                    'sources': ','.join(self._sources),
-                    'sample': self._sample
-                })
-
-            if not 'id' in res:
-                raise APIError('Prepared successfully but no playback ID in the response', -1)
-            self._playback_id = res['id']
-
-            if not 'dpus' in res:
-                raise APIError('Prepared successfully but no DPU cost in the response', -1)
-            self._dpus = res['dpus']
-
-            if not 'availability' in res:
-                raise APIError('Prepared successfully but no availability in the response', -1)
-            self._availability = res['availability']
-        except APIError as e:
-            m, c = e.args
-            if c == 400:
-                # Missing or invalid parameters
-                raise InvalidDataError(m)
-            else:
-                raise APIError('Unexpected APIError code: %d [%s]' % (c, m))
+        return {
+            'hash': self._hash,
+            'start': self._start,
+            'end': self._end,
+            'name': self._name,
+            'sources': ','.join(self._sources),
+            'sample': self._sample
+        }
+
+    def _on_prepared(self, res):
+        """
+        Store the details from a successful historics/prepare response.
+        """
+        if not 'id' in res:
+            raise APIError('Prepared successfully but no playback ID in the response', -1)
+        self._playback_id = res['id']
+
+        if not 'dpus' in res:
+            raise APIError('Prepared successfully but no DPU cost in the response', -1)
+        self._dpus = res['dpus']
+
+        if not 'availability' in res:
+            raise APIError('Prepared successfully but no availability in the response', -1)
+        self._availability = res['availability']
+
+    @staticmethod
+    def _on_api_error(e):
+        """
+        Turn an APIError from a historics/prepare or historics/get call into
+        the exception raised by prepare and reload_data.
+        """
+        m, c = e.args
+        if c == 400:
+            # Missing or invalid parameters
+            raise InvalidDataError(m)
+        else:
+            raise APIError('Unexpected APIError code: %d [%s]' % (c, m))
 
     def start(self):
         """
@@ -335,17 +433,7 @@ class Historic:
                 {'id': self._playback_id})
 
         except APIError as e:
-            m, c = e.args
-            if c == 400:
-                # Missing or invalid parameters
-                raise InvalidDataError(m)
-
-            elif c == 404:
-                # Historic query not found
-                raise InvalidDataError(m)
-
-            else:
-                raise APIError('Unexpected APIError code: %d [%s]' % (c, m))
+            self._on_command_error(e)
 
     def stop(self):
         """
@@ -363,18 +451,7 @@ class Historic:
                 {'id': self._playback_id})
 
         except APIError as e:
-            e, c = e.args
-
-            if c == 400:
-                # Missing or invalid parameters
-                raise InvalidDataError(e)
-
-            elif c == 404:
-                # Historic query not found
-                raise InvalidDataError(e)
-
-            else:
-                raise APIError('Unexpected APIError code: %d [%s]' % (c, e))
+            self._on_command_error(e)
 
     def delete(self):
         """
@@ -393,18 +470,25 @@ class Historic:
             self._deleted = True
 
         except APIError as e:
-            e, c = e.args
+            self._on_command_error(e)
 
-            if c == 400:
-                # Missing or invalid parameters
-                raise InvalidDataError(e)
+    @staticmethod
+    def _on_command_error(e):
+        """
+        Turn an APIError from a historics/start, stop or delete call into the
+        exception raised by those methods.
+        """
+        m, c = e.args
+        if c == 400:
+            # Missing or invalid parameters
+            raise InvalidDataError(m)
 
-            elif c == 404:
-                # Historic query not found
-                raise InvalidDataError(e)
+        elif c == 404:
+            # Historic query not found
+            raise InvalidDataError(m)
 
-            else:
-                raise APIError('Unexpected APIError code: %d [%s]' % (c, e))
+        else:
+            raise APIError('Unexpected APIError code: %d [%s]' % (c, m))
 
 
 from .user import User
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import codecs
+import json
+import re
+
+
+#-----------------------------------------------------------------------------
+# Incremental parsing of large JSON responses.
+#-----------------------------------------------------------------------------
+def iter_items(chunks, key=None):
+    """
+    Parse a JSON document arriving as an iterable of UTF-8 byte chunks and
+    yield the items of one array in it as soon as each has been read. The
+    array is the whole document, or the value of the given key of the
+    top-level object. An object in place of the array has its values
+    yielded. Only the item being parsed is held in memory, so peak memory
+    depends on the largest item rather than the size of the document.
+    Raises ValueError as soon as an invalid item has arrived, or KeyError
+    if the top-level object has no such key.
+    """
+    return _ItemParser(chunks).iter_items(key)
+
+
+class _ItemParser(object):
+
+    WHITESPACE = ' \t\n\r'
+    DELIMITERS = WHITESPACE + ',:]}'
+
+    # The characters that can end a value, inside a string, inside brackets
+    # and outside both.
+    STRING_SPECIALS = re.compile(r'["\\]')
+    NESTED_SPECIALS = re.compile(r'["\[\]{}]')
+    TOP_SPECIALS = re.compile(r'["\[\]{} \t\n\r,:]')
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def iter_items(self, key):
+        if key is not None:
+            self._expect('{')
+            if not self._find_member(key):
+                raise KeyError(key)
+
+        opener = self._peek()
+        if opener not in ('[', '{'):
+            raise ValueError('Expected an array at position %d' % self._pos)
+
+        self._pos += 1
+        closer = ']' if opener == '[' else '}'
+        if self._peek() == closer:
+            return
+
+        while True:
+            if opener == '{':
+                self._decode()
+                self._expect(':')
+
+            yield self._decode()
+
+            c = self._peek()
+            self._pos += 1
+            if c == closer:
+                return
+
+            if c != ',':
+                raise ValueError('Expected , or %s at position %d' % (closer, self._pos - 1))
+
+    def _find_member(self, key):
+        """
+        Skip the members of the top-level object up to the value of the
+        given key. Returns False if the object has no such key.
+        """
+        if self._peek() == '}':
+            return False
+
+        while True:
+            name = self._decode()
+            self._expect(':')
+            if name == key:
+                return True
+
+            self._decode()
+            c = self._peek()
+            self._pos += 1
+            if c == '}':
+                return False
+
+            if c != ',':
+                raise ValueError('Expected , or } at position %d' % (self._pos - 1))
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError('Expected %s at position %d' % (char, self._pos))
+
+        self._pos += 1
+
+    def _peek(self):
+        """
+        Skip whitespace and return the next character, or None at the end of
+        the document.
+        """
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in self.WHITESPACE:
+                self._pos += 1
+
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+
+            if not self._read():
+                return None
+
+    def _decode(self):
+        """
+        Decode the JSON value at the current position. If it can't be
+        decoded from the buffer, more of the document is read until the
+        value is complete and it is decoded once more, so an invalid value
+        raises ValueError without the rest of the document being read.
+        """
+        self._peek()
+        try:
+            value, end = self._json.raw_decode(self._buf, self._pos)
+            if end < len(self._buf) and self._buf[end] in self.DELIMITERS:
+                self._pos = end
+                return value
+
+        except ValueError:
+            # The value may not have arrived yet
+            pass
+
+        end = self._find_end()
+        value, stop = self._json.raw_decode(self._buf, self._pos)
+        if stop != end:
+            # Such as a number cut short by the end of the document, as
+            # "-2." decodes as -2
+            raise ValueError('Invalid value at position %d' % stop)
+
+        self._pos = end
+        return value
+
+    def _find_end(self):
+        """
+        Find the end of the JSON value at the current position, reading more
+        of the document until all of it has arrived. Strings and brackets
+        are matched without decoding anything, and the chunks read are only
+        joined once, so a large value takes time in proportion to its size.
+        Returns the end of the buffer if the document ends first.
+        """
+        state = [0, False, False]
+        end = self._scan(self._buf, self._pos, state)
+        if end is not None:
+            return end
+
+        parts = []
+        length = len(self._buf) - self._pos
+        while end is None:
+            text = self._next_text()
+            if text is None:
+                break
+
+            end = self._scan(text, 0, state)
+            if end is not None:
+                end += length
+
+            parts.append(text)
+            length += len(text)
+
+        self._buf = self._buf[self._pos:] + ''.join(parts)
+        self._pos = 0
+        if end is None:
+            return len(self._buf)
+
+        return end
+
+    def _scan(self, text, i, state):
+        """
+        Scan text from position i for the end of a value, where state holds
+        the bracket depth and whether the scan is in a string or after a
+        backslash, carried over from the text before. Returns the position
+        of the end, or None if the value goes on past the text.
+        """
+        depth, in_string, escaped = state
+        end = None
+        while True:
+            if escaped:
+                if i >= len(text):
+                    break
+
+                escaped = False
+                i += 1
+
+            if in_string:
+                match = self.STRING_SPECIALS.search(text, i)
+                if match is None:
+                    break
+
+                i = match.start() + 1
+                if match.group() == '\\':
+                    escaped = True
+                    continue
+
+                in_string = False
+                if depth == 0:
+                    end = i
+                    break
+
+                continue
+
+            if depth > 0:
+                match = self.NESTED_SPECIALS.search(text, i)
+
+            else:
+                match = self.TOP_SPECIALS.search(text, i)
+
+            if match is None:
+                break
+
+            i = match.start()
+            c = match.group()
+            if c == '"':
+                in_string = True
+
+            elif c in '[{':
+                depth += 1
+
+            elif c in ']}' and depth > 0:
+                depth -= 1
+                if depth == 0:
+                    end = i + 1
+                    break
+
+            else:
+                # A delimiter ends a value that isn't in brackets
+                end = i
+                break
+
+            i += 1
+
+        state[:] = [depth, in_string, escaped]
+        return end
+
+    def _read(self):
+        """
+        Read the next chunk, dropping the part of the buffer already parsed.
+        Returns False at the end of the document.
+        """
+        text = self._next_text()
+        if text is None:
+            return False
+
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        return True
+
+    def _next_text(self):
+        """
+        Read and decode the next chunk, or return None at the end of the
+        document.
+        """
+        if self._eof:
+            return None
+
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            return self._decoder.decode(b'', True)
+
+        return self._decoder.decode(chunk)
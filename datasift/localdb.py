@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import os
+import threading
+from contextlib import contextmanager
+from .exc import InvalidDataError
+
+try:
+    import sqlite3
+
+except ImportError:
+    sqlite3 = None
+
+
+#-----------------------------------------------------------------------------
+# The LocalDatabase class.
+#-----------------------------------------------------------------------------
+class LocalDatabase(object):
+    """
+    An SQLite database file for state shared by the processes on a host.
+    SQLite connections can't be shared between threads or carried over a
+    fork, so each thread of each process gets its own.
+    """
+
+    def __init__(self, path, schema, timeout=30):
+        """
+        Initialise a LocalDatabase at path, creating the file if it doesn't
+        exist. The schema statements are run on each new connection, so they
+        should be CREATE ... IF NOT EXISTS. Waiting for another process to
+        finish its transaction gives up after timeout seconds.
+        """
+        if sqlite3 is None:
+            raise InvalidDataError('The sqlite3 module is not available')
+
+        self._path = path
+        self._schema = schema
+        self._timeout = timeout
+        self._local = threading.local()
+
+    def get_path(self):
+        """
+        Get the path of the database file.
+        """
+        return self._path
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run the body of a with block in a transaction on this thread's
+        connection, which is the value of the with statement. The database
+        is locked for writing from the start, so a read followed by a write
+        can't be interleaved with another process.
+        """
+        conn = self.connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def connect(self):
+        """
+        Get this thread's connection to the database.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self._path, timeout=self._timeout,
+                                   isolation_level=None)
+            for statement in self._schema:
+                conn.execute(statement)
+
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+
+        return conn
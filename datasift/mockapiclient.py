@@ -1,10 +1,41 @@
 # -*- coding: utf-8 -*-
+import json
+
 class MockApiClient(object):
 
     _response = None
+    _callback = None
+    _last_timeout = None
 
     def set_response(self, response):
         self._response = response
 
-    def call(self, username, api_key, endpoint, params = {}, user_agent = 'DataSiftPython/1.0'):
+    def set_response_callback(self, callback):
+        """
+        Build each response by calling callback(endpoint, params) instead of
+        returning the response set with set_response.
+        """
+        self._callback = callback
+
+    def get_last_timeout(self):
+        """
+        Get the timeout passed with the last call.
+        """
+        return self._last_timeout
+
+    def call(self, username, api_key, endpoint, params = {}, user_agent = 'DataSiftPython/1.0', timeout = None):
+        self._last_timeout = timeout
+        if self._callback is not None:
+            return self._callback(endpoint, params)
+
         return self._response
+
+    def call_stream(self, username, api_key, endpoint, params = {}, user_agent = 'DataSiftPython/1.0', timeout = None):
+        """
+        Return the response as call does, but with its data encoded as JSON
+        and split into small chunks under 'body'.
+        """
+        res = dict(self.call(username, api_key, endpoint, params, user_agent, timeout))
+        content = json.dumps(res.pop('data')).encode('utf-8')
+        res['body'] = iter([content[i:i + 7] for i in range(0, len(content), 7)])
+        return res
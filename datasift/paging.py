@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import threading
+from collections import deque
+from .workers import map_concurrent
+
+
+class _PageFetch(object):
+    """
+    A page being fetched in a background thread and, once it has arrived,
+    its items or the exception raised fetching it.
+    """
+
+    def __init__(self, fetch_page, page):
+        self.page = page
+        self._fetch_page = fetch_page
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._result = self._fetch_page(self.page)
+
+        except Exception as e:
+            self._error = e
+
+    def wait(self):
+        """
+        Wait for the page and return its (items, count) result.
+        """
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+        return self._result
+
+    def is_short(self, per_page):
+        """
+        Returns True if the page has already arrived with fewer than per_page
+        items, making it the last page of the list.
+        """
+        if self._thread.is_alive() or self._error is not None:
+            return False
+
+        return len(self._result[0]) < per_page
+
+
+#-----------------------------------------------------------------------------
+# The PageIterator class.
+#-----------------------------------------------------------------------------
+class PageIterator(object):
+    """
+    A PageIterator iterates over the items of every page of a list endpoint,
+    fetching pages as they are needed. While one page is being consumed the
+    next prefetch pages are fetched in the background; a prefetch of 0 fetches
+    each page only when the one before has been used up. Pages past the end of
+    the list are never requested, and nothing more is fetched once iteration
+    stops.
+    """
+
+    def __init__(self, fetch_page, per_page=20, prefetch=1, first_page=1):
+        """
+        Initialise a PageIterator. The fetch_page function takes a page
+        number and returns a (items, count) tuple, where count is the total
+        number of items in the list.
+        """
+        if prefetch < 0:
+            raise ValueError('The prefetch depth must not be negative')
+
+        self._fetch_page = fetch_page
+        self._per_page = per_page
+        self._prefetch = prefetch
+        self._next_page = first_page
+        self._last_page = None
+        self._count = None
+        self._items = deque()
+        self._pending = deque()
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while not self._items:
+            if not self._pending:
+                if self._closed or self._is_past_end(self._next_page):
+                    raise StopIteration
+
+                self._start()
+
+            fetch = self._pending.popleft()
+            items, count = fetch.wait()
+            self._on_page(fetch.page, items, count)
+            self._items.extend(items)
+            self._fill()
+
+        return self._items.popleft()
+
+    next = __next__
+
+    def close(self):
+        """
+        Stop iterating. Pages already being fetched are left to finish, but
+        no more are requested.
+        """
+        self._closed = True
+        self._items.clear()
+        self._pending.clear()
+
+    def get_count(self):
+        """
+        Get the total number of items in the list, or None if no page has
+        been fetched yet.
+        """
+        return self._count
+
+    def _start(self):
+        self._pending.append(_PageFetch(self._fetch_page, self._next_page))
+        self._next_page += 1
+
+    def _fill(self):
+        """
+        Start fetching pages in the background up to the prefetch depth.
+        When the total count isn't known, a short page that has already
+        arrived ends the list, so no pages after it are requested.
+        """
+        if self._count is None:
+            for fetch in self._pending:
+                if fetch.is_short(self._per_page):
+                    self._set_last_page(fetch.page)
+                    break
+
+        while len(self._pending) < self._prefetch and not self._closed \
+                and not self._is_past_end(self._next_page):
+            self._start()
+
+    def _on_page(self, page, items, count):
+        self._count = count
+        if len(items) < self._per_page:
+            self._last_page = page
+
+        elif count is not None:
+            self._last_page = (int(count) + self._per_page - 1) // self._per_page
+
+        if self._last_page is not None:
+            self._set_last_page(self._last_page)
+
+    def _set_last_page(self, page):
+        self._last_page = page
+        # Drop any pages fetched before the end was known
+        while self._pending and self._pending[-1].page > page:
+            self._pending.pop()
+
+    def _is_past_end(self, page):
+        return self._last_page is not None and page > self._last_page
+
+
+def fetch_all(fetch_page, per_page=20, max_concurrency=8):
+    """
+    Fetch every page of a list endpoint and return all of the items in order
+    along with the total count. The first page gives the count, and the rest
+    are then fetched concurrently using up to max_concurrency threads. The
+    fetch_page function takes a page number and returns a (items, count)
+    tuple. If any page fails, the exception it raised is raised here.
+    """
+    items, count = fetch_page(1)
+    items = list(items)
+    if len(items) < per_page or count is None:
+        return items, count
+
+    last_page = (int(count) + per_page - 1) // per_page
+    for res in map_concurrent(fetch_page, range(2, last_page + 1), max_concurrency):
+        if isinstance(res, Exception):
+            raise res
+
+        items.extend(res[0])
+
+    return items, count
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 from .exc import InvalidDataError
+from .paging import PageIterator, fetch_all
 
 
 #-----------------------------------------------------------------------------
@@ -77,35 +78,46 @@ class PushDefinition:
 
         self._user.call_api('push/validate', params)
 
-    def subscribe_definition(self, definition, name):
+    def subscribe_definition(self, definition, name, deadline=None):
         """
-        Subscribe this endpoint to a Definition.
+        Subscribe this endpoint to a Definition, compiling it first if its
+        hash isn't known or in the user's compile cache.
         """
-        return self.subscribe_stream_hash(definition.get_hash(), name)
+        return self.subscribe_stream_hash(definition.get_hash(deadline), name,
+                                          deadline)
 
-    def subscribe_stream_hash(self, hash_, name):
+    def subscribe_stream_hash(self, hash_, name, deadline=None):
         """
         Subscribe this endpoint to a stream hash.
         """
-        return self.subscribe('hash', hash_, name)
+        return self.subscribe('hash', hash_, name, deadline)
 
-    def subscribe_historic(self, historic, name):
+    def subscribe_historic(self, historic, name, deadline=None):
         """
         Subscribe this endpoint to a Historic.
         """
-        return self.subscribe_historic_playback_id(historic.get_hash(), name)
+        return self.subscribe_historic_playback_id(historic.get_hash(), name,
+                                                   deadline)
 
-    def subscribe_historic_playback_id(self, playback_id, name):
+    def subscribe_historic_playback_id(self, playback_id, name, deadline=None):
         """
         Subscribe this endpoint to a historic playback ID.
         """
-        return self.subscribe('playback_id', playback_id, name)
+        return self.subscribe('playback_id', playback_id, name, deadline)
 
-    def subscribe(self, hash_type, hash_, name):
+    def subscribe(self, hash_type, hash_, name, deadline=None):
         """
         Subscribe this endpoint to a stream hash or historic playback ID. Note
         that this will activate the subscription if the initial status is set
-        to active.
+        to active. See User.call_api for the optional Deadline.
+        """
+        return PushSubscription(self._user, self._user.call_api(
+            'push/create', self._get_subscribe_params(hash_type, hash_, name),
+            deadline))
+
+    def _get_subscribe_params(self, hash_type, hash_, name):
+        """
+        Get the parameters for the push/create call.
         """
         params = {
             'name': name,
@@ -118,7 +130,7 @@ class PushDefinition:
         if len(self.get_initial_status()) > 0:
             params['initial_status'] = self.get_initial_status()
 
-        return PushSubscription(self._user, self._user.call_api('push/create', params))
+        return params
 
 
 #-----------------------------------------------------------------------------
@@ -154,6 +166,29 @@ class PushSubscription(PushDefinition):
         """
         return PushSubscription(user, user.call_api('push/get', {'id': id_}))
 
+    @staticmethod
+    def get_many(user, ids, max_concurrency=8):
+        """
+        Get several push subscriptions by ID concurrently. Returns a list of
+        PushSubscription objects in the order of the IDs, with the exception
+        raised in place of any that couldn't be fetched.
+        """
+        results = user.call_api_many([('push/get', {'id': id_}) for id_ in ids],
+                                     max_concurrency)
+
+        retval = []
+        for res in results:
+            if not isinstance(res, Exception):
+                try:
+                    res = PushSubscription(user, res)
+
+                except InvalidDataError as e:
+                    res = e
+
+            retval.append(res)
+
+        return retval
+
     @staticmethod
     def list(user, page=1, per_page=20, order_by=None, order_dir=None,
              include_finished=False, hash_type=None, hash_=None):
@@ -200,6 +235,41 @@ class PushSubscription(PushDefinition):
 
         return retval
 
+    @staticmethod
+    def list_all(user, per_page=20, order_by=None, order_dir=None,
+                 include_finished=False, hash_type=None, hash_=None,
+                 max_concurrency=8):
+        """
+        Get all of the push subscriptions in the given user's account in the
+        same form as list. The first page gives the number of pages, and the
+        rest are fetched concurrently using up to max_concurrency threads.
+        """
+        def fetch_page(page):
+            res = PushSubscription.list(user, page, per_page, order_by,
+                                        order_dir, include_finished,
+                                        hash_type, hash_)
+            return res['subscriptions'], res['count']
+
+        subscriptions, count = fetch_all(fetch_page, per_page, max_concurrency)
+        return {'count': count, 'subscriptions': subscriptions}
+
+    @staticmethod
+    def iter_list(user, per_page=20, order_by=None, order_dir=None,
+                  include_finished=False, hash_type=None, hash_=None,
+                  prefetch=1):
+        """
+        Iterate over all of the push subscriptions in the given user's
+        account in the order given, fetching up to prefetch pages ahead in
+        the background.
+        """
+        def fetch_page(page):
+            res = PushSubscription.list(user, page, per_page, order_by,
+                                        order_dir, include_finished,
+                                        hash_type, hash_)
+            return res['subscriptions'], res['count']
+
+        return PageIterator(fetch_page, per_page, prefetch)
+
     @classmethod
     def list_by_stream_hash(cls, user, hash_, page=1, per_page=20,
                             order_by=None, order_dir=None):
@@ -231,6 +301,36 @@ class PushSubscription(PushDefinition):
         Page through recent push subscription log entries, specifying the sort
         order.
         """
+        return user.call_api('push/log', PushSubscription._get_logs_params(
+            page, per_page, order_by, order_dir, id_))
+
+    @staticmethod
+    def iter_all_logs(user, per_page=20, order_by=None, order_dir=None,
+                      id_=None, prefetch=1):
+        """
+        Iterate over all of the recent push subscription log entries in the
+        order given, fetching up to prefetch pages ahead in the background.
+        """
+        def fetch_page(page):
+            res = PushSubscription.get_logs(user, page, per_page, order_by,
+                                            order_dir, id_)
+            return res['log_entries'], res.get('count')
+
+        return PageIterator(fetch_page, per_page, prefetch)
+
+    @staticmethod
+    def iter_logs(user, page=1, per_page=20, order_by=None, order_dir=None,
+                  id_=None):
+        """
+        Get a page of push subscription log entries, returning an iterator
+        that parses each entry as it arrives. Use this rather than get_logs
+        for a large per_page, as only one entry at a time is held in memory.
+        """
+        return user.iter_api('push/log', PushSubscription._get_logs_params(
+            page, per_page, order_by, order_dir, id_), 'log_entries')
+
+    @staticmethod
+    def _get_logs_params(page, per_page, order_by, order_dir, id_):
         if page < 1:
             raise InvalidDataError('The specified page number is invalid')
 
@@ -253,7 +353,7 @@ class PushSubscription(PushDefinition):
         if id_ is not None:
             params['id'] = id_
 
-        return user.call_api('push/log', params)
+        return params
 
     def __init__(self, user, data):
         """
@@ -449,5 +549,13 @@ class PushSubscription(PushDefinition):
         return PushSubscription.get_logs(self._user, page, per_page, order_by,
                                          order_dir, self.get_id())
 
+    def iter_log(self, per_page=20, order_by=None, order_dir=None, prefetch=1):
+        """
+        Iterate over the whole log for this subscription in the order
+        given, fetching up to prefetch pages ahead in the background.
+        """
+        return PushSubscription.iter_all_logs(self._user, per_page, order_by,
+                                              order_dir, self.get_id(), prefetch)
+
 
 from .user import User
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import json
+import os
+import threading
+import time
+from collections import deque
+from .exc import InvalidDataError
+
+
+#-----------------------------------------------------------------------------
+# Dead-letter stores for quarantined frames.
+#-----------------------------------------------------------------------------
+class MemoryDeadLetterStore(object):
+    """
+    Keeps the most recent max_frames quarantined frames in memory.
+    """
+
+    def __init__(self, max_frames=1000):
+        self._frames = deque(maxlen=max_frames)
+        self._lock = threading.Lock()
+
+    def add(self, frame, reason):
+        """
+        Store a frame along with the reason it was quarantined.
+        """
+        with self._lock:
+            self._frames.append((time.time(), reason, frame))
+
+    def get_frames(self):
+        """
+        Get the stored frames as a list of (timestamp, reason, frame) tuples,
+        oldest first.
+        """
+        with self._lock:
+            return list(self._frames)
+
+
+class FileDeadLetterStore(object):
+    """
+    Appends quarantined frames to a file as JSON lines. Once the file grows
+    past max_bytes it is moved to path + '.1', replacing any previous one,
+    so at most about twice max_bytes is used on disk.
+    """
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024):
+        self._path = path
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def add(self, frame, reason):
+        """
+        Store a frame along with the reason it was quarantined.
+        """
+        if isinstance(frame, bytes):
+            frame = frame.decode('utf-8', 'replace')
+
+        line = json.dumps({'time': time.time(), 'reason': reason, 'frame': frame})
+        with self._lock:
+            with open(self._path, 'a') as f:
+                f.write(line + '\n')
+                size = f.tell()
+
+            if size >= self._max_bytes:
+                backup = self._path + '.1'
+                if os.path.exists(backup):
+                    os.remove(backup)
+
+                os.rename(self._path, backup)
+
+    def get_frames(self):
+        """
+        Get the frames in the current file as a list of (timestamp, reason,
+        frame) tuples, oldest first.
+        """
+        with self._lock:
+            if not os.path.exists(self._path):
+                return []
+
+            with open(self._path) as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+
+        return [(e['time'], e['reason'], e['frame']) for e in entries]
+
+
+#-----------------------------------------------------------------------------
+# The Quarantine class.
+#-----------------------------------------------------------------------------
+class Quarantine(object):
+    """
+    A Quarantine lets a StreamConsumer carry on past frames it can't handle.
+    Bad frames go to a dead-letter store instead of stopping the consumer,
+    which is only stopped once more than max_error_rate of the last window
+    frames were bad. The rate isn't checked until min_frames frames have
+    been seen, so a bad frame straight after connecting doesn't trip it.
+    """
+
+    def __init__(self, store=None, max_error_rate=0.01, window=1000,
+                 min_frames=100):
+        if not 0 <= max_error_rate <= 1:
+            raise InvalidDataError('The specified max_error_rate is invalid')
+
+        if store is None:
+            store = MemoryDeadLetterStore()
+
+        self._store = store
+        self._max_error_rate = max_error_rate
+        self._min_frames = min(min_frames, window)
+        self._recent = deque(maxlen=window)
+        self._recent_bad = 0
+        self._frames = 0
+        self._quarantined = 0
+        self._lock = threading.Lock()
+
+    def frame_ok(self):
+        """
+        Record a frame that was handled successfully.
+        """
+        with self._lock:
+            self._record(False)
+
+    def add(self, frame, reason):
+        """
+        Quarantine a bad frame. Returns True if the error rate is now over
+        the threshold and the consumer should be stopped.
+        """
+        self._store.add(frame, reason)
+        with self._lock:
+            self._quarantined += 1
+            self._record(True)
+            return (len(self._recent) >= self._min_frames and
+                    self._recent_bad > self._max_error_rate * len(self._recent))
+
+    def get_store(self):
+        """
+        Get the dead-letter store.
+        """
+        return self._store
+
+    def get_stats(self):
+        """
+        Get the frame counters and the current error rate.
+        """
+        with self._lock:
+            rate = 0.0
+            if self._recent:
+                rate = float(self._recent_bad) / len(self._recent)
+
+            return {'frames': self._frames,
+                    'quarantined': self._quarantined,
+                    'error_rate': rate}
+
+    def _record(self, bad):
+        # Must be called with the lock held
+        if len(self._recent) == self._recent.maxlen and self._recent[0]:
+            self._recent_bad -= 1
+
+        self._recent.append(bad)
+        self._frames += 1
+        if bad:
+            self._recent_bad += 1
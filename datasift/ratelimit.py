@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import threading
+import time
+from contextlib import contextmanager
+from .exc import InvalidDataError
+from .localdb import LocalDatabase
+
+
+#-----------------------------------------------------------------------------
+# The RateLimiter class.
+#-----------------------------------------------------------------------------
+class RateLimiter(object):
+    """
+    A token bucket that paces API calls so they stay within the account's
+    rate limit. The size of the bucket and its refill rate are learnt from
+    the x-ratelimit-limit header, and the number of tokens is never allowed
+    to run ahead of x-ratelimit-remaining. Until the first response arrives
+    calls are not held back.
+
+    Each call reserves its tokens up front and is told how long to wait for
+    them, so callers are served in the order they asked and a limiter shared
+    by several threads divides the budget evenly between them.
+    """
+
+    def __init__(self, window=3600, limit=None):
+        """
+        Initialise a RateLimiter for a limit of calls per window seconds. The
+        DataSift rate limit applies per hour. If the limit is known it can be
+        given up front, otherwise it is taken from the first response.
+        """
+        if window <= 0:
+            raise InvalidDataError('The specified window is invalid')
+
+        self._window = float(window)
+        self._lock = threading.Lock()
+        self._state = {'limit': None, 'tokens': None, 'updated': time.time(),
+                       'waits': 0, 'wait_time': 0.0}
+
+        if limit is not None:
+            self.update(limit, limit)
+
+    def reserve(self, cost=1):
+        """
+        Reserve cost tokens and return the number of seconds the caller must
+        wait before using them. The tokens are taken whether or not the
+        caller waits, so this must only be called for a call that will be
+        made.
+        """
+        with self._transaction() as state:
+            if state['limit'] is None:
+                return 0
+
+            self._refill(state)
+            state['tokens'] -= cost
+            if state['tokens'] >= 0:
+                return 0
+
+            delay = -state['tokens'] * self._window / state['limit']
+            state['waits'] += 1
+            state['wait_time'] += delay
+            return delay
+
+    def try_reserve(self, cost=1):
+        """
+        Take cost tokens if they are available now, without going into debt.
+        Returns True if the tokens were taken.
+        """
+        with self._transaction() as state:
+            if state['limit'] is None:
+                return True
+
+            self._refill(state)
+            if state['tokens'] < cost:
+                return False
+
+            state['tokens'] -= cost
+            return True
+
+    def cancel(self, cost=1):
+        """
+        Give back cost tokens taken by reserve for a call that won't be made
+        after all.
+        """
+        with self._transaction() as state:
+            if state['limit'] is None or state['tokens'] is None:
+                return
+
+            self._refill(state)
+            state['tokens'] = min(float(state['limit']), state['tokens'] + cost)
+
+    def acquire(self, cost=1):
+        """
+        Block until cost tokens are available. Returns the number of seconds
+        spent waiting.
+        """
+        delay = self.reserve(cost)
+        if delay > 0:
+            time.sleep(delay)
+
+        return delay
+
+    def update(self, limit, remaining):
+        """
+        Update the bucket from the rate limit details of an API response.
+        Values that are missing or not numbers are ignored.
+        """
+        try:
+            limit = int(limit)
+            remaining = int(remaining)
+
+        except (TypeError, ValueError):
+            return
+
+        if limit <= 0:
+            return
+
+        with self._transaction() as state:
+            self._refill(state)
+            state['limit'] = limit
+            if state['tokens'] is None:
+                state['tokens'] = float(remaining)
+
+            else:
+                state['tokens'] = min(state['tokens'], float(remaining))
+
+    def get_limit(self):
+        """
+        Get the learnt limit, or None if it isn't known yet.
+        """
+        with self._transaction() as state:
+            return state['limit']
+
+    def get_stats(self):
+        """
+        Get the current state of the bucket and how often callers have had
+        to wait.
+        """
+        with self._transaction() as state:
+            self._refill(state)
+            return {'limit': state['limit'],
+                    'tokens': state['tokens'],
+                    'waits': state['waits'],
+                    'wait_time': state['wait_time']}
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Give exclusive access to the bucket state for the duration of a with
+        block. Changes made to the state dict are kept.
+        """
+        with self._lock:
+            yield self._state
+
+    def _refill(self, state):
+        now = time.time()
+        if state['limit'] is not None and state['tokens'] is not None:
+            state['tokens'] = min(float(state['limit']), state['tokens'] +
+                                  (now - state['updated']) * state['limit'] / self._window)
+
+        state['updated'] = now
+
+
+#-----------------------------------------------------------------------------
+# The SharedRateLimiter class.
+#-----------------------------------------------------------------------------
+class SharedRateLimiter(RateLimiter):
+    """
+    A RateLimiter whose bucket is kept in an SQLite database file, so that
+    every process on the host that uses the same file and account draws
+    from one budget. Each reservation or update is a single locked
+    transaction on the database.
+    """
+
+    def __init__(self, path, account, window=3600, limit=None, timeout=30):
+        """
+        Initialise a SharedRateLimiter for the given account, usually the
+        username, keeping its bucket in the database at path. The file is
+        created if it doesn't exist. Waiting for another process to finish
+        its transaction gives up after timeout seconds.
+        """
+        self._account = account
+        self._db = LocalDatabase(path, [
+            'CREATE TABLE IF NOT EXISTS rate_limits ('
+            'account TEXT PRIMARY KEY, rate_limit INTEGER, tokens REAL, '
+            'updated REAL, waits INTEGER, wait_time REAL)'], timeout)
+        RateLimiter.__init__(self, window)
+
+        with self._transaction():
+            # Creates the table and the account's row
+            pass
+
+        if limit is not None:
+            self.update(limit, limit)
+
+    def get_path(self):
+        """
+        Get the path of the database file.
+        """
+        return self._db.get_path()
+
+    @contextmanager
+    def _transaction(self):
+        with self._db.transaction() as conn:
+            row = conn.execute(
+                'SELECT rate_limit, tokens, updated, waits, wait_time '
+                'FROM rate_limits WHERE account = ?', (self._account,)).fetchone()
+            if row is None:
+                row = (None, None, time.time(), 0, 0.0)
+
+            state = dict(zip(('limit', 'tokens', 'updated', 'waits', 'wait_time'), row))
+            yield state
+
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_limits (account, rate_limit, tokens, '
+                'updated, waits, wait_time) VALUES (?, ?, ?, ?, ?, ?)',
+                (self._account, state['limit'], state['tokens'], state['updated'],
+                 state['waits'], state['wait_time']))
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import heapq
+import itertools
+import random
+import threading
+
+
+#-----------------------------------------------------------------------------
+# The ReconnectScheduler class.
+#-----------------------------------------------------------------------------
+class ReconnectScheduler(object):
+    """
+    A ReconnectScheduler is shared by all of the stream consumers of a User.
+    It spreads reconnects out using decorrelated jitter, so consumers that
+    were disconnected together don't all come back at the same moment, and
+    caps the number of connection attempts in progress at any one time.
+    Waiting attempts are let through in priority order, immediate reconnects
+    first.
+    """
+
+    # Kinds of connection attempt, in priority order.
+    IMMEDIATE = 0
+    CONNECT = 1
+    LINEAR = 2
+    EXPONENTIAL = 3
+
+    # (base delay, maximum delay, maximum attempts) for each backoff kind. See
+    # http://dev.datasift.com/docs/streaming-api for the recommended timings.
+    DEFAULT_BACKOFF = {
+        LINEAR: (1, 16, 16),
+        EXPONENTIAL: (10, 320, 6),
+    }
+
+    def __init__(self, max_concurrent=8, backoff=None):
+        """
+        Initialise a ReconnectScheduler allowing up to max_concurrent
+        connection attempts at once.
+        """
+        self._max_concurrent = max_concurrent
+        self._backoff = dict(self.DEFAULT_BACKOFF)
+        if backoff is not None:
+            self._backoff.update(backoff)
+
+        self._cond = threading.Condition(threading.Lock())
+        self._active = 0
+        self._waiting = []
+        self._sequence = itertools.count()
+
+    def next_delay(self, kind, attempt, previous=0):
+        """
+        Get the delay in seconds before the given attempt (counting from 1) of
+        a reconnect of the given kind, where previous is the delay used before
+        the last attempt of the same kind. The first attempt of a kind starts
+        from its base delay, whatever came before. Returns None once the
+        attempts are used up.
+        """
+        if kind not in self._backoff:
+            return 0
+
+        base, cap, max_attempts = self._backoff[kind]
+        if attempt > max_attempts:
+            return None
+
+        if attempt <= 1:
+            previous = 0
+
+        return min(cap, random.uniform(base, max(base, previous * 3)))
+
+    def acquire(self, kind, cancel=None):
+        """
+        Block until a connection attempt of the given kind may go ahead.
+        Returns False without acquiring if the cancel event gets set while
+        waiting.
+        """
+        ticket = (kind, next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while (self._active >= self._max_concurrent or
+                       self._waiting[0] != ticket):
+                    if cancel is not None and cancel.is_set():
+                        return False
+
+                    self._cond.wait()
+
+                if cancel is not None and cancel.is_set():
+                    return False
+
+                self._active += 1
+
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+        return True
+
+    def release(self):
+        """
+        Mark a connection attempt as finished.
+        """
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def wake(self):
+        """
+        Wake up all waiting attempts so they can check their cancel events.
+        """
+        with self._cond:
+            self._cond.notify_all()
+
+    def get_active(self):
+        """
+        Get the number of connection attempts in progress.
+        """
+        return self._active
+
+    def get_waiting(self):
+        """
+        Get the number of connection attempts waiting for a slot.
+        """
+        return len(self._waiting)
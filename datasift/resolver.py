@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import socket
+import threading
+import time
+
+# The value http.client passes as the timeout when none was given.
+_DEFAULT_TIMEOUT = getattr(socket, '_GLOBAL_DEFAULT_TIMEOUT', None)
+
+
+#-----------------------------------------------------------------------------
+# The DnsCache class.
+#-----------------------------------------------------------------------------
+class DnsCache(object):
+    """
+    A DnsCache remembers the addresses host names resolve to for ttl
+    seconds, so new connections to the API and stream hosts don't wait for
+    DNS. Give one to a PooledApiClient or a StreamTuning profile, or let
+    User.prewarm fill one. Instances are safe to share between threads.
+    """
+
+    def __init__(self, ttl=300):
+        self._ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def resolve(self, host, port):
+        """
+        Get the getaddrinfo results for a host and port, resolving them if
+        they aren't cached or have expired. Raises socket.error if the host
+        can't be resolved.
+        """
+        key = (host, port)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._hits += 1
+                return entry[1]
+
+            self._misses += 1
+
+        addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        with self._lock:
+            self._entries[key] = (time.time() + self._ttl, addresses)
+
+        return addresses
+
+    def create_connection(self, address, timeout=_DEFAULT_TIMEOUT,
+                          source_address=None):
+        """
+        Open a TCP connection like socket.create_connection, using the
+        cached addresses of the host. If none of them accept the connection
+        they are forgotten, so the next attempt resolves the host again.
+        """
+        host, port = address
+        err = None
+        for family, socktype, proto, canonname, sockaddr in self.resolve(host, port):
+            sock = None
+            try:
+                sock = socket.socket(family, socktype, proto)
+                if timeout is not _DEFAULT_TIMEOUT:
+                    sock.settimeout(timeout)
+
+                if source_address:
+                    sock.bind(source_address)
+
+                sock.connect(sockaddr)
+                return sock
+
+            except socket.error as e:
+                err = e
+                if sock is not None:
+                    sock.close()
+
+        self.forget(host, port)
+        if err is not None:
+            raise err
+
+        raise socket.error('getaddrinfo returned an empty list')
+
+    def forget(self, host, port):
+        """
+        Drop the cached addresses of a host and port.
+        """
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def clear(self):
+        """
+        Drop all cached addresses.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """
+        Get the number of hits, misses and cached hosts.
+        """
+        with self._lock:
+            return {'hits': self._hits,
+                    'misses': self._misses,
+                    'size': len(self._entries)}
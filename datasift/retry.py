@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import random
+import socket
+import threading
+import time
+from .exc import APIError, CircuitOpenError, TransportError
+
+
+#-----------------------------------------------------------------------------
+# The CircuitBreaker class.
+#-----------------------------------------------------------------------------
+class CircuitBreaker(object):
+    """
+    A CircuitBreaker stops calls to an endpoint that keeps failing. After
+    failure_threshold failures in a row it opens and calls fail straight
+    away for reset_timeout seconds. Then a single trial call is let through,
+    which closes the breaker if it succeeds or opens it again if it fails.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+
+    def allow(self):
+        """
+        Returns True if a call may go ahead.
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+
+            if self._state == self.OPEN and \
+                    time.time() - self._opened_at >= self._reset_timeout:
+                # Let one trial call through
+                self._state = self.HALF_OPEN
+                return True
+
+            return False
+
+    def record_success(self):
+        """
+        Record a call that succeeded.
+        """
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        """
+        Record a call that failed.
+        """
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or \
+                    self._failures >= self._failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.time()
+
+    def release(self):
+        """
+        Record a call that ended without reaching the API, such as one
+        rejected locally before it was sent. It says nothing about the API,
+        so a half-open trial slot is given back for another call to use.
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._state = self.OPEN
+
+    def get_state(self):
+        """
+        Get the state of the breaker: CLOSED, OPEN or HALF_OPEN.
+        """
+        with self._lock:
+            return self._state
+
+
+#-----------------------------------------------------------------------------
+# The RetryPolicy class.
+#-----------------------------------------------------------------------------
+class RetryPolicy(object):
+    """
+    A RetryPolicy retries API calls that failed because of a network error
+    or a temporary server error, waiting between attempts with decorrelated
+    jitter and for at least as long as any Retry-After header asks. Only
+    calls to endpoints that are safe to repeat are retried unless
+    retry_writes is set. Each endpoint has a CircuitBreaker so that calls
+    fail fast while the API is down instead of tying up threads.
+    """
+
+    # Endpoints that only read data, so a call can safely be repeated. The
+    # buffered stream endpoint isn't one, as each call consumes interactions.
+    READ_ENDPOINTS = frozenset([
+        'usage', 'dpu', 'compile', 'validate', 'historics/get',
+        'push/get', 'push/log', 'push/validate',
+    ])
+
+    # Response codes worth trying again.
+    RETRY_CODES = frozenset([429, 500, 502, 503, 504])
+
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=30,
+                 retry_writes=False, failure_threshold=5, reset_timeout=30):
+        """
+        Initialise a RetryPolicy making up to max_attempts attempts at each
+        call. Set retry_writes to also retry calls that change data, which
+        may then be applied twice if a response is lost.
+        """
+        self._max_attempts = max_attempts
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._retry_writes = retry_writes
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def is_retryable(self, endpoint):
+        """
+        Returns True if calls to the given endpoint may be retried.
+        """
+        return self._retry_writes or endpoint in self.READ_ENDPOINTS
+
+    def next_delay(self, previous=0):
+        """
+        Get the delay before the next attempt, where previous is the delay
+        used before the last one.
+        """
+        return min(self._max_delay,
+                   random.uniform(self._base_delay,
+                                  max(self._base_delay, previous * 3)))
+
+    def get_breaker(self, endpoint):
+        """
+        Get the CircuitBreaker for an endpoint.
+        """
+        with self._lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker(
+                    self._failure_threshold, self._reset_timeout)
+
+            return self._breakers[endpoint]
+
+    def run(self, endpoint, attempt, deadline=None):
+        """
+        Make a call to an endpoint, where attempt is a function that makes
+        one attempt and returns the API client's response dict. Returns the
+        response of the last attempt. Raises CircuitOpenError without
+        calling attempt if the endpoint's breaker is open. No retry is made
+        that couldn't start before the given Deadline.
+        """
+        breaker = self.get_breaker(endpoint)
+        max_attempts = self._max_attempts if self.is_retryable(endpoint) else 1
+        delay = 0
+        number = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError('Calls to %s are failing, not trying again yet' % endpoint, 503)
+
+            number += 1
+            res = None
+            error = None
+            # Every attempt settles the breaker, so that a half-open trial
+            # call can't leave it stuck. Only network errors and server
+            # errors count as failures; any answer below 500, a 429 included,
+            # shows the API is up.
+            try:
+                res = attempt()
+
+            except APIError as e:
+                # The API client raises APIError when the request failed
+                error = e
+                self._record(breaker, self._get_error_code(e))
+
+            except (TransportError, socket.error):
+                breaker.record_failure()
+                raise
+
+            except BaseException:
+                # Rejected before reaching the API, for example because the
+                # deadline passed while waiting for the rate limiter
+                breaker.release()
+                raise
+
+            else:
+                self._record(breaker, res['response_code'])
+
+            if error is not None:
+                if number >= max_attempts:
+                    raise error
+
+                delay = self._wait(res, delay, deadline)
+                if delay is None:
+                    raise error
+
+                continue
+
+            if res['response_code'] not in self.RETRY_CODES or number >= max_attempts:
+                return res
+
+            delay = self._wait(res, delay, deadline)
+            if delay is None:
+                return res
+
+    @staticmethod
+    def _record(breaker, response_code):
+        if response_code < 500:
+            breaker.record_success()
+
+        else:
+            breaker.record_failure()
+
+    @staticmethod
+    def _get_error_code(error):
+        """
+        Get the response code of an APIError, treating one without a code as
+        a server error.
+        """
+        try:
+            return int(error.args[1])
+
+        except (IndexError, TypeError, ValueError):
+            return 500
+
+    def _wait(self, res, previous, deadline):
+        """
+        Wait before the next attempt and return the delay used. Returns None
+        without waiting if the attempt couldn't start before the deadline.
+        """
+        delay = self.next_delay(previous)
+        retry_after = self._get_retry_after(res)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self._max_delay))
+
+        if deadline is not None and delay >= deadline.remaining():
+            return None
+
+        time.sleep(delay)
+        return delay
+
+    @staticmethod
+    def _get_retry_after(res):
+        """
+        Get the number of seconds asked for by a Retry-After header, if any.
+        """
+        if res is None:
+            return None
+
+        try:
+            return max(0, float(res.get('retry_after')))
+
+        except (TypeError, ValueError):
+            return None
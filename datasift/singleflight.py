@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import copy
+import threading
+from .exc import DeadlineExceededError
+from .retry import RetryPolicy
+
+
+class _Flight(object):
+    """
+    A call in progress and, once it has finished, its outcome.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+#-----------------------------------------------------------------------------
+# The SingleFlight class.
+#-----------------------------------------------------------------------------
+class SingleFlight(object):
+    """
+    A SingleFlight makes identical API calls that are in progress at the same
+    time share one request. The first caller makes the call, and callers
+    that arrive while it is running wait for it and get a copy of its result
+    or the exception it raised. Only calls to the given endpoints, which
+    default to the read endpoints, are shared.
+    """
+
+    def __init__(self, endpoints=None):
+        if endpoints is None:
+            endpoints = RetryPolicy.READ_ENDPOINTS
+
+        self._endpoints = frozenset(endpoints)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._coalesced = 0
+
+    def run(self, endpoint, params, call, deadline=None, generation=None):
+        """
+        Make a call to an endpoint with the given parameters, where call is a
+        function that makes the call and returns its result, unless an
+        identical call is already in progress. Calls are only shared with
+        callers that give the same generation, such as the ResponseCache
+        generation of the call, so a call that started before a change
+        isn't shared with callers that arrive after it. A caller waiting for
+        another caller's call gives up with DeadlineExceededError once the
+        given Deadline has passed.
+        """
+        key = self._get_key(endpoint, params)
+        if key is None:
+            return call()
+
+        key = (key, generation)
+
+        with self._lock:
+            self._calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+            else:
+                self._coalesced += 1
+
+        if leader:
+            try:
+                flight.result = call()
+                return flight.result
+
+            except Exception as e:
+                flight.error = e
+                raise
+
+            finally:
+                with self._lock:
+                    del self._flights[key]
+
+                flight.done.set()
+
+        if deadline is None:
+            flight.done.wait()
+
+        else:
+            flight.done.wait(deadline.remaining())
+
+        if not flight.done.is_set():
+            raise DeadlineExceededError('The deadline passed while waiting for a call to %s' % endpoint)
+
+        if flight.error is not None:
+            raise flight.error
+
+        return copy.deepcopy(flight.result)
+
+    def get_stats(self):
+        """
+        Get the number of calls that could be shared and the number of those
+        that were answered by another caller's request.
+        """
+        with self._lock:
+            return {'calls': self._calls,
+                    'coalesced': self._coalesced}
+
+    def _get_key(self, endpoint, params):
+        """
+        Get the key identifying a call, or None if it can't be shared.
+        """
+        if endpoint not in self._endpoints:
+            return None
+
+        try:
+            key = (endpoint, tuple(sorted(params.items())))
+            hash(key)
+
+        except TypeError:
+            return None
+
+        return key
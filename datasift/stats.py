@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import bisect
+import threading
+
+
+#-----------------------------------------------------------------------------
+# The Histogram class.
+#-----------------------------------------------------------------------------
+class Histogram(object):
+    """
+    A Histogram counts durations in fixed buckets whose bounds double from
+    1ms up to about 65s, so recording a value costs a binary search and
+    memory use doesn't grow with the number of values. Quantiles are
+    estimated as the upper bound of the bucket they fall in. It is not
+    thread safe on its own.
+    """
+
+    BOUNDS = tuple(0.001 * 2 ** i for i in range(17))
+
+    def __init__(self):
+        self._counts = [0] * (len(self.BOUNDS) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._min = None
+        self._max = None
+
+    def record(self, value):
+        """
+        Add a value to the histogram.
+        """
+        self._counts[bisect.bisect_left(self.BOUNDS, value)] += 1
+        self._count += 1
+        self._sum += value
+        if self._min is None or value < self._min:
+            self._min = value
+
+        if self._max is None or value > self._max:
+            self._max = value
+
+    def get_quantile(self, quantile):
+        """
+        Estimate the value below which the given fraction of the recorded
+        values fall, or None if nothing has been recorded.
+        """
+        if self._count == 0:
+            return None
+
+        rank = max(1, quantile * self._count)
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                if index < len(self.BOUNDS):
+                    return min(self.BOUNDS[index], self._max)
+
+                break
+
+        return self._max
+
+    def get_stats(self):
+        """
+        Get a summary of the histogram as a dict. The buckets are a list of
+        (upper bound, count) tuples, with None as the bound of the last one.
+        """
+        mean = None
+        if self._count > 0:
+            mean = self._sum / self._count
+
+        return {'count': self._count,
+                'mean': mean,
+                'min': self._min,
+                'max': self._max,
+                'p50': self.get_quantile(0.5),
+                'p95': self.get_quantile(0.95),
+                'p99': self.get_quantile(0.99),
+                'buckets': list(zip(self.BOUNDS + (None,), self._counts))}
+
+
+#-----------------------------------------------------------------------------
+# The ApiStats class.
+#-----------------------------------------------------------------------------
+class ApiStats(object):
+    """
+    ApiStats collects the measurements User.call_api makes for every API
+    request into per-endpoint totals and histograms of the total latency,
+    the time taken to connect and the time to the first byte of the
+    response. Instances are safe to share between threads and users.
+    """
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, measurement):
+        """
+        Add the measurement dict of one call, as passed to a call hook.
+        """
+        with self._lock:
+            stats = self._endpoints.get(measurement['endpoint'])
+            if stats is None:
+                stats = self._endpoints[measurement['endpoint']] = {
+                    'calls': 0,
+                    'errors': 0,
+                    'status_codes': {},
+                    'retries': 0,
+                    'request_bytes': 0,
+                    'response_bytes': 0,
+                    'rate_limit_remaining': None,
+                    'latency': Histogram(),
+                    'connect_time': Histogram(),
+                    'first_byte_time': Histogram(),
+                }
+
+            status = measurement['status']
+            stats['calls'] += 1
+            if status is None or not 200 <= status <= 299:
+                stats['errors'] += 1
+
+            stats['status_codes'][status] = stats['status_codes'].get(status, 0) + 1
+            stats['retries'] += measurement['retries']
+            stats['request_bytes'] += measurement['request_bytes'] or 0
+            stats['response_bytes'] += measurement['response_bytes'] or 0
+            if measurement['rate_limit_remaining'] is not None:
+                stats['rate_limit_remaining'] = measurement['rate_limit_remaining']
+
+            for key in ('latency', 'connect_time', 'first_byte_time'):
+                if measurement[key] is not None:
+                    stats[key].record(measurement[key])
+
+    def get_stats(self):
+        """
+        Get a dict mapping each endpoint called to a dict of its totals, the
+        last rate limit remaining and summaries of its histograms.
+        """
+        with self._lock:
+            retval = {}
+            for endpoint, stats in self._endpoints.items():
+                retval[endpoint] = dict(stats)
+                retval[endpoint]['status_codes'] = dict(stats['status_codes'])
+                for key in ('latency', 'connect_time', 'first_byte_time'):
+                    retval[endpoint][key] = stats[key].get_stats()
+
+            return retval
+
+    def clear(self):
+        """
+        Forget all of the measurements.
+        """
+        with self._lock:
+            self._endpoints.clear()
@@ -77,6 +77,9 @@ class StreamConsumer(object):
         """
         self._state = self.STATE_STOPPED
         self._auto_reconnect = True
+        self._tuning = None
+        self._base_url = None
+        self._quarantine = None
 
         if not isinstance(user, User):
             raise InvalidDataError('Please supply a valid User object when creating a StreamConsumer object')
@@ -117,6 +120,37 @@ class StreamConsumer(object):
 
         self._state = StreamConsumer.STATE_STOPPING
 
+    def get_tuning(self):
+        """
+        Get the StreamTuning profile for this consumer's connections. Falls
+        back to the user's profile, which may be None.
+        """
+        if self._tuning is not None:
+            return self._tuning
+
+        return self._user.get_stream_tuning()
+
+    def set_tuning(self, tuning):
+        """
+        Set a StreamTuning profile for this consumer only. Takes effect on
+        the next connection.
+        """
+        self._tuning = tuning
+
+    def get_quarantine(self):
+        """
+        Get the Quarantine used for bad frames, or None if bad frames stop
+        the consumer.
+        """
+        return self._quarantine
+
+    def set_quarantine(self, quarantine):
+        """
+        Set a Quarantine to keep the consumer running when it receives frames
+        it can't handle. Pass None to treat every bad frame as an error.
+        """
+        self._quarantine = quarantine
+
     def _get_url(self):
         """
         Gets the URL for the required stream.
@@ -125,11 +159,18 @@ class StreamConsumer(object):
         if self._user.use_ssl():
             protocol = 'https'
 
+        self._base_url = self._user.get_stream_base_url()
         if isinstance(self._hashes, list):
-            return "%s://%smulti?hashes=%s" % (protocol, self._user._stream_base_url, ','.join(self._hashes))
+            return "%s://%smulti?hashes=%s" % (protocol, self._base_url, ','.join(self._hashes))
 
         else:
-            return "%s://%s%s" % (protocol, self._user._stream_base_url, self._hashes)
+            return "%s://%s%s" % (protocol, self._base_url, self._hashes)
+
+    def _get_base_url(self):
+        """
+        Get the stream base URL of the current connection.
+        """
+        return self._base_url
 
     def _get_auth_header(self):
         """
@@ -188,41 +229,66 @@ class StreamConsumer(object):
 
         except Exception:
             if self._is_running():
-                self._on_error('Failed to decode JSON: %s' % json_data)
+                self._on_bad_frame(json_data, 'Failed to decode JSON')
 
-        else:
-            if 'status' in data:
-                # Status notification
-                if data['status'] == 'failure' or data['status'] == 'error':
-                    self._on_error(data['message'])
+            return
 
-                elif data['status'] == 'warning':
-                    self._on_warning(data['message'])
+        if not isinstance(data, dict) or \
+                ('hash' in data and not isinstance(data.get('data'), dict)):
+            self._on_bad_frame(json_data, 'Unhandled data received')
+            return
 
-                else:
-                    status = data['status']
-                    del data['status']
-                    self._on_status(status, data)
+        if 'status' in data:
+            # Status notification
+            if data['status'] == 'failure' or data['status'] == 'error':
+                self._on_error(data['message'])
 
-            elif 'hash' in data:
-                # Muli-stream data
-                if 'deleted' in data['data'] and data['data']['deleted']:
-                    self._event_handler.on_deleted(self, data['data'], data['hash'])
+            elif data['status'] == 'warning':
+                self._on_warning(data['message'])
 
-                else:
-                    self._event_handler.on_interaction(self, data['data'], data['hash'])
+            else:
+                status = data['status']
+                del data['status']
+                self._on_status(status, data)
 
-            elif 'interaction' in data:
-                # Single stream data
-                if 'deleted' in data and data['deleted']:
-                    self._event_handler.on_deleted(self, data, self._hashes)
+        elif 'hash' in data:
+            # Muli-stream data
+            if 'deleted' in data['data'] and data['data']['deleted']:
+                self._event_handler.on_deleted(self, data['data'], data['hash'])
 
-                else:
-                    self._event_handler.on_interaction(self, data, self._hashes)
+            else:
+                self._event_handler.on_interaction(self, data['data'], data['hash'])
+
+        elif 'interaction' in data:
+            # Single stream data
+            if 'deleted' in data and data['deleted']:
+                self._event_handler.on_deleted(self, data, self._hashes)
 
             else:
-                # Unknown message
-                self._on_error('Unhandled data received: %s' % json_data)
+                self._event_handler.on_interaction(self, data, self._hashes)
+
+        else:
+            # Unknown message
+            self._on_bad_frame(json_data, 'Unhandled data received')
+            return
+
+        if self._quarantine is not None:
+            self._quarantine.frame_ok()
+
+    def _on_bad_frame(self, json_data, reason):
+        """
+        Called for a frame that can't be handled. Without a quarantine this
+        is an error, otherwise the frame is quarantined and the consumer is
+        only stopped if too many frames have been bad.
+        """
+        if self._quarantine is None:
+            self._on_error('%s: %s' % (reason, json_data))
+
+        elif self._quarantine.add(json_data, reason):
+            self._on_error('%s: %s (too many bad frames, stopping)' % (reason, json_data))
+
+        else:
+            self._on_warning('%s, frame quarantined' % reason)
 
     def _on_error(self, message):
         """
@@ -1,13 +1,15 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
-from threading import Thread
-from time import sleep
+from threading import Thread, Event
+import codecs
 import json
 import socket
 import select
-import platform
-from . import urllib_request, HTTPError, URLError
+from . import urllib_request
+from .exc import TransportError
+from .transport import UrllibTransport
 from .streamconsumer import StreamConsumer
+from .reconnect import ReconnectScheduler
 
 # Try to import ssl for SSLError, fake it if not available
 try:
@@ -17,7 +19,10 @@ except ImportError:
     class ssl(object):
         SSLError = None
 
+# Connection settings used when no StreamTuning profile is set.
 receiving_timeout = 5  # in seconds
+connect_timeout = 30  # in seconds
+read_size = 16384  # in bytes
 
 
 def factory(user, definition, event_handler):
@@ -54,6 +59,36 @@ class ImmediateReconnect(Exception):
     pass
 
 
+class EndpointFailover(Exception):
+    """
+    This exception is thrown within the consumer when the stream endpoint it
+    was using has been taken out of rotation. The consumer reconnects to
+    another endpoint straight away.
+    """
+    pass
+
+
+class ConsumerInterrupted(Exception):
+    """
+    This exception is thrown within the consumer when the thread has been
+    woken up because the consumer is stopping.
+    """
+    pass
+
+
+def _make_wakeup_pair():
+    """
+    Create a connected pair of sockets used to wake a consumer thread up from
+    select. Returns (None, None) on platforms without socketpair support, in
+    which case the thread notices a stop within the select timeout instead.
+    """
+    try:
+        return socket.socketpair()
+
+    except (AttributeError, socket.error):
+        return None, None
+
+
 #---------------------------------------------------------------------------
 # The StreamConsumer_HTTP class
 #---------------------------------------------------------------------------
@@ -71,6 +106,15 @@ class StreamConsumer_HTTP(StreamConsumer):
         self._thread = StreamConsumer_HTTP_Thread(self)
         self._thread.start()
 
+    def stop(self):
+        """
+        Stop the consumer, waking the consumer thread up so that the stream
+        is closed straight away rather than on the next read timeout.
+        """
+        StreamConsumer.stop(self)
+        if self._thread is not None:
+            self._thread.interrupt()
+
     def join_thread(self, timeout=None):
         if self._thread:
             if not self._thread.is_alive():
@@ -96,81 +140,116 @@ class StreamConsumer_HTTP_Thread(Thread):
         self._consumer = consumer
         self._auto_reconnect = auto_reconnect
         self._buffer = ''
-        self._sock = None
+        self._response = None
+        self._decoder = None
         self._chunked = False
+        self._interrupted = Event()
+        self._wakeup_r, self._wakeup_w = _make_wakeup_pair()
+
+        self._tuning = consumer.get_tuning()
+        self._transport = consumer._user.get_stream_transport()
+        if self._transport is None:
+            self._transport = UrllibTransport(self._open)
+        if self._tuning is None:
+            self._read_size = read_size
+            self._receiving_timeout = receiving_timeout
+
+        else:
+            self._read_size = self._tuning.read_size
+            self._receiving_timeout = self._tuning.receiving_timeout
+
+    def interrupt(self):
+        """
+        Wake the thread up from any blocking wait. Used when the consumer is
+        stopped from another thread.
+        """
+        self._interrupted.set()
+        self._consumer._user.get_reconnect_scheduler().wake()
+        if self._wakeup_w is not None:
+            try:
+                self._wakeup_w.send(b'x')
+
+            except socket.error:
+                pass
 
     def run(self):
         """
         Connect and consume the data. If connection fails we back off a bit
         and try again. See http://dev.datasift.com/docs/streaming-api for
-        timing details.
+        timing details. The delays and the number of concurrent connection
+        attempts are coordinated across all consumers of the user by its
+        ReconnectScheduler.
         """
+        scheduler = self._consumer._user.get_reconnect_scheduler()
+        kind = ReconnectScheduler.CONNECT
+        attempt = 0
         connection_delay = 0
         first_connection = True
         while (first_connection or self._auto_reconnect) and self._consumer._is_running(True):
-            if self._sock is not None:
-                self._sock.close()
+            if self._response is not None:
+                self._response.close()
                 self._buffer = ''
-                self._sock = None
+                self._response = None
 
             first_connection = False
             if connection_delay > 0:
-                sleep(connection_delay)
+                self._interrupted.wait(connection_delay)
+                if self._interrupted.is_set():
+                    break
+
+            if not scheduler.acquire(kind, self._interrupted):
+                break
 
             try:
                 headers = {'Auth': '%s' % self._consumer._get_auth_header(),
                            'User-Agent': self._consumer._get_user_agent()}
-                req = urllib_request.Request(self._consumer._get_url(), None, headers)
 
                 try:
-                    resp = urllib_request.urlopen(req, None, 30)
+                    self._response = self._transport.request(
+                        'GET', self._consumer._get_url(), None, headers,
+                        connect_timeout)
 
-                except HTTPError as err:
-                    resp = err
+                except TransportError as err:
+                    if self._fail_over():
+                        raise EndpointFailover('Connection failed: %s' % err)
+
+                    if self._has_other_endpoints():
+                        # Keep trying until the endpoint is taken out of
+                        # rotation, backing off as for any network error
+                        raise LinearBackoffError(str(err))
 
-                except URLError as err:
                     self._consumer._on_error('Connection failed: %s' % err)
                     break
 
-                # Determine whether the data will be chunked
-                resp_info = resp.info()
-                if 'Transfer-Encoding' in resp_info and 'chunked' in resp_info['Transfer-Encoding']:
-                    self._chunked = True
+                finally:
+                    scheduler.release()
 
-                self._consumer._on_header(resp_info)
+                # Determine whether the data will be chunked
+                self._chunked = self._response.raw_chunked
+                self._decoder = codecs.getincrementaldecoder('utf-8')('replace')
+                self._consumer._on_header(self._response.headers)
 
                 # Get the HTTP response code
-                resp_code = resp.getcode()
-
-                # Get the raw socket. Both urllib2 and httplib buffer data which
-                # was causing a bug where low throughput streams would appear
-                # to not deliver interactions (until enough data had been
-                # received to trigger a buffer flush). By using the raw socket
-                # directly we bypass that buffering and receive all data in
-                # realtime. Lots of stuff was changed between python v2 and v3,
-                # including the way we access and use the raw socket, so we
-                # need to know which version we're running under and handle it
-                # accordingly.
-
-                try:
-                    ver, meh, meh = platform.python_version_tuple()
-                    if int(ver) == 2:
-                        self._sock = resp.fp._sock.fp._sock
-
-                    else:
-                        self._sock = resp.fp.raw
-                        # The recv method was renamed read in v3, we use recv
-                        self._sock.recv = self._sock.read
+                resp_code = self._response.status
 
-                    self._sock.settimeout(receiving_timeout)
+                # The default transport reads the raw socket, bypassing the
+                # buffering in urllib and httplib that made low throughput
+                # streams appear not to deliver interactions. A body that
+                # can't be waited on with select is read with a short
+                # timeout instead, so that stopping is still noticed.
+                if self._response.fileno() is None:
+                    self._response.set_timeout(1)
 
-                except AttributeError:
-                    pass
+                else:
+                    self._response.set_timeout(self._receiving_timeout)
 
                 # Now do something based on the HTTP response code
                 if resp_code == 200:
                     # Connected OK, reset the reconnect delay
+                    kind = ReconnectScheduler.CONNECT
+                    attempt = 0
                     connection_delay = 0
+                    self._report_success()
                     # Tell the user's code
                     self._consumer._on_connect()
                     # Start reading and processing the stream
@@ -180,9 +259,14 @@ class StreamConsumer_HTTP_Thread(Thread):
                     # Problem with the request, read the error response and
                     # tell the user about it
                     json_data = 'init'
-                    if self._sock is not None:
-                        while json_data and len(json_data) <= 4:
-                            json_data = self._read_chunk()
+                    if self._response is not None:
+                        try:
+                            while json_data and len(json_data) <= 4:
+                                json_data = self._read_chunk()
+
+                        except (LinearBackoffError, ImmediateReconnect):
+                            # The body ended without a trailing newline
+                            json_data = self._buffer
 
                         try:
                             data = json.loads(json_data)
@@ -203,66 +287,157 @@ class StreamConsumer_HTTP_Thread(Thread):
 
                     break
 
+                elif self._fail_over():
+                    raise EndpointFailover('Received %s response' % resp_code)
+
                 else:
                     raise ExponentialBackoffError('Received %s response' % resp_code)
 
             except ExponentialBackoffError as e:
-                if connection_delay == 0:
-                    connection_delay = 10
-
-                elif connection_delay < 320:
-                    connection_delay *= 2
-
-                else:
+                attempt = self._next_attempt(kind, ReconnectScheduler.EXPONENTIAL, attempt)
+                kind = ReconnectScheduler.EXPONENTIAL
+                connection_delay = scheduler.next_delay(kind, attempt, connection_delay)
+                if connection_delay is None:
                     self._consumer._on_error('%s, no more retries' % str(e))
                     break
 
-                self._consumer._on_warning('%s, retrying in %s seconds' % (str(e), connection_delay))
+                self._consumer._on_warning('%s, retrying in %.1f seconds' % (str(e), connection_delay))
 
             except LinearBackoffError as e:
-                if connection_delay < 16:
-                    connection_delay += 1
-                    self._consumer._on_warning('Connection failed (%s), retrying in %s seconds' % (str(e), connection_delay))
-
-                else:
+                attempt = self._next_attempt(kind, ReconnectScheduler.LINEAR, attempt)
+                kind = ReconnectScheduler.LINEAR
+                connection_delay = scheduler.next_delay(kind, attempt, connection_delay)
+                if connection_delay is None:
                     self._consumer._on_error('Connection failed (%s), no more retries' % (str(e)))
                     break
 
+                self._consumer._on_warning('Connection failed (%s), retrying in %.1f seconds' % (str(e), connection_delay))
+
             except ImmediateReconnect as e:
+                kind = ReconnectScheduler.IMMEDIATE
+                attempt = 0
                 connection_delay = 0
                 self._consumer._on_warning('No data received for over a minute, reconnecting immediately')
 
+            except EndpointFailover as e:
+                kind = ReconnectScheduler.CONNECT
+                attempt = 0
+                connection_delay = 0
+                self._consumer._on_warning('%s, failing over to another stream endpoint' % str(e))
+
+            except ConsumerInterrupted:
+                break
+
         self._consumer._on_disconnect()
 
         # Don't leave the socket open - it leaves the stream running
-        if self._sock is not None:
-            self._sock.close()
+        if self._response is not None:
+            self._response.close()
             self._buffer = ''
-            self._sock = None
+            self._response = None
+
+        for sock in (self._wakeup_r, self._wakeup_w):
+            if sock is not None:
+                sock.close()
+
+        self._wakeup_r = self._wakeup_w = None
+
+
+    def _open(self, req, timeout):
+        """
+        Open the stream request, through the tuning profile if there is one.
+        """
+        if self._tuning is None:
+            return urllib_request.urlopen(req, None, timeout)
+
+        return self._tuning.open(req)
+
+    def _fail_over(self):
+        """
+        Report a failed connection to the user's stream endpoints. Returns
+        True if the consumer should reconnect to a different endpoint
+        straight away.
+        """
+        endpoints = self._consumer._user.get_stream_endpoints()
+        if endpoints is None:
+            return False
+
+        return endpoints.report_failure(self._consumer._get_base_url())
+
+    def _has_other_endpoints(self):
+        """
+        Returns True if the user has other stream endpoints that a failed
+        endpoint could be replaced by.
+        """
+        endpoints = self._consumer._user.get_stream_endpoints()
+        return endpoints is not None and len(endpoints.get_base_urls()) > 1
+
+    def _report_success(self):
+        """
+        Report a successful connection to the user's stream endpoints.
+        """
+        endpoints = self._consumer._user.get_stream_endpoints()
+        if endpoints is not None:
+            endpoints.report_success(self._consumer._get_base_url())
 
+    @staticmethod
+    def _next_attempt(previous_kind, kind, attempt):
+        """
+        Count the attempts of a backoff kind, starting again whenever the kind
+        of failure changes.
+        """
+        if previous_kind == kind:
+            return attempt + 1
+
+        return 1
 
-    def _raw_read(self, bytes = 16384):
+    def _raw_read(self, bytes = None):
         """
-        Read a chunk of up to 'bytes' bytes from the socket.
+        Read a chunk of up to 'bytes' bytes from the socket, by default the
+        read size of the tuning profile.
         """
+        if bytes is None:
+            bytes = self._read_size
+
         timeout = 0
-        ready_to_read, ready_to_write, in_error = select.select([self._sock], [], [self._sock], 1)
-        if len(in_error) > 0:
-            raise socket.error('Something went wrong with the socket')
+        if self._response.fileno() is None:
+            if self._interrupted.is_set():
+                raise ConsumerInterrupted()
+
+            ready_to_read = [self._response]
+
+        else:
+            watched = [self._response]
+            if self._wakeup_r is not None:
+                watched.append(self._wakeup_r)
+
+            ready_to_read, ready_to_write, in_error = select.select(watched, [], [self._response], 1)
+            if len(in_error) > 0:
+                raise socket.error('Something went wrong with the socket')
+
+            if self._wakeup_r is not None and self._wakeup_r in ready_to_read:
+                raise ConsumerInterrupted()
 
         if len(ready_to_read) > 0:
             try:
-                data = self._sock.recv(bytes)
-                if len(data) > 0:
-                    # Strip carriage returns to make splitting lines easier
-                    self._buffer += data.replace('\r', '')
+                data = self._response.read_some(bytes)
+                if len(data) == 0:
+                    raise LinearBackoffError('The stream was closed')
 
-            except (socket.error, ssl.SSLError) as e:
-                raise LinearBackoffError(str(e))
+                if not isinstance(data, str):
+                    data = self._decoder.decode(data)
+
+                # Strip carriage returns to make splitting lines easier
+                self._buffer += data.replace('\r', '')
 
             except socket.timeout:
                 # socket timeout
-                timeout = receiving_timeout
+                timeout = self._receiving_timeout
+                if self._response.fileno() is None:
+                    timeout = 1
+
+            except (socket.error, ssl.SSLError) as e:
+                raise LinearBackoffError(str(e))
 
         else:
             # one second for select timeout
@@ -276,7 +451,7 @@ class StreamConsumer_HTTP_Thread(Thread):
         read until the buffer contains at least length bytes.
         """
         timewaited = 0
-        while (length == 0 and '\n' in self._buffer) or (length > 0 and len(self._buffer) < length):
+        while (length == 0 and '\n' not in self._buffer) or (length > 0 and len(self._buffer) < length):
             timeout = self._raw_read()
             timewaited += timeout
             if timeout == 0:
@@ -7,6 +7,24 @@ if __name__ == '__main__':
     from datasift.tests.test_user import TestUser
     from datasift.tests.test_definition import TestDefinition
     from datasift.tests.test_push import TestPush
+    from datasift.tests.test_consumerpool import TestConsumerPool
+    from datasift.tests.test_reconnect import TestReconnectScheduler
+    from datasift.tests.test_tuning import TestStreamTuning
+    from datasift.tests.test_endpoints import TestStreamEndpoints
+    from datasift.tests.test_quarantine import TestQuarantine
+    from datasift.tests.test_apiclient import TestPooledApiClient
+    from datasift.tests.test_asyncuser import TestAsyncUser
+    from datasift.tests.test_ratelimit import TestRateLimiter, TestSharedRateLimiter
+    from datasift.tests.test_retry import TestRetryPolicy
+    from datasift.tests.test_hedging import TestHedgePolicy
+    from datasift.tests.test_deadline import TestDeadline
+    from datasift.tests.test_cache import TestCompileCache, TestResponseCache, TestPersistentCompileCache
+    from datasift.tests.test_singleflight import TestSingleFlight
+    from datasift.tests.test_jsonstream import TestJsonStream
+    from datasift.tests.test_paging import TestPageIterator, TestPaging
+    from datasift.tests.test_stats import TestApiStats
+    from datasift.tests.test_transport import TestTransport
+    from datasift.tests.test_resolver import TestDnsCache
 
     # Run the tests
     unittest.main()
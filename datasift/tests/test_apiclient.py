@@ -0,0 +1,237 @@
+import gzip
+import io
+import json
+import socket
+import threading
+import time
+import unittest
+import datasift.user
+from datasift.apiclient import ApiClient, PooledApiClient
+from datasift.exc import APIError
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+try:
+    from socketserver import ThreadingMixIn
+
+except ImportError:
+    from SocketServer import ThreadingMixIn
+
+
+def gzip_bytes(data):
+    buf = io.BytesIO()
+    f = gzip.GzipFile(fileobj=buf, mode='wb')
+    f.write(data)
+    f.close()
+    return buf.getvalue()
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), StandInHandler)
+        self.connections = 0
+        self.requests = []
+        self.responses = {}
+        self.delays = {}
+        self.truncated = set()
+        self.compress = False
+        self.sockets = []
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    A stand-in for the API that keeps connections alive. Responds with the
+    data set for the path in server.responses, or echoes the path and
+    parameters back.
+    """
+    protocol_version = 'HTTP/1.1'
+    # Send headers and body without waiting for delayed ACKs
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+        self.server.sockets.append(self.connection)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        params = self.rfile.read(length).decode('utf-8')
+        self.server.requests.append((self.path, self.headers.get('Auth'), params,
+                                     self.headers.get('Accept-Encoding')))
+        time.sleep(self.server.delays.get(self.path, 0))
+        data = self.server.responses.get(self.path, {'path': self.path, 'params': params})
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if self.server.compress and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip_bytes(body)
+            self.send_header('Content-Encoding', 'gzip')
+
+        length = len(body)
+        if self.path in self.server.truncated:
+            # Promise more of the body than is sent, then hang up
+            length += 10
+            self.close_connection = True
+
+        self.send_header('Content-Length', str(length))
+        self.send_header('x-ratelimit-limit', '10000')
+        self.send_header('x-ratelimit-remaining', '9999')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestPooledApiClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer()
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.01,))
+        self.thread.daemon = True
+        self.thread.start()
+        self.base_url = '127.0.0.1:%d/v1/' % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_call(self):
+        client = PooledApiClient(self.base_url, use_ssl=False)
+        res = client.call('user', 'key', 'validate', {'csdl': 'x'})
+        self.assertEqual(res['response_code'], 200)
+        self.assertEqual(res['data'], {'path': '/v1/validate.json', 'params': 'csdl=x'})
+        self.assertEqual(res['rate_limit'], '10000')
+        self.assertEqual(res['rate_limit_remaining'], '9999')
+        self.assertEqual(self.server.requests[0][1], 'user:key')
+        client.close()
+
+    def test_compressed_response(self):
+        self.server.compress = True
+        self.server.responses['/v1/push/log.json'] = {
+            'count': 500,
+            'log_entries': [{'subscription_id': 'x' * 32, 'success': True,
+                             'message': 'The delivery was successful'}] * 500}
+
+        user = datasift.user.User('user', 'key')
+        user.set_api_client(PooledApiClient(self.base_url, use_ssl=False))
+        res = user.call_api('push/log', {})
+
+        self.assertEqual(res['count'], 500)
+        self.assertEqual(len(res['log_entries']), 500)
+        self.assertEqual(self.server.requests[0][3], 'gzip')
+        stats = user.get_transfer_stats()
+        self.assertTrue(stats['wire_bytes'] * 10 < stats['decoded_bytes'],
+                        'The response was not compressed: %s' % stats)
+
+    def test_read_body(self):
+        body = json.dumps({'a': 'b' * 100000}).encode('utf-8')
+        compressed = gzip_bytes(body)
+
+        content, wire_bytes = ApiClient._read_body(io.BytesIO(compressed),
+                                                   {'content-encoding': 'gzip'})
+        self.assertEqual(content, body)
+        self.assertEqual(wire_bytes, len(compressed))
+
+        content, wire_bytes = ApiClient._read_body(io.BytesIO(body), {})
+        self.assertEqual(content, body)
+        self.assertEqual(wire_bytes, len(body))
+
+        self.assertRaises(APIError, ApiClient._read_body, io.BytesIO(b'not gzip'),
+                          {'content-encoding': 'gzip'})
+
+    def test_streamed_response(self):
+        self.server.compress = True
+        self.server.responses['/v1/push/log.json'] = {
+            'count': 500,
+            'log_entries': [{'id': i, 'message': 'The delivery was successful'}
+                            for i in range(500)]}
+
+        client = PooledApiClient(self.base_url, use_ssl=False)
+        user = datasift.user.User('user', 'key')
+        user.set_api_client(client)
+        entries = user.iter_api('push/log', {}, 'log_entries')
+        self.assertEqual(user.get_rate_limit_remaining(), '9999')
+        self.assertEqual([entry['id'] for entry in entries], list(range(500)))
+        self.assertEqual(client.get_pool().get_idle_count(), 1)
+
+        # Stopping early closes the connection instead of reusing it
+        entries = user.iter_api('push/log', {}, 'log_entries')
+        self.assertEqual(next(entries)['id'], 0)
+        entries.close()
+        self.assertEqual(client.get_pool().get_idle_count(), 0)
+        client.close()
+
+    def test_connection_reuse(self):
+        client = PooledApiClient(self.base_url, use_ssl=False)
+        for i in range(5):
+            client.call('user', 'key', 'usage', {'period': 'hour'})
+
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(client.get_pool().get_idle_count(), 1)
+        client.close()
+
+    def test_timings(self):
+        client = PooledApiClient(self.base_url, use_ssl=False)
+        res = client.call('user', 'key', 'usage', {'period': 'hour'})
+        self.assertEqual(res['request_bytes'], len('period=hour'))
+        self.assertTrue(res['connect_time'] >= 0)
+        self.assertTrue(res['first_byte_time'] >= res['connect_time'])
+
+        # A pooled connection needs no connecting
+        res = client.call('user', 'key', 'usage', {'period': 'hour'})
+        self.assertEqual(res['connect_time'], None)
+        client.close()
+        self.assertEqual(client.get_pool().get_idle_count(), 0)
+
+    def test_stale_connection(self):
+        client = PooledApiClient(self.base_url, use_ssl=False)
+        client.call('user', 'key', 'usage')
+
+        # The server closes the idle connection
+        for sock in self.server.sockets:
+            sock.shutdown(socket.SHUT_RDWR)
+
+        time.sleep(0.05)
+        res = client.call('user', 'key', 'usage')
+        self.assertEqual(res['response_code'], 200)
+        self.assertEqual(self.server.connections, 2)
+        client.close()
+
+    def test_timed_out_write_not_resent(self):
+        client = PooledApiClient(self.base_url, use_ssl=False)
+        client.call('user', 'key', 'usage')
+
+        # The request reaches the server on the reused connection, so a
+        # timeout waiting for the response must not send it again
+        self.server.delays['/v1/push/create.json'] = 0.3
+        self.assertRaises(APIError, client.call, 'user', 'key', 'push/create',
+                          {'name': 'x'}, timeout=0.1)
+        time.sleep(0.3)
+        paths = [request[0] for request in self.server.requests]
+        self.assertEqual(paths.count('/v1/push/create.json'), 1)
+        client.close()
+
+    def test_idle_eviction(self):
+        client = PooledApiClient(self.base_url, use_ssl=False, idle_timeout=0.05)
+        client.call('user', 'key', 'usage')
+        time.sleep(0.1)
+        client.call('user', 'key', 'usage')
+        self.assertEqual(self.server.connections, 2)
+        client.close()
+
+    def test_user(self):
+        user = datasift.user.User('user', 'key')
+        user.set_api_client(PooledApiClient(self.base_url, use_ssl=False))
+        self.assertEqual(user.get_usage('day'), {'path': '/v1/usage.json', 'params': 'period=day'})
+        self.assertEqual(user.get_rate_limit_remaining(), '9999')
+
+
+if __name__ == '__main__':
+    unittest.main()
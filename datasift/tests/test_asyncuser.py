@@ -0,0 +1,127 @@
+import socket
+import threading
+import time
+import unittest
+from datetime import datetime
+import datasift.exc
+import datasift.user
+from datasift.tests import data
+from datasift.tests.test_apiclient import StandInServer
+
+try:
+    from unittest import mock
+
+except ImportError:
+    import mock
+
+try:
+    import asyncio
+    from datasift.asyncuser import AsyncUser, AsyncApiClient
+
+except (ImportError, SyntaxError):
+    asyncio = None
+
+
+@unittest.skipIf(asyncio is None, 'asyncio is not available')
+class TestAsyncUser(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer()
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.01,))
+        self.thread.daemon = True
+        self.thread.start()
+        self.server.responses['/compile.json'] = {
+            'hash': data.definition_hash,
+            'created_at': '2011-12-13 14:15:16',
+            'dpu': 10,
+        }
+        self.user = datasift.user.User(data.username, data.api_key)
+        self.client = AsyncApiClient('127.0.0.1:%d/' % self.server.server_address[1],
+                                     use_ssl=False, pool_size=8, max_concurrency=8)
+        self.async_user = AsyncUser(self.user, self.client)
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.async_user.close())
+        self.loop.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_call_api(self):
+        res = self.loop.run_until_complete(self.async_user.get_usage('day'))
+        self.assertEqual(res, {'path': '/usage.json', 'params': 'period=day'})
+        self.assertEqual(self.user.get_rate_limit_remaining(), '9999')
+
+    def test_compile(self):
+        definition = self.user.create_definition(data.definition)
+        hash_ = self.loop.run_until_complete(self.async_user.get_hash(definition))
+        self.assertEqual(hash_, data.definition_hash)
+        self.assertEqual(definition.get_total_dpu(), 10)
+        self.assertEqual(definition.get_created_at(), datetime(2011, 12, 13, 14, 15, 16))
+
+    def test_prepare_historic_missing_field(self):
+        self.server.responses['/historics/prepare.json'] = {
+            'dpus': data.historic_dpus,
+            'availability': {},
+        }
+        historic = self.user.create_historic(data.definition_hash, data.historic_start_date,
+                                             data.historic_end_date, data.historic_sources,
+                                             data.historic_sample, data.historic_name)
+        try:
+            self.loop.run_until_complete(self.async_user.prepare_historic(historic))
+            self.fail('Expected APIError was not thrown')
+
+        except datasift.exc.APIError as e:
+            self.assertTrue('no playback ID' in e.args[0])
+
+    def test_stale_connection(self):
+        self.loop.run_until_complete(self.async_user.call_api('usage', {}))
+
+        # The server closes the idle connection
+        for sock in self.server.sockets:
+            sock.shutdown(socket.SHUT_RDWR)
+
+        time.sleep(0.05)
+        res = self.loop.run_until_complete(self.async_user.call_api('usage', {}))
+        self.assertEqual(res['path'], '/usage.json')
+        self.assertEqual(self.server.connections, 2)
+
+    def test_failed_response_not_resent(self):
+        self.loop.run_until_complete(self.async_user.call_api('usage', {}))
+
+        # The request reaches the server on the reused connection, so losing
+        # the response must not send it again
+        self.server.truncated.add('/push/create.json')
+        self.assertRaises(datasift.exc.APIError, self.loop.run_until_complete,
+                          self.client.call('user', 'key', 'push/create', {'name': 'x'}))
+        paths = [request[0] for request in self.server.requests]
+        self.assertEqual(paths.count('/push/create.json'), 1)
+
+    def test_timed_out_connection_is_closed(self):
+        self.server.delays['/push/get.json'] = 0.5
+        close = asyncio.StreamWriter.close
+        # Newer Pythons close a writer when it is garbage collected, which
+        # would hide one left open
+        with mock.patch.object(asyncio.StreamWriter, '__del__', lambda writer: None,
+                               create=True), \
+                mock.patch.object(asyncio.StreamWriter, 'close', autospec=True,
+                                  side_effect=close) as mock_close:
+            self.assertRaises(datasift.exc.APIError, self.loop.run_until_complete,
+                              self.client.call('user', 'key', 'push/get', {'id': 1},
+                                               timeout=0.05))
+            self.assertEqual(mock_close.call_count, 1)
+
+        self.assertEqual(self.client.get_idle_count(), 0)
+
+    def test_concurrent_calls(self):
+        # This module must stay importable where async syntax isn't
+        tasks = [self.loop.create_task(self.async_user.call_api('push/get', {'id': i}))
+                 for i in range(50)]
+        results = self.loop.run_until_complete(asyncio.gather(*tasks))
+        self.assertEqual([r['params'] for r in results], ['id=%d' % i for i in range(50)])
+        self.assertTrue(self.server.connections <= 8)
+        self.assertEqual(self.client.get_idle_count(), self.server.connections)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,298 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime
+from datasift.tests import data
+import datasift.user
+import datasift.definition
+import datasift.mockapiclient
+import datasift.exc
+from datasift.cache import CompileCache, PersistentCompileCache, ResponseCache
+from datasift.singleflight import SingleFlight
+
+
+def fill_cache(path, start, count):
+    """
+    Store compile results in a persistent cache from a separate process.
+    """
+    cache = PersistentCompileCache(path)
+    for i in range(start, start + count):
+        cache.put(('interaction.content contains "%d"' % i).encode('utf-8'),
+                  'hash%d' % i, datetime(2011, 12, 13, 14, 15, 16), i)
+
+
+class TestCompileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.user = datasift.user.User(data.username, data.api_key)
+        self.mock_api_client = datasift.mockapiclient.MockApiClient()
+        self.user.set_api_client(self.mock_api_client)
+        self.calls = []
+
+        def respond(endpoint, params):
+            self.calls.append(endpoint)
+            res = {'created_at': '2011-12-13 14:15:16', 'dpu': 10}
+            if endpoint == 'compile':
+                res['hash'] = data.definition_hash
+
+            return {'response_code': 200, 'data': res,
+                    'rate_limit': 200, 'rate_limit_remaining': 150}
+
+        self.mock_api_client.set_response_callback(respond)
+
+    def test_lru_and_ttl(self):
+        cache = CompileCache(max_size=2, ttl=0.1)
+        cache.put(b'a', 'hash_a', None, 1)
+        cache.put(b'b', 'hash_b', None, 2)
+        self.assertEqual(cache.get(b'a', 'hash')['hash'], 'hash_a')
+
+        # b is now the least recently used
+        cache.put(b'c', 'hash_c', None, 3)
+        self.assertEqual(cache.get(b'b', 'hash'), None)
+        self.assertEqual(cache.get(b'c', 'dpu')['dpu'], 3)
+        self.assertEqual(cache.get(b'c', 'created_at'), None)
+
+        time.sleep(0.1)
+        self.assertEqual(cache.get(b'a', 'hash'), None)
+        self.assertEqual(cache.get_stats(), {'hits': 2, 'misses': 3, 'size': 1})
+
+    def test_put_merges_details(self):
+        cache = CompileCache()
+        created_at = datetime(2011, 12, 13, 14, 15, 16)
+        cache.put(b'a', None, created_at, 10)
+        cache.put(b'a', 'hash_a')
+        self.assertEqual(cache.get(b'a', 'hash'),
+                         {'hash': 'hash_a', 'created_at': created_at, 'dpu': 10})
+
+        cache.remove(b'a')
+        self.assertEqual(cache.get(b'a', 'hash'), None)
+
+    def test_definitions_share_compile_results(self):
+        cache = CompileCache()
+        self.user.set_compile_cache(cache)
+        self.assertEqual(self.user.get_compile_cache(), cache)
+
+        definition = datasift.definition.Definition(self.user, data.definition)
+        self.assertEqual(definition.get_hash(), data.definition_hash)
+        self.assertEqual(self.calls, ['compile'])
+
+        definition = datasift.definition.Definition(self.user, data.definition)
+        self.assertEqual(definition.get_hash(), data.definition_hash)
+        self.assertEqual(definition.get_total_dpu(), 10)
+        self.assertEqual(definition.get_created_at(), datetime(2011, 12, 13, 14, 15, 16))
+        self.assertEqual(self.calls, ['compile'])
+        self.assertEqual(cache.get_stats()['hits'], 1)
+
+    def test_validate_results_are_cached(self):
+        self.user.set_compile_cache(CompileCache())
+
+        definition = datasift.definition.Definition(self.user, data.definition)
+        self.assertEqual(definition.get_total_dpu(), 10)
+        self.assertEqual(self.calls, ['validate'])
+
+        definition = datasift.definition.Definition(self.user, data.definition)
+        self.assertEqual(definition.get_created_at(), datetime(2011, 12, 13, 14, 15, 16))
+        self.assertEqual(self.calls, ['validate'])
+
+        # Validating doesn't give a hash, so that still needs a compile
+        self.assertEqual(definition.get_hash(), data.definition_hash)
+        self.assertEqual(self.calls, ['validate', 'compile'])
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.user = datasift.user.User(data.username, data.api_key)
+        self.mock_api_client = datasift.mockapiclient.MockApiClient()
+        self.user.set_api_client(self.mock_api_client)
+        self.cache = ResponseCache({'usage': 0.1})
+        self.user.set_response_cache(self.cache)
+        self.calls = []
+
+        def respond(endpoint, params):
+            self.calls.append(endpoint)
+            return {'response_code': 200,
+                    'data': {'id': params.get('id'), 'status': 'active'},
+                    'rate_limit': 200, 'rate_limit_remaining': 150}
+
+        self.mock_api_client.set_response_callback(respond)
+
+    def test_reads_are_cached(self):
+        self.assertEqual(self.user.get_response_cache(), self.cache)
+
+        res = self.user.call_api('push/get', {'id': 'a'})
+        res['status'] = 'changed'
+        self.assertEqual(self.user.call_api('push/get', {'id': 'a'}),
+                         {'id': 'a', 'status': 'active'})
+        self.user.call_api('push/get', {'id': 'b'})
+        self.assertEqual(self.calls, ['push/get', 'push/get'])
+
+        # Writes and endpoints without a TTL are never cached
+        self.user.call_api('push/stop', {'id': 'c'})
+        self.user.call_api('push/stop', {'id': 'c'})
+        self.user.call_api('dpu', {'hash': data.definition_hash})
+        self.user.call_api('dpu', {'hash': data.definition_hash})
+        self.assertEqual(len(self.calls), 6)
+
+    def test_entries_expire(self):
+        self.user.call_api('usage', {'period': 'hour'})
+        self.user.call_api('usage', {'period': 'hour'})
+        self.assertEqual(self.calls, ['usage'])
+
+        time.sleep(0.1)
+        self.user.call_api('usage', {'period': 'hour'})
+        self.assertEqual(self.calls, ['usage', 'usage'])
+
+    def test_changes_invalidate_by_id(self):
+        self.user.call_api('push/get', {'id': 'a'})
+        self.user.call_api('push/get', {'id': 'b'})
+        self.user.call_api('push/get', {'page': 1, 'per_page': 20})
+        self.user.call_api('historics/get', {'id': 'a'})
+        self.calls = []
+
+        self.user.call_api('push/pause', {'id': 'a'})
+        self.assertEqual(self.cache.get_stats()['invalidations'], 2)
+
+        self.user.call_api('push/get', {'id': 'a'})
+        self.user.call_api('push/get', {'id': 'b'})
+        self.user.call_api('push/get', {'page': 1, 'per_page': 20})
+        self.user.call_api('historics/get', {'id': 'a'})
+        self.assertEqual(self.calls, ['push/pause', 'push/get', 'push/get'])
+
+    def test_failed_changes_invalidate(self):
+        self.user.call_api('historics/get', {'id': 'a'})
+
+        def fail(endpoint, params):
+            return {'response_code': 500, 'data': {'error': 'Internal error'},
+                    'rate_limit': 200, 'rate_limit_remaining': 150}
+
+        self.mock_api_client.set_response_callback(fail)
+        self.assertRaises(datasift.exc.APIError, self.user.call_api,
+                          'historics/delete', {'id': 'a'})
+        self.assertEqual(self.cache.get('historics/get', {'id': 'a'}), None)
+
+    def test_change_during_read_is_not_hidden(self):
+        # A read misses, a change is made, then the read's older response
+        # arrives
+        self.assertEqual(self.cache.get('push/get', {'id': 'a'}), None)
+        generation = self.cache.get_generation('push/get', {'id': 'a'})
+        self.cache.invalidate('push/update', {'id': 'a'})
+        self.cache.put('push/get', {'id': 'a'}, {'status': 'old'}, generation)
+        self.assertEqual(self.cache.get('push/get', {'id': 'a'}), None)
+
+        # Changes to other ids leave it alone
+        generation = self.cache.get_generation('push/get', {'id': 'a'})
+        self.cache.invalidate('push/update', {'id': 'b'})
+        self.cache.put('push/get', {'id': 'a'}, {'status': 'new'}, generation)
+        self.assertEqual(self.cache.get('push/get', {'id': 'a'}), {'status': 'new'})
+
+    def test_reads_after_a_change_are_not_shared(self):
+        self.user.set_single_flight(SingleFlight())
+        started = threading.Event()
+        release = threading.Event()
+        statuses = ['old', 'new']
+
+        def respond(endpoint, params):
+            self.calls.append(endpoint)
+            if endpoint == 'push/get':
+                status = statuses.pop(0)
+                if status == 'old':
+                    started.set()
+                    release.wait(1)
+
+                return {'response_code': 200, 'data': {'id': 'a', 'status': status},
+                        'rate_limit': 200, 'rate_limit_remaining': 150}
+
+            return {'response_code': 200, 'data': {},
+                    'rate_limit': 200, 'rate_limit_remaining': 150}
+
+        self.mock_api_client.set_response_callback(respond)
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(self.user.call_api('push/get', {'id': 'a'})))
+        thread.start()
+        started.wait(1)
+
+        self.user.call_api('push/update', {'id': 'a'})
+        follower = threading.Thread(
+            target=lambda: results.append(self.user.call_api('push/get', {'id': 'a'})))
+        follower.start()
+        follower.join(1)
+        release.set()
+        thread.join()
+
+        self.assertEqual([res['status'] for res in results], ['new', 'old'])
+        self.assertEqual(self.user.call_api('push/get', {'id': 'a'})['status'], 'new')
+
+
+class TestPersistentCompileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'compile.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_entries_persist(self):
+        created_at = datetime(2011, 12, 13, 14, 15, 16)
+        cache = PersistentCompileCache(self.path, ttl=0.2)
+        cache.put(data.definition, None, created_at, 0.1)
+        cache.put(data.definition, data.definition_hash)
+
+        cache = PersistentCompileCache(self.path, ttl=0.2)
+        self.assertEqual(cache.get_path(), self.path)
+        self.assertEqual(cache.get(data.definition, 'hash'),
+                         {'hash': data.definition_hash, 'created_at': created_at, 'dpu': 0.1})
+        self.assertEqual(cache.get(data.invalid_definition, 'hash'), None)
+        self.assertEqual(cache.get_stats(), {'hits': 1, 'misses': 1, 'size': 1})
+
+        time.sleep(0.2)
+        self.assertEqual(cache.get(data.definition, 'hash'), None)
+        self.assertEqual(cache.get_stats()['size'], 0)
+
+    def test_cold_start_uses_the_store(self):
+        calls = []
+
+        def respond(endpoint, params):
+            calls.append(endpoint)
+            return {'response_code': 200,
+                    'data': {'hash': data.definition_hash,
+                             'created_at': '2011-12-13 14:15:16', 'dpu': 10},
+                    'rate_limit': 200, 'rate_limit_remaining': 150}
+
+        for i in range(2):
+            # A fresh user and in-memory cache each time, as after a restart
+            user = datasift.user.User(data.username, data.api_key)
+            mock_api_client = datasift.mockapiclient.MockApiClient()
+            mock_api_client.set_response_callback(respond)
+            user.set_api_client(mock_api_client)
+            user.set_compile_cache(CompileCache(store=PersistentCompileCache(self.path)))
+
+            definition = datasift.definition.Definition(user, data.definition)
+            self.assertEqual(definition.get_hash(), data.definition_hash)
+            self.assertEqual(definition.get_total_dpu(), 10)
+
+        self.assertEqual(calls, ['compile'])
+        self.assertEqual(user.get_compile_cache().get_stats()['hits'], 1)
+
+    def test_processes_share_the_cache(self):
+        processes = [multiprocessing.Process(target=fill_cache, args=(self.path, i * 20, 20))
+                     for i in range(4)]
+        for process in processes:
+            process.start()
+
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+        cache = PersistentCompileCache(self.path)
+        self.assertEqual(cache.get_stats()['size'], 80)
+        self.assertEqual(cache.get(b'interaction.content contains "42"', 'hash')['hash'], 'hash42')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import time
+import unittest
+import datasift.user
+import datasift.mockapiclient
+from datasift.consumerpool import ConsumerPool, RestartPolicy
+from datasift.streamconsumer import StreamConsumerEventHandler
+
+try:
+    from unittest import mock
+
+except ImportError:
+    import mock
+
+
+RUN = 'datasift.streamconsumer_http.StreamConsumer_HTTP_Thread.run'
+
+
+def fake_run(thread):
+    """
+    Stands in for the stream thread: connects, delivers one interaction and
+    then either fails or waits to be stopped.
+    """
+    consumer = thread._consumer
+    consumer._on_connect()
+    consumer._on_data('{"interaction": {"id": 1}}')
+    if consumer._hashes == ['broken']:
+        consumer._on_error('Something broke')
+
+    else:
+        thread._interrupted.wait(5)
+
+    consumer._on_disconnect()
+
+
+class CountingHandler(StreamConsumerEventHandler):
+
+    def __init__(self):
+        self.interactions = 0
+
+    def on_interaction(self, consumer, interaction, hash_):
+        self.interactions += 1
+
+
+class TestConsumerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.user = datasift.user.User('fake', 'user')
+        self.user.set_api_client(datasift.mockapiclient.MockApiClient())
+
+    def _wait_for(self, condition, timeout=2):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            time.sleep(0.01)
+
+    @mock.patch(RUN, fake_run)
+    def test_start_stop(self):
+        pool = ConsumerPool(self.user)
+        handler = CountingHandler()
+        for i in range(20):
+            pool.add(['hash%d' % i], handler)
+
+        pool.start()
+        self._wait_for(lambda: pool.get_stats()['interactions'] == 20)
+
+        started = time.time()
+        pool.stop()
+        self.assertTrue(time.time() - started < 1, 'Stopping the pool was not prompt')
+
+        stats = pool.get_stats()
+        self.assertEqual(stats['consumers'], 20)
+        self.assertEqual(stats['running'], 0)
+        self.assertEqual(stats['connects'], 20)
+        self.assertEqual(stats['disconnects'], 20)
+        self.assertEqual(handler.interactions, 20)
+
+    @mock.patch(RUN, fake_run)
+    def test_max_running(self):
+        pool = ConsumerPool(self.user, max_running=2)
+        consumers = [pool.add(['hash%d' % i]) for i in range(5)]
+        pool.start()
+        self._wait_for(lambda: pool.get_stats()['connects'] == 2)
+        stats = pool.get_stats()
+        self.assertEqual(stats['running'], 2)
+        self.assertEqual(stats['pending'], 3)
+
+        # A consumer stopped by its owner frees its slot for a pending one
+        consumers[0].stop()
+        self._wait_for(lambda: pool.get_stats()['connects'] == 3)
+        self.assertEqual(pool.get_stats()['pending'], 2)
+        pool.stop()
+
+    @mock.patch(RUN, fake_run)
+    def test_restart_policy(self):
+        policy = RestartPolicy(max_restarts=2, delay=0.01)
+        pool = ConsumerPool(self.user, restart_policy=policy)
+        pool.add(['broken'])
+        pool.start()
+        self._wait_for(lambda: pool.get_stats()['abandoned'] == 1)
+        stats = pool.get_stats()
+        self.assertEqual(stats['restarts'], 2)
+        self.assertEqual(stats['errors'], 3)
+        self.assertEqual(stats['failed'], 1)
+        pool.stop()
+
+    @mock.patch(RUN, fake_run)
+    def test_events(self):
+        pool = ConsumerPool(self.user)
+        consumer = pool.add(['hash'])
+        events = pool.events(timeout=2)
+        pool.start()
+        name = None
+        for event_consumer, name, args in events:
+            if name == 'on_interaction':
+                break
+
+        self.assertEqual(name, 'on_interaction')
+        self.assertTrue(event_consumer is consumer)
+        self.assertEqual(args, ({'interaction': {'id': 1}}, ['hash']))
+        pool.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import time
+import unittest
+from datasift.tests import data
+import datasift.user
+import datasift.definition
+import datasift.push
+import datasift.mockapiclient
+from datasift.cache import CompileCache
+from datasift.deadline import Deadline
+from datasift.exc import APIError, DeadlineExceededError
+from datasift.ratelimit import RateLimiter
+from datasift.retry import RetryPolicy
+
+
+class TestDeadline(unittest.TestCase):
+
+    def setUp(self):
+        self.user = datasift.user.User(data.username, data.api_key)
+        self.mock_api_client = datasift.mockapiclient.MockApiClient()
+        self.user.set_api_client(self.mock_api_client)
+        self.mock_api_client.set_response({
+            'response_code': 200,
+            'data': {
+                'hash': data.definition_hash,
+                'created_at': '2011-12-13 14:15:16',
+                'dpu': 10,
+            },
+            'rate_limit': 200,
+            'rate_limit_remaining': 150,
+        })
+
+    def test_endpoint_timeouts(self):
+        # The API client applies the endpoint defaults itself
+        self.user.call_api('validate', {'csdl': data.definition})
+        self.assertEqual(self.mock_api_client.get_last_timeout(), None)
+        self.assertEqual(self.user.get_api_timeout('validate'), 5)
+        self.assertEqual(self.user.get_api_timeout('historics/prepare'), 30)
+        self.assertEqual(self.user.get_api_timeout('push/stop'), 10)
+
+        self.user.call_api('historics/prepare', {}, Deadline(60))
+        self.assertTrue(29 < self.mock_api_client.get_last_timeout() <= 30)
+
+        self.user.set_api_timeout('validate', 2)
+        self.assertEqual(self.user.get_api_timeout('validate'), 2)
+        self.user.call_api('validate', {'csdl': data.definition})
+        self.assertEqual(self.mock_api_client.get_last_timeout(), 2)
+
+        self.user.set_api_timeout('validate', None)
+        self.assertEqual(self.user.get_api_timeout('validate'), 5)
+
+    def test_deadline_caps_timeouts(self):
+        deadline = Deadline(1)
+        definition = datasift.definition.Definition(self.user, data.definition)
+        definition.compile(deadline)
+        self.assertEqual(definition.get_hash(), data.definition_hash)
+        self.assertTrue(self.mock_api_client.get_last_timeout() <= 1)
+
+        self.mock_api_client.set_response({
+            'response_code': 200,
+            'data': {
+                'id': data.push_id,
+                'name': data.push_name,
+                'created_at': data.push_created_at,
+                'status': data.push_status,
+                'hash': data.push_hash,
+                'hash_type': data.push_hash_stream_type,
+                'output_type': data.push_output_type,
+                'output_params': {},
+                'last_request': None,
+                'last_success': None
+            },
+            'rate_limit': 200,
+            'rate_limit_remaining': 150,
+        })
+        pushdef = datasift.push.PushDefinition(self.user)
+        pushdef.set_output_type(data.push_output_type)
+        time.sleep(0.1)
+        pushsub = pushdef.subscribe_definition(definition, data.push_name, deadline)
+        self.assertEqual(pushsub.get_id(), data.push_id)
+        self.assertTrue(self.mock_api_client.get_last_timeout() <= 0.9)
+
+    def test_subscribe_cached_definition(self):
+        calls = []
+
+        def respond(endpoint, params):
+            calls.append(endpoint)
+            return {'response_code': 200,
+                    'data': {'hash': data.definition_hash,
+                             'created_at': '2011-12-13 14:15:16', 'dpu': 10,
+                             'id': data.push_id, 'name': data.push_name,
+                             'status': data.push_status,
+                             'hash_type': data.push_hash_stream_type,
+                             'output_type': data.push_output_type,
+                             'output_params': {}, 'last_request': None,
+                             'last_success': None},
+                    'rate_limit': 200, 'rate_limit_remaining': 150}
+
+        self.mock_api_client.set_response_callback(respond)
+        self.user.set_compile_cache(CompileCache())
+        datasift.definition.Definition(self.user, data.definition).compile()
+
+        # The hash comes from the compile cache rather than another compile
+        pushdef = datasift.push.PushDefinition(self.user)
+        pushdef.set_output_type(data.push_output_type)
+        definition = datasift.definition.Definition(self.user, data.definition)
+        pushdef.subscribe_definition(definition, data.push_name, Deadline(5))
+        self.assertEqual(calls, ['compile', 'push/create'])
+
+    def test_expired_deadline(self):
+        calls = []
+
+        def respond(endpoint, params):
+            calls.append(endpoint)
+            return {'response_code': 200, 'data': {},
+                    'rate_limit': 200, 'rate_limit_remaining': 150}
+
+        self.mock_api_client.set_response_callback(respond)
+        deadline = Deadline(0)
+        self.assertTrue(deadline.expired())
+
+        definition = datasift.definition.Definition(self.user, data.definition)
+        self.assertRaises(DeadlineExceededError, definition.compile, deadline)
+        self.assertEqual(calls, [])
+
+    def test_timeout_at_deadline(self):
+        def respond(endpoint, params):
+            time.sleep(self.mock_api_client.get_last_timeout())
+            raise APIError('Request failed: timed out', 503)
+
+        self.mock_api_client.set_response_callback(respond)
+        self.assertRaises(DeadlineExceededError, self.user.call_api, 'usage', {},
+                          Deadline(0.05))
+
+    def test_retries_stop_at_deadline(self):
+        calls = []
+
+        def respond(endpoint, params):
+            calls.append(endpoint)
+            return {'response_code': 502, 'data': {'error': 'Bad gateway'},
+                    'rate_limit': 200, 'rate_limit_remaining': 150}
+
+        self.mock_api_client.set_response_callback(respond)
+        self.user.set_retry_policy(RetryPolicy(base_delay=0.2))
+
+        started = time.time()
+        self.assertRaises(APIError, self.user.call_api, 'usage', {}, Deadline(0.1))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(time.time() - started < 0.1, 'Waited past the deadline')
+
+    def test_client_without_timeouts(self):
+        class OldApiClient(object):
+            def call(self, username, api_key, endpoint, params={}, user_agent=None):
+                return {'response_code': 200, 'data': {'dpu': 10},
+                        'rate_limit': 200, 'rate_limit_remaining': 150}
+
+        self.user.set_api_client(OldApiClient())
+        self.assertEqual(self.user.call_api('usage', {}), {'dpu': 10})
+
+    def test_rate_limit_past_deadline_keeps_token(self):
+        limiter = RateLimiter(window=3600, limit=10)
+        self.user.set_rate_limiter(limiter)
+        limiter.update(10, 0)
+
+        self.assertRaises(DeadlineExceededError, self.user.call_api, 'usage', {},
+                          Deadline(1))
+        self.assertRaises(DeadlineExceededError, self.user.call_api, 'usage', {},
+                          Deadline(1))
+        # Neither rejected call used up any of the budget
+        self.assertTrue(-0.01 < limiter.get_stats()['tokens'] < 0.01)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -371,6 +371,48 @@ class TestDefinition(unittest.TestCase):
 
         self.assertEqual(interactions, response['data']['stream'], 'Buffered interactions are not as expected')
 
+    def test_validate_many(self):
+        def respond(endpoint, params):
+            if params['csdl'] == data.invalid_definition:
+                return {'response_code': 400,
+                        'data': {'error': 'The target interactin.content does not exist'},
+                        'rate_limit': 200, 'rate_limit_remaining': 150}
+
+            return {'response_code': 200,
+                    'data': {'created_at': '2011-12-13 14:15:16', 'dpu': 10},
+                    'rate_limit': 200, 'rate_limit_remaining': 150}
+
+        self.mock_api_client.set_response_callback(respond)
+        results = datasift.definition.Definition.validate_many(
+            self.user, [data.definition, data.invalid_definition, data.definition])
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0].get(), data.definition)
+        self.assertEqual(results[0].get_total_dpu(), 10)
+        self.assertTrue(isinstance(results[1], datasift.exc.CompileFailedError))
+        self.assertEqual(str(results[1]), 'The target interactin.content does not exist')
+        self.assertEqual(results[2].get_created_at(), datetime(2011, 12, 13, 14, 15, 16))
+
+    def test_compile_many_with_empty_definition(self):
+        calls = []
+
+        def respond(endpoint, params):
+            calls.append(params['csdl'])
+            return {'response_code': 200,
+                    'data': {'hash': data.definition_hash,
+                             'created_at': '2011-12-13 14:15:16', 'dpu': 10},
+                    'rate_limit': 200, 'rate_limit_remaining': 150}
+
+        self.mock_api_client.set_response_callback(respond)
+        results = datasift.definition.Definition.compile_many(
+            self.user, [data.definition, '', data.definition])
+
+        # Only the empty definition fails, without an API call
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(results[0].get_hash(), data.definition_hash)
+        self.assertTrue(isinstance(results[1], datasift.exc.InvalidDataError))
+        self.assertEqual(results[2].get_hash(), data.definition_hash)
+
     def test_get_consumer(self):
         response = {
             'response_code': 200,
@@ -0,0 +1,127 @@
+import threading
+import time
+import unittest
+import datasift.user
+from datasift.endpoints import StreamEndpoints
+
+try:
+    from unittest import mock
+
+except ImportError:
+    import mock
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+
+class FastHandler(BaseHTTPRequestHandler):
+
+    delay = 0
+
+    def do_HEAD(self):
+        time.sleep(self.delay)
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class SlowHandler(FastHandler):
+
+    delay = 0.2
+
+
+class TestStreamEndpoints(unittest.TestCase):
+
+    def setUp(self):
+        self.servers = []
+        for handler in (SlowHandler, FastHandler):
+            server = HTTPServer(('127.0.0.1', 0), handler)
+            thread = threading.Thread(target=server.serve_forever, args=(0.01,))
+            thread.daemon = True
+            thread.start()
+            self.servers.append(server)
+
+        self.slow, self.fast = ['127.0.0.1:%d/' % server.server_address[1]
+                                for server in self.servers]
+        self.user = datasift.user.User('fake', 'user', False, 'unused/')
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def test_probe_picks_fastest(self):
+        endpoints = StreamEndpoints(self.user, [self.slow, self.fast])
+        self.assertEqual(endpoints.get_best(), self.slow)
+
+        endpoints.probe()
+        latencies = endpoints.get_latencies()
+        self.assertTrue(sum(latencies[self.slow]) > sum(latencies[self.fast]))
+        self.assertEqual(endpoints.get_best(), self.fast)
+
+    def test_unreachable_endpoint(self):
+        self.servers[1].server_close()
+        endpoints = StreamEndpoints(self.user, [self.fast, self.slow])
+        endpoints.probe()
+        self.assertEqual(endpoints.get_latencies()[self.fast], None)
+        self.assertEqual(endpoints.get_best(), self.slow)
+
+    def test_probe_without_ssl_contexts(self):
+        user = datasift.user.User('fake', 'user', True, 'unused/')
+        endpoints = StreamEndpoints(user, [self.fast])
+        with mock.patch('datasift.endpoints.ssl', object()):
+            endpoints.probe()
+
+        connect_time, first_byte_time = endpoints.get_latencies()[self.fast]
+        self.assertTrue(connect_time >= 0)
+        self.assertEqual(first_byte_time, 0)
+
+    def test_failover(self):
+        endpoints = StreamEndpoints(self.user, [self.slow, self.fast],
+                                    failover_after=2)
+        endpoints.probe()
+        self.assertFalse(endpoints.report_failure(self.fast))
+        endpoints.report_success(self.fast)
+        self.assertFalse(endpoints.report_failure(self.fast))
+        self.assertTrue(endpoints.report_failure(self.fast))
+        self.assertEqual(endpoints.get_best(), self.slow)
+
+        # With nothing left to fail over to, the consumer backs off instead
+        self.assertFalse(endpoints.report_failure(self.slow))
+        self.assertFalse(endpoints.report_failure(self.slow))
+        self.assertEqual(endpoints.get_best(), self.slow)
+
+    def test_user_endpoints(self):
+        user = datasift.user.User('fake', 'user', False, [self.slow, self.fast])
+        try:
+            endpoints = user.get_stream_endpoints()
+            self.assertEqual(endpoints.get_base_urls(), [self.slow, self.fast])
+
+            # Probing starts when the first consumer connects
+            self.assertFalse(endpoints.is_probing())
+            self.assertEqual(user.get_stream_base_url(), self.slow)
+            self.assertTrue(endpoints.is_probing())
+            deadline = time.time() + 2
+            while len(endpoints.get_latencies()) < 2 and time.time() < deadline:
+                time.sleep(0.01)
+
+            self.assertEqual(user.get_stream_base_url(), self.fast)
+            consumer = user.get_multi_consumer(['somehash'], None)
+            self.assertEqual(consumer._get_url(), 'http://%smulti?hashes=somehash' % self.fast)
+
+        finally:
+            user.close()
+
+        self.assertFalse(endpoints.is_probing())
+        self.assertEqual(user.get_stream_base_url(), self.fast)
+        self.assertFalse(endpoints.is_probing())
+        self.assertEqual(datasift.user.User('fake', 'user').get_stream_endpoints(), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import time
+import unittest
+from datasift.tests import data
+import datasift.user
+import datasift.mockapiclient
+from datasift.hedging import HedgePolicy
+from datasift.ratelimit import RateLimiter
+
+
+class TestHedgePolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.user = datasift.user.User(data.username, data.api_key)
+        self.mock_api_client = datasift.mockapiclient.MockApiClient()
+        self.user.set_api_client(self.mock_api_client)
+        self.delays = []
+        self.calls = []
+
+        def respond(endpoint, params):
+            self.calls.append(endpoint)
+            delay = 0.01
+            if self.delays:
+                delay = self.delays.pop(0)
+
+            time.sleep(delay)
+            return {'response_code': 200, 'data': {'delay': delay},
+                    'rate_limit': 10000, 'rate_limit_remaining': 9000}
+
+        self.mock_api_client.set_response_callback(respond)
+
+    def _warm_up(self, policy, endpoint='push/get', samples=5):
+        for i in range(samples):
+            policy.record(endpoint, 0.01)
+
+    def test_slow_call_is_hedged(self):
+        policy = HedgePolicy(min_samples=5, max_ratio=1)
+        self.user.set_hedge_policy(policy)
+        self.assertEqual(self.user.get_hedge_policy(), policy)
+
+        # Not hedged until there are enough samples
+        self.assertEqual(policy.get_delay('push/get'), None)
+        self._warm_up(policy)
+        self.assertTrue(0.009 < policy.get_delay('push/get') < 0.02)
+
+        self.delays = [0.5]
+        started = time.time()
+        res = self.user.call_api('push/get', {'id': data.push_id})
+        elapsed = time.time() - started
+
+        self.assertEqual(res, {'delay': 0.01})
+        self.assertTrue(elapsed < 0.3, 'The call was not hedged (%.3fs)' % elapsed)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(policy.get_stats(), {'calls': 1, 'hedges': 1, 'hedge_wins': 1})
+
+    def test_fast_call_is_not_hedged(self):
+        policy = HedgePolicy(min_samples=5, max_ratio=1)
+        self.user.set_hedge_policy(policy)
+        for i in range(5):
+            policy.record('push/get', 0.2)
+
+        self.user.call_api('push/get', {'id': data.push_id})
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(policy.get_stats()['hedges'], 0)
+
+    def test_writes_are_not_hedged(self):
+        policy = HedgePolicy(min_samples=5, max_ratio=1)
+        self.user.set_hedge_policy(policy)
+        self._warm_up(policy, 'push/stop')
+
+        self.delays = [0.1]
+        self.user.call_api('push/stop', {'id': data.push_id})
+        self.assertEqual(len(self.calls), 1)
+
+    def test_buffered_stream_is_not_hedged(self):
+        policy = HedgePolicy(min_samples=5, max_ratio=1)
+        self.user.set_hedge_policy(policy)
+        self._warm_up(policy, 'stream')
+
+        # A second call would consume a different set of interactions
+        self.delays = [0.1]
+        self.user.call_api('stream', {'hash': data.definition_hash})
+        self.assertEqual(len(self.calls), 1)
+
+    def test_hedges_respect_the_rate_limit(self):
+        policy = HedgePolicy(min_samples=5, max_ratio=1)
+        self.user.set_hedge_policy(policy)
+        self._warm_up(policy)
+
+        limiter = RateLimiter(limit=10000)
+        limiter.update(10000, 1)
+        self.user.set_rate_limiter(limiter)
+
+        # The only token goes on the call itself, so there's none to hedge
+        self.delays = [0.1]
+        self.user.call_api('push/get', {'id': data.push_id})
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(policy.get_stats()['hedges'], 0)
+
+    def test_hedge_ratio_is_capped(self):
+        policy = HedgePolicy(min_samples=5, max_ratio=0.5)
+        self.user.set_hedge_policy(policy)
+        self._warm_up(policy, samples=20)
+
+        # The first slow call would take the hedge ratio over half
+        self.delays = [0.1, 0.1]
+        self.user.call_api('push/get', {'id': data.push_id})
+        self.user.call_api('push/get', {'id': data.push_id})
+        self.assertEqual(policy.get_stats(), {'calls': 2, 'hedges': 1, 'hedge_wins': 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+from datasift.tests import data
+import datasift.user
+import datasift.definition
+import datasift.mockapiclient
+from datasift.push import PushSubscription
+from datasift.exc import APIError, AccessDeniedError
+from datasift.jsonstream import iter_items
+
+
+def split(content, size):
+    content = content.encode('utf-8')
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+
+class TestJsonStream(unittest.TestCase):
+
+    def setUp(self):
+        self.user = datasift.user.User(data.username, data.api_key)
+        self.mock_api_client = datasift.mockapiclient.MockApiClient()
+        self.user.set_api_client(self.mock_api_client)
+
+    def test_iter_items(self):
+        items = [1, -2.5e3, 'text with ] and } and \\" and é', None, True,
+                 {'a': [1, {'b': ']'}]}, [], {}, 123456789]
+        content = json.dumps({'count': 9, 'nested': {'stream': [0]}, 'stream': items})
+
+        # Every chunk size splits items, escapes and UTF-8 sequences differently
+        for size in range(1, 20):
+            self.assertEqual(list(iter_items(split(content, size), 'stream')), items)
+
+        self.assertEqual(list(iter_items(split(json.dumps(items), 3))), items)
+        self.assertEqual(list(iter_items([b' [ ] '])), [])
+        self.assertEqual(list(iter_items([b'{"stream": {"0": "a", "1": "b"}}'], 'stream')),
+                         ['a', 'b'])
+
+    def test_invalid_documents(self):
+        for content in (b'[1, 2', b'[1 2]', b'{"stream": 1}', b'{"stream": [1}', b'',
+                        b'{"stream": [-2.', b'{"stream": [12ab]}', b'{"stream": [{"a" 1}]}'):
+            self.assertRaises(ValueError, list, iter_items([content], 'stream'))
+
+        self.assertRaises(KeyError, list, iter_items([b'{"count": 0}'], 'stream'))
+
+    def test_invalid_item_raises_before_the_end(self):
+        read = []
+
+        def chunks():
+            yield b'[1, {"a" 1}, '
+            while True:
+                read.append(1)
+                yield b'2, ' * 1000
+
+        items = iter_items(chunks())
+        self.assertEqual(next(items), 1)
+        self.assertRaises(ValueError, next, items)
+        self.assertEqual(read, [])
+
+    def test_items_are_parsed_as_they_arrive(self):
+        read = []
+
+        def chunks():
+            for chunk in split(json.dumps([{'id': i} for i in range(100)]), 10):
+                read.append(chunk)
+                yield chunk
+
+        items = iter_items(chunks())
+        self.assertEqual(next(items), {'id': 0})
+        self.assertTrue(len(read) < 3)
+
+    def test_iter_buffered(self):
+        interactions = [{'interaction': {'id': str(i)}} for i in range(50)]
+        self.mock_api_client.set_response({
+            'response_code': 200,
+            'data': {'hash': data.definition_hash, 'created_at': '2011-12-13 14:15:16',
+                     'dpu': 10, 'stream': interactions},
+            'rate_limit': 200, 'rate_limit_remaining': 150})
+
+        definition = datasift.definition.Definition(self.user, data.definition)
+        self.assertEqual(list(definition.iter_buffered(50)), interactions)
+        self.assertEqual(self.user.get_rate_limit_remaining(), 150)
+
+    def test_iter_buffered_without_interactions(self):
+        self.mock_api_client.set_response({
+            'response_code': 200,
+            'data': {'hash': data.definition_hash, 'created_at': '2011-12-13 14:15:16',
+                     'dpu': 10},
+            'rate_limit': 200, 'rate_limit_remaining': 150})
+
+        definition = datasift.definition.Definition(self.user, data.definition)
+        try:
+            list(definition.iter_buffered(50))
+            self.fail('Expected APIError was not raised')
+
+        except APIError as e:
+            self.assertEqual(e.args, ('No data in the response', -1))
+
+    def test_iter_logs(self):
+        self.mock_api_client.set_response({
+            'response_code': 200,
+            'data': {'count': 2, 'log_entries': [{'message': 'a'}, {'message': 'b'}]},
+            'rate_limit': 200, 'rate_limit_remaining': 150})
+
+        self.assertEqual([entry['message'] for entry in PushSubscription.iter_logs(self.user)],
+                         ['a', 'b'])
+
+    def test_errors_raise_before_iterating(self):
+        self.mock_api_client.set_response({
+            'response_code': 401, 'data': {'error': 'Bad credentials'},
+            'rate_limit': 200, 'rate_limit_remaining': 150})
+        self.assertRaises(AccessDeniedError, self.user.iter_api, 'push/log', {})
+
+        self.mock_api_client.set_response({
+            'response_code': 200, 'data': 'not a list',
+            'rate_limit': 200, 'rate_limit_remaining': 150})
+        self.assertRaises(APIError, list, self.user.iter_api('push/log', {}, 'log_entries'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+import threading
+import time
+import unittest
+from datasift.tests import data
+import datasift.user
+import datasift.push
+import datasift.mockapiclient
+from datasift.exc import APIError
+from datasift.paging import PageIterator
+
+
+def subscription(id_):
+    return {'id': id_, 'name': data.push_name, 'created_at': data.push_created_at,
+            'status': data.push_status, 'hash': data.push_hash,
+            'hash_type': data.push_hash_stream_type,
+            'output_type': data.push_output_type, 'output_params': {},
+            'last_request': None, 'last_success': None}
+
+
+class TestPageIterator(unittest.TestCase):
+
+    def setUp(self):
+        self.fetched = []
+        self.lock = threading.Lock()
+
+    def fetch_page(self, count, per_page=10, delay=0):
+        def fetch(page):
+            with self.lock:
+                self.fetched.append(page)
+
+            time.sleep(delay)
+            first = (page - 1) * per_page
+            return list(range(first, min(first + per_page, count))), count
+
+        return fetch
+
+    def test_all_items_in_order(self):
+        for prefetch in (0, 1, 3):
+            self.fetched = []
+            items = PageIterator(self.fetch_page(45), 10, prefetch)
+            self.assertEqual(list(items), list(range(45)))
+            self.assertEqual(items.get_count(), 45)
+            self.assertEqual(sorted(self.fetched), [1, 2, 3, 4, 5])
+
+        self.fetched = []
+        self.assertEqual(list(PageIterator(self.fetch_page(0), 10, 2)), [])
+        self.assertEqual(self.fetched, [1])
+
+    def test_pages_are_prefetched(self):
+        items = PageIterator(self.fetch_page(100, delay=0.05), 10, 2)
+        self.assertEqual(next(items), 0)
+        time.sleep(0.1)
+        self.assertEqual(sorted(self.fetched), [1, 2, 3])
+
+        # The prefetched pages are ready, so they take no waiting
+        start = time.time()
+        for i in range(19):
+            next(items)
+
+        self.assertTrue(time.time() - start < 0.04)
+
+    def test_short_page_without_count(self):
+        def fetch(page):
+            with self.lock:
+                self.fetched.append(page)
+
+            if page == 2:
+                time.sleep(0.1)
+
+            first = (page - 1) * 10
+            return list(range(first, min(first + 10, 25))), None
+
+        # Page 3 arrives short while page 2 is still on its way, so nothing
+        # after it is requested
+        items = PageIterator(fetch, 10, 2)
+        self.assertEqual(list(items), list(range(25)))
+        self.assertEqual(items.get_count(), None)
+        time.sleep(0.05)
+        self.assertEqual(sorted(self.fetched), [1, 2, 3])
+
+    def test_stopping_early(self):
+        items = PageIterator(self.fetch_page(1000), 10, 1)
+        for item in items:
+            if item == 15:
+                break
+
+        time.sleep(0.05)
+        self.assertEqual(sorted(self.fetched), [1, 2, 3])
+
+        items = PageIterator(self.fetch_page(1000), 10, 0)
+        self.assertEqual(next(items), 0)
+        items.close()
+        self.assertRaises(StopIteration, next, items)
+        self.assertEqual(self.fetched[3:], [1])
+
+    def test_errors(self):
+        def fetch(page):
+            if page == 2:
+                raise APIError('Internal error', 500)
+
+            return list(range(10)), 30
+
+        items = PageIterator(fetch, 10, 1)
+        self.assertEqual([next(items) for i in range(10)], list(range(10)))
+        self.assertRaises(APIError, next, items)
+        self.assertRaises(ValueError, PageIterator, fetch, 10, -1)
+
+
+class TestPaging(unittest.TestCase):
+
+    def setUp(self):
+        self.user = datasift.user.User(data.username, data.api_key)
+        self.mock_api_client = datasift.mockapiclient.MockApiClient()
+        self.user.set_api_client(self.mock_api_client)
+        self.calls = []
+
+        def respond(endpoint, params):
+            self.calls.append((endpoint, params['page']))
+            first = (params['page'] - 1) * params['per_page']
+            ids = ['sub%d' % i for i in range(first, min(first + params['per_page'], 25))]
+            if endpoint == 'push/log':
+                res = {'count': 25, 'log_entries': [{'subscription_id': id_} for id_ in ids]}
+
+            else:
+                res = {'count': 25, 'subscriptions': [subscription(id_) for id_ in ids]}
+
+            return {'response_code': 200, 'data': res,
+                    'rate_limit': 200, 'rate_limit_remaining': 150}
+
+        self.mock_api_client.set_response_callback(respond)
+
+    def test_iter_push_subscriptions(self):
+        subscriptions = list(self.user.iter_push_subscriptions(per_page=10, prefetch=2))
+        self.assertEqual([s.get_id() for s in subscriptions], ['sub%d' % i for i in range(25)])
+        self.assertEqual(sorted(self.calls), [('push/get', 1), ('push/get', 2), ('push/get', 3)])
+
+    def test_list_all(self):
+        res = self.user.list_all_push_subscriptions(per_page=5, max_concurrency=4)
+        self.assertEqual(res['count'], 25)
+        self.assertEqual([s.get_id() for s in res['subscriptions']],
+                         ['sub%d' % i for i in range(25)])
+        self.assertEqual(self.calls[0], ('push/get', 1))
+        self.assertEqual(sorted(self.calls), [('push/get', page) for page in range(1, 6)])
+
+        self.calls = []
+        res = datasift.push.PushSubscription.list_all(self.user, per_page=100)
+        self.assertEqual(len(res['subscriptions']), 25)
+        self.assertEqual(self.calls, [('push/get', 1)])
+
+    def test_list_all_errors(self):
+        respond = self.mock_api_client._callback
+
+        def fail(endpoint, params):
+            if params['page'] == 3:
+                return {'response_code': 500, 'data': {'error': 'Internal error'},
+                        'rate_limit': 200, 'rate_limit_remaining': 150}
+
+            return respond(endpoint, params)
+
+        self.mock_api_client.set_response_callback(fail)
+        self.assertRaises(APIError, self.user.list_all_push_subscriptions, 5)
+
+    def test_iter_log(self):
+        pushsub = datasift.push.PushSubscription(self.user, subscription(data.push_id))
+        entries = list(pushsub.iter_log(per_page=20))
+        self.assertEqual(len(entries), 25)
+        self.assertEqual(sorted(self.calls), [('push/log', 1), ('push/log', 2)])
+
+        entries = list(self.user.iter_push_subscription_log(per_page=5, prefetch=0))
+        self.assertEqual(entries[24], {'subscription_id': 'sub24'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -330,6 +330,41 @@ class TestPush(unittest.TestCase):
         self.assertEqual(pushsub.get_output_param('auth.username'), data.push_output_params['auth.username'], 'The subscription auth.username is incorrect')
         self.assertEqual(pushsub.get_output_param('auth.password'), data.push_output_params['auth.password'], 'The subscription auth.password is incorrect')
 
+    def test_get_many(self):
+        def respond(endpoint, params):
+            if params['id'] == 'missing':
+                return {'response_code': 404,
+                        'data': {'error': 'Push subscription not found'},
+                        'rate_limit': 200, 'rate_limit_remaining': 150}
+
+            return {'response_code': 200,
+                    'data': {
+                        'id': params['id'],
+                        'name': data.push_name,
+                        'created_at': data.push_created_at,
+                        'status': data.push_status,
+                        'hash': data.push_hash,
+                        'hash_type': data.push_hash_stream_type,
+                        'output_type': data.push_output_type,
+                        'output_params': {
+                            'output_params.url': data.push_output_params['url'],
+                        },
+                        'last_request': None,
+                        'last_success': None
+                    },
+                    'rate_limit': 200, 'rate_limit_remaining': 150}
+
+        self.mock_api_client.set_response_callback(respond)
+
+        ids = [data.push_id, 'missing', 'another']
+        results = datasift.push.PushSubscription.get_many(self.user, ids, 2)
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0].get_id(), data.push_id, 'The first subscription ID is incorrect')
+        self.assertTrue(isinstance(results[1], datasift.exc.APIError), 'The missing subscription did not fail')
+        self.assertEqual(results[2].get_id(), 'another', 'The third subscription ID is incorrect')
+        self.assertEqual(results[2].get_output_param('url'), data.push_output_params['url'], 'The subscription url is incorrect')
+
     def _populate_pushdef(self, with_invalid_output_params = False):
         self.pushdef.set_output_type(data.push_output_type)
         for key in data.push_output_params:
@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import unittest
+import datasift.user
+from datasift.quarantine import (
+    Quarantine,
+    MemoryDeadLetterStore,
+    FileDeadLetterStore,)
+from datasift.streamconsumer import StreamConsumerEventHandler
+
+
+class RecordingHandler(StreamConsumerEventHandler):
+
+    def __init__(self):
+        self.interactions = 0
+        self.warnings = []
+        self.errors = []
+
+    def on_interaction(self, consumer, interaction, hash_):
+        self.interactions += 1
+
+    def on_warning(self, consumer, msg):
+        self.warnings.append(msg)
+
+    def on_error(self, consumer, msg):
+        self.errors.append(msg)
+
+
+class TestQuarantine(unittest.TestCase):
+
+    def setUp(self):
+        self.user = datasift.user.User('fake', 'user')
+        self.handler = RecordingHandler()
+        self.consumer = self.user.get_multi_consumer(['somehash'], self.handler)
+        self.consumer._state = self.consumer.STATE_RUNNING
+
+    def test_without_quarantine(self):
+        self.consumer._on_data('{"interaction": {"id": 1}')
+        self.assertEqual(len(self.handler.errors), 1)
+        self.assertFalse(self.consumer._is_running())
+
+    def test_bad_frames_quarantined(self):
+        quarantine = Quarantine(max_error_rate=0.1, window=100, min_frames=10)
+        self.consumer.set_quarantine(quarantine)
+        self.consumer._on_data('{"interaction": {"id": 1}')
+        self.consumer._on_data('[1, 2, 3]')
+        self.consumer._on_data('{"hash": "somehash"}')
+        for i in range(20):
+            self.consumer._on_data('{"interaction": {"id": 1}}')
+
+        self.assertTrue(self.consumer._is_running())
+        self.assertEqual(self.handler.errors, [])
+        self.assertEqual(len(self.handler.warnings), 3)
+        self.assertEqual(self.handler.interactions, 20)
+
+        frames = [frame for t, reason, frame in quarantine.get_store().get_frames()]
+        self.assertEqual(frames, ['{"interaction": {"id": 1}', '[1, 2, 3]', '{"hash": "somehash"}'])
+
+        stats = quarantine.get_stats()
+        self.assertEqual(stats['frames'], 23)
+        self.assertEqual(stats['quarantined'], 3)
+
+    def test_error_rate_threshold(self):
+        self.consumer.set_quarantine(Quarantine(max_error_rate=0.5, window=10, min_frames=4))
+        for i in range(3):
+            self.consumer._on_data('garbage')
+
+        self.assertTrue(self.consumer._is_running())
+        self.consumer._on_data('garbage')
+        self.assertFalse(self.consumer._is_running())
+        self.assertEqual(len(self.handler.errors), 1)
+
+    def test_memory_store_bounded(self):
+        store = MemoryDeadLetterStore(max_frames=2)
+        for i in range(5):
+            store.add('frame%d' % i, 'reason')
+
+        self.assertEqual([f for t, r, f in store.get_frames()], ['frame3', 'frame4'])
+
+    def test_file_store(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'dead-letters')
+            store = FileDeadLetterStore(path, max_bytes=200)
+            for i in range(5):
+                store.add('frame%d' % i, 'Failed to decode JSON')
+
+            self.assertTrue(os.path.exists(path + '.1'))
+            self.assertTrue(os.path.getsize(path + '.1') >= 200)
+            frames = [f for t, r, f in store.get_frames()]
+            self.assertTrue(len(frames) < 5)
+            self.assertEqual(frames[-1], 'frame4')
+
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datasift.tests import data
+import datasift.user
+import datasift.mockapiclient
+from datasift.ratelimit import RateLimiter, SharedRateLimiter
+
+
+def call_stub_api(path, calls):
+    """
+    Make API calls against a stub API from a separate process, pacing them
+    with the shared bucket.
+    """
+    user = datasift.user.User(data.username, data.api_key)
+    mock_api_client = datasift.mockapiclient.MockApiClient()
+    mock_api_client.set_response({
+        'response_code': 200,
+        'data': {},
+        'rate_limit': 100,
+        'rate_limit_remaining': 100,
+    })
+    user.set_api_client(mock_api_client)
+    user.set_rate_limiter(SharedRateLimiter(path, data.username, window=1))
+    for i in range(calls):
+        user.call_api('usage', {})
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_unknown_limit_does_not_wait(self):
+        limiter = RateLimiter()
+        self.assertEqual(limiter.get_limit(), None)
+        for i in range(100):
+            self.assertEqual(limiter.reserve(), 0)
+
+        limiter.update(None, None)
+        self.assertEqual(limiter.reserve(), 0)
+
+    def test_paces_once_remaining_runs_out(self):
+        # 100 calls per second
+        limiter = RateLimiter(window=1)
+        limiter.update('100', '2')
+        self.assertEqual(limiter.get_limit(), 100)
+
+        self.assertEqual(limiter.reserve(), 0)
+        self.assertEqual(limiter.reserve(), 0)
+        delays = [limiter.reserve() for i in range(3)]
+        for expected, delay in zip((0.01, 0.02, 0.03), delays):
+            self.assertTrue(expected - 0.005 < delay <= expected, 'Delay %s is not paced' % delay)
+
+        stats = limiter.get_stats()
+        self.assertEqual(stats['waits'], 3)
+        self.assertTrue(stats['tokens'] < 0)
+
+    def test_remaining_caps_tokens(self):
+        limiter = RateLimiter(window=3600, limit=1000)
+        self.assertEqual(limiter.reserve(), 0)
+
+        # Another client used up the budget
+        limiter.update(1000, 0)
+        self.assertTrue(limiter.reserve() > 3, 'The call was not held back')
+
+    def test_threads_share_the_budget_fairly(self):
+        limiter = RateLimiter(window=1)
+        limiter.update(200, 0)
+        finished = []
+
+        def worker(name):
+            for i in range(5):
+                limiter.acquire()
+                finished.append(name)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        started = time.time()
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        elapsed = time.time() - started
+        self.assertTrue(elapsed >= 0.09, 'Calls were not paced (%.3fs)' % elapsed)
+        self.assertEqual(set(finished[:8]), set(range(4)), 'Threads were not served fairly')
+
+    def test_user_paces_calls(self):
+        user = datasift.user.User(data.username, data.api_key)
+        mock_api_client = datasift.mockapiclient.MockApiClient()
+        user.set_api_client(mock_api_client)
+        limiter = RateLimiter(window=1)
+        user.set_rate_limiter(limiter)
+        self.assertEqual(user.get_rate_limiter(), limiter)
+
+        mock_api_client.set_response({
+            'response_code': 200,
+            'data': {},
+            'rate_limit': 50,
+            'rate_limit_remaining': 0,
+        })
+
+        user.call_api('usage', {})
+        self.assertEqual(limiter.get_limit(), 50)
+
+        started = time.time()
+        user.call_api('usage', {})
+        user.call_api('usage', {})
+        self.assertTrue(time.time() - started >= 0.03, 'API calls were not paced')
+
+
+class TestSharedRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'ratelimit.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_instances_share_the_bucket(self):
+        first = SharedRateLimiter(self.path, 'account', window=1)
+        second = SharedRateLimiter(self.path, 'account', window=1)
+        other = SharedRateLimiter(self.path, 'other', window=1)
+
+        first.update(100, 1)
+        self.assertEqual(second.get_limit(), 100)
+        self.assertEqual(other.get_limit(), None)
+
+        self.assertEqual(second.reserve(), 0)
+        self.assertTrue(first.reserve() > 0, 'The bucket is not shared')
+        self.assertEqual(other.reserve(), 0)
+        self.assertEqual(first.get_stats()['waits'], 1)
+
+    def test_processes_share_the_budget(self):
+        # 100 calls per second with an empty bucket, so 4 processes making
+        # 10 calls each must take at least 0.4 seconds between them
+        limiter = SharedRateLimiter(self.path, data.username, window=1)
+        limiter.update(100, 0)
+
+        processes = [multiprocessing.Process(target=call_stub_api, args=(self.path, 10))
+                     for i in range(4)]
+        started = time.time()
+        for process in processes:
+            process.start()
+
+        for process in processes:
+            process.join()
+
+        elapsed = time.time() - started
+        for process in processes:
+            self.assertEqual(process.exitcode, 0)
+
+        self.assertTrue(elapsed >= 0.35, 'Processes overshot the budget (%.3fs)' % elapsed)
+        self.assertTrue(limiter.get_stats()['waits'] > 20, 'Calls were not held back')
+
+if __name__ == '__main__':
+    unittest.main()
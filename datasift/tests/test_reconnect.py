@@ -0,0 +1,78 @@
+import threading
+import time
+import unittest
+from datasift.reconnect import ReconnectScheduler
+
+
+class TestReconnectScheduler(unittest.TestCase):
+
+    def test_delays(self):
+        scheduler = ReconnectScheduler()
+        delay = 0
+        for attempt in range(1, 7):
+            delay = scheduler.next_delay(ReconnectScheduler.EXPONENTIAL, attempt, delay)
+            self.assertTrue(10 <= delay <= 320, 'Delay %s out of bounds' % delay)
+
+        self.assertEqual(scheduler.next_delay(ReconnectScheduler.EXPONENTIAL, 7, delay), None)
+        self.assertEqual(scheduler.next_delay(ReconnectScheduler.IMMEDIATE, 1), 0)
+
+    def test_delays_are_spread(self):
+        scheduler = ReconnectScheduler()
+        delays = set(scheduler.next_delay(ReconnectScheduler.EXPONENTIAL, 2, 10)
+                     for i in range(20))
+        self.assertTrue(len(delays) > 1, 'Delays are not jittered')
+
+    def test_delays_per_kind(self):
+        scheduler = ReconnectScheduler()
+        # A long exponential delay doesn't carry over into linear backoff
+        for i in range(20):
+            delay = scheduler.next_delay(ReconnectScheduler.LINEAR, 1, 320)
+            self.assertEqual(delay, 1)
+
+        for i in range(20):
+            delay = scheduler.next_delay(ReconnectScheduler.EXPONENTIAL, 1, 16)
+            self.assertEqual(delay, 10)
+
+    def test_concurrency_cap_and_priority(self):
+        scheduler = ReconnectScheduler(max_concurrent=1)
+        self.assertTrue(scheduler.acquire(ReconnectScheduler.CONNECT))
+
+        order = []
+
+        def attempt(kind):
+            scheduler.acquire(kind)
+            order.append(kind)
+            scheduler.release()
+
+        threads = [threading.Thread(target=attempt, args=(kind,)) for kind in
+                   (ReconnectScheduler.EXPONENTIAL, ReconnectScheduler.IMMEDIATE)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)
+
+        self.assertEqual(scheduler.get_waiting(), 2)
+        scheduler.release()
+        for thread in threads:
+            thread.join(1)
+
+        self.assertEqual(order, [ReconnectScheduler.IMMEDIATE,
+                                 ReconnectScheduler.EXPONENTIAL])
+        self.assertEqual(scheduler.get_active(), 0)
+
+    def test_cancel(self):
+        scheduler = ReconnectScheduler(max_concurrent=1)
+        scheduler.acquire(ReconnectScheduler.CONNECT)
+        cancel = threading.Event()
+        result = []
+        thread = threading.Thread(target=lambda: result.append(
+            scheduler.acquire(ReconnectScheduler.LINEAR, cancel)))
+        thread.start()
+        cancel.set()
+        scheduler.wake()
+        thread.join(1)
+        self.assertEqual(result, [False])
+        self.assertEqual(scheduler.get_waiting(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
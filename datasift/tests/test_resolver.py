@@ -0,0 +1,113 @@
+import socket
+import threading
+import time
+import unittest
+import datasift.user
+from datasift.tests.test_apiclient import StandInServer
+from datasift.apiclient import PooledApiClient
+from datasift.resolver import DnsCache
+from datasift.tuning import StreamTuning
+
+try:
+    from unittest import mock
+
+except ImportError:
+    import mock
+
+
+class TestDnsCache(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer()
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.01,))
+        self.thread.daemon = True
+        self.thread.start()
+        self.port = self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _wait_for_connections(self, count, timeout=2):
+        deadline = time.time() + timeout
+        while self.server.connections < count and time.time() < deadline:
+            time.sleep(0.01)
+
+    @mock.patch('socket.getaddrinfo', wraps=socket.getaddrinfo)
+    def test_addresses_are_cached(self, getaddrinfo):
+        cache = DnsCache(ttl=0.1)
+        addresses = cache.resolve('localhost', self.port)
+        self.assertEqual(cache.resolve('localhost', self.port), addresses)
+        self.assertEqual(getaddrinfo.call_count, 1)
+        self.assertEqual(cache.get_stats(), {'hits': 1, 'misses': 1, 'size': 1})
+
+        time.sleep(0.1)
+        cache.resolve('localhost', self.port)
+        self.assertEqual(getaddrinfo.call_count, 2)
+
+        sock = cache.create_connection(('127.0.0.1', self.port), 1)
+        sock.close()
+        self.assertEqual(getaddrinfo.call_count, 3)
+
+    def test_failed_connections_forget_addresses(self):
+        # A port that nothing is listening on
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+
+        cache = DnsCache()
+        self.assertRaises(socket.error, cache.create_connection, ('127.0.0.1', port), 1)
+        self.assertEqual(cache.get_stats()['size'], 0)
+
+    def test_prewarm(self):
+        cache = DnsCache()
+        client = PooledApiClient('127.0.0.1:%d/v1/' % self.port, use_ssl=False,
+                                 dns_cache=cache)
+        user = datasift.user.User('user', 'key', use_ssl=False,
+                                  stream_base_url='localhost:%d/' % self.port)
+        user.set_api_client(client)
+        user.set_stream_tuning(StreamTuning())
+        user.set_dns_cache(cache)
+
+        self.assertEqual(user.prewarm(2), {'resolved': 2, 'connections': 2})
+        self.assertEqual(user.get_stream_tuning().dns_cache, cache)
+        self._wait_for_connections(2)
+        self.assertEqual(self.server.connections, 2)
+
+        for i in range(3):
+            user.get_usage()
+
+        self.assertEqual(self.server.connections, 2)
+        self.assertEqual(self.server.requests[0][0], '/v1/usage.json')
+        self.assertEqual(cache.get_stats()['misses'], 2)
+        client.close()
+
+    @mock.patch('socket.getaddrinfo', wraps=socket.getaddrinfo)
+    def test_prewarm_without_tuning(self, getaddrinfo):
+        client = PooledApiClient('127.0.0.1:%d/v1/' % self.port, use_ssl=False,
+                                 dns_cache=DnsCache())
+        user = datasift.user.User('user', 'key', use_ssl=False,
+                                  stream_base_url='localhost:%d/' % self.port)
+        user.set_api_client(client)
+
+        # The default stream connection doesn't use the cache, so only the
+        # API host is looked up
+        self.assertEqual(user.prewarm(0), {'resolved': 1, 'connections': 0})
+        self.assertEqual([call[0][0] for call in getaddrinfo.call_args_list],
+                         ['127.0.0.1'])
+        self.assertEqual(client.get_pool()._dns_cache.get_stats()['size'], 1)
+
+    def test_constructor_flag(self):
+        prewarmed = threading.Event()
+        with mock.patch.object(datasift.user.User, 'prewarm',
+                               lambda user: prewarmed.set()):
+            user = datasift.user.User('user', 'key', use_ssl=False, prewarm=True)
+            self.assertTrue(prewarmed.wait(1))
+
+        self.assertTrue(isinstance(user._api_client, PooledApiClient))
+        self.assertEqual(user._api_client.get_pool()._use_ssl, False)
+        self.assertTrue(isinstance(user.get_dns_cache(), DnsCache))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+import socket
+import time
+import unittest
+from datasift.tests import data
+import datasift.user
+import datasift.mockapiclient
+from datasift.exc import APIError, CircuitOpenError, DeadlineExceededError
+from datasift.retry import CircuitBreaker, RetryPolicy
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.user = datasift.user.User(data.username, data.api_key)
+        self.mock_api_client = datasift.mockapiclient.MockApiClient()
+        self.user.set_api_client(self.mock_api_client)
+        self.calls = []
+
+    def _respond_with(self, *responses):
+        """
+        Respond to each call with the next of the given response codes, or
+        raise the APIError the API client raises for a network error if
+        the code is None.
+        """
+        responses = list(responses)
+
+        def respond(endpoint, params):
+            self.calls.append(endpoint)
+            code = responses.pop(0)
+            if code is None:
+                raise APIError('Request failed: timed out', 503)
+
+            res = {'response_code': code, 'data': {'error': 'Failed'},
+                   'rate_limit': 200, 'rate_limit_remaining': 150}
+            if code == 200:
+                res['data'] = {'dpu': 10}
+
+            elif code == 503:
+                res['retry_after'] = '0.1'
+
+            return res
+
+        self.mock_api_client.set_response_callback(respond)
+
+    def test_retries_reads(self):
+        self.user.set_retry_policy(RetryPolicy(base_delay=0.01, max_delay=0.05))
+        self.assertTrue(isinstance(self.user.get_retry_policy(), RetryPolicy))
+        self._respond_with(None, 502, 200)
+
+        self.assertEqual(self.user.call_api('push/get', {'id': data.push_id}), {'dpu': 10})
+        self.assertEqual(len(self.calls), 3)
+
+    def test_gives_up_after_max_attempts(self):
+        self.user.set_retry_policy(RetryPolicy(max_attempts=2, base_delay=0.01))
+        self._respond_with(None, None)
+
+        self.assertRaises(APIError, self.user.call_api, 'usage', {})
+        self.assertEqual(len(self.calls), 2)
+
+        self._respond_with(500, 500)
+        try:
+            self.user.call_api('usage', {})
+            self.fail('Expected APIError was not raised')
+
+        except APIError as e:
+            self.assertEqual(e.args, ('Failed', 500))
+
+    def test_writes_are_only_retried_on_request(self):
+        self.user.set_retry_policy(RetryPolicy(base_delay=0.01))
+        self._respond_with(502, 200)
+        self.assertRaises(APIError, self.user.call_api, 'push/stop', {'id': data.push_id})
+        self.assertEqual(len(self.calls), 1)
+
+        self.user.set_retry_policy(RetryPolicy(base_delay=0.01, retry_writes=True))
+        self._respond_with(502, 200)
+        self.user.call_api('push/stop', {'id': data.push_id})
+        self.assertEqual(len(self.calls), 3)
+
+    def test_client_errors_are_not_retried(self):
+        self.user.set_retry_policy(RetryPolicy(base_delay=0.01))
+        self._respond_with(400, 200)
+        self.assertRaises(APIError, self.user.call_api, 'validate', {'csdl': data.definition})
+        self.assertEqual(len(self.calls), 1)
+
+    def test_respects_retry_after(self):
+        self.user.set_retry_policy(RetryPolicy(base_delay=0.01, max_delay=1))
+        self._respond_with(503, 200)
+
+        started = time.time()
+        self.user.call_api('usage', {})
+        self.assertTrue(time.time() - started >= 0.1, 'Retry-After was ignored')
+
+    def test_delays_are_jittered(self):
+        policy = RetryPolicy(base_delay=1, max_delay=30)
+        delays = set(policy.next_delay(2) for i in range(20))
+        self.assertTrue(len(delays) > 1, 'Delays are not jittered')
+        for delay in delays:
+            self.assertTrue(1 <= delay <= 6, 'Delay %s out of bounds' % delay)
+
+    def test_circuit_breaker_fails_fast(self):
+        policy = RetryPolicy(max_attempts=1, failure_threshold=2, reset_timeout=0.1)
+        self.user.set_retry_policy(policy)
+        self._respond_with(None, 500, 200, 200)
+
+        self.assertRaises(APIError, self.user.call_api, 'usage', {})
+        self.assertRaises(APIError, self.user.call_api, 'usage', {})
+        self.assertEqual(policy.get_breaker('usage').get_state(), CircuitBreaker.OPEN)
+
+        self.assertRaises(CircuitOpenError, self.user.call_api, 'usage', {})
+        self.assertEqual(len(self.calls), 2)
+
+        # Other endpoints are unaffected
+        self.user.call_api('dpu', {'hash': data.definition_hash})
+
+        time.sleep(0.1)
+        self.user.call_api('usage', {})
+        self.assertEqual(policy.get_breaker('usage').get_state(), CircuitBreaker.CLOSED)
+        self.assertEqual(len(self.calls), 4)
+
+    def test_rate_limited_trial_closes_breaker(self):
+        policy = RetryPolicy(max_attempts=1, failure_threshold=1, reset_timeout=0.05)
+        self.user.set_retry_policy(policy)
+        self._respond_with(500, 429, 200)
+
+        self.assertRaises(APIError, self.user.call_api, 'usage', {})
+        self.assertEqual(policy.get_breaker('usage').get_state(), CircuitBreaker.OPEN)
+
+        # The trial call is rate limited, which still settles it
+        time.sleep(0.05)
+        self.assertRaises(APIError, self.user.call_api, 'usage', {})
+        self.assertEqual(policy.get_breaker('usage').get_state(), CircuitBreaker.CLOSED)
+        self.assertEqual(self.user.call_api('usage', {}), {'dpu': 10})
+
+    def test_trial_raising_other_errors_reopens_breaker(self):
+        policy = RetryPolicy(max_attempts=1, failure_threshold=1, reset_timeout=0.05)
+        breaker = policy.get_breaker('usage')
+
+        def timeout():
+            raise socket.timeout('timed out')
+
+        self.assertRaises(socket.timeout, policy.run, 'usage', timeout)
+        self.assertEqual(breaker.get_state(), CircuitBreaker.OPEN)
+
+        time.sleep(0.05)
+        self.assertRaises(socket.timeout, policy.run, 'usage', timeout)
+        self.assertEqual(breaker.get_state(), CircuitBreaker.OPEN)
+
+        time.sleep(0.05)
+        self.assertEqual(policy.run('usage', lambda: {'response_code': 200}),
+                         {'response_code': 200})
+
+    def test_local_errors_are_not_failures(self):
+        policy = RetryPolicy(max_attempts=1, failure_threshold=1, reset_timeout=0.05)
+        breaker = policy.get_breaker('usage')
+
+        def rejected():
+            raise DeadlineExceededError('The deadline passed waiting for the rate limiter')
+
+        self.assertRaises(DeadlineExceededError, policy.run, 'usage', rejected)
+        self.assertEqual(breaker.get_state(), CircuitBreaker.CLOSED)
+
+        policy.run('usage', lambda: {'response_code': 503})
+        self.assertEqual(breaker.get_state(), CircuitBreaker.OPEN)
+
+        # A trial call rejected locally gives the slot back straight away
+        time.sleep(0.05)
+        self.assertRaises(DeadlineExceededError, policy.run, 'usage', rejected)
+        self.assertEqual(breaker.get_state(), CircuitBreaker.OPEN)
+        self.assertEqual(policy.run('usage', lambda: {'response_code': 200}),
+                         {'response_code': 200})
+        self.assertEqual(breaker.get_state(), CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.get_state(), CircuitBreaker.CLOSED)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import threading
+import time
+import unittest
+from datasift.tests import data
+import datasift.user
+import datasift.definition
+import datasift.mockapiclient
+from datasift.exc import APIError
+from datasift.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def setUp(self):
+        self.user = datasift.user.User(data.username, data.api_key)
+        self.mock_api_client = datasift.mockapiclient.MockApiClient()
+        self.user.set_api_client(self.mock_api_client)
+        self.single_flight = SingleFlight()
+        self.user.set_single_flight(self.single_flight)
+        self.calls = []
+        self.response_code = 200
+
+        def respond(endpoint, params):
+            self.calls.append((endpoint, params))
+            time.sleep(0.2)
+            return {'response_code': self.response_code,
+                    'data': {'hash': data.definition_hash,
+                             'created_at': '2011-12-13 14:15:16', 'dpu': 10,
+                             'error': 'Internal error'},
+                    'rate_limit': 200, 'rate_limit_remaining': 150}
+
+        self.mock_api_client.set_response_callback(respond)
+
+    def _run_threads(self, target, count=10):
+        results = []
+
+        def run():
+            try:
+                results.append(target())
+
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=run) for i in range(count)]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def test_identical_calls_are_shared(self):
+        self.assertEqual(self.user.get_single_flight(), self.single_flight)
+
+        results = self._run_threads(
+            lambda: datasift.definition.Definition(self.user, data.definition).get_hash())
+
+        self.assertEqual(results, [data.definition_hash] * 10)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.single_flight.get_stats(), {'calls': 10, 'coalesced': 9})
+
+    def test_errors_are_shared(self):
+        self.response_code = 500
+        results = self._run_threads(lambda: self.user.call_api('push/get', {'id': data.push_id}))
+
+        self.assertEqual(len(self.calls), 1)
+        for result in results:
+            self.assertTrue(isinstance(result, APIError))
+            self.assertEqual(result.args, ('Internal error', 500))
+
+    def test_results_are_copies(self):
+        results = self._run_threads(lambda: self.user.call_api('push/get', {'id': data.push_id}), 2)
+        results[0]['hash'] = 'changed'
+        self.assertEqual(results[1]['hash'], data.definition_hash)
+
+    def test_different_calls_are_not_shared(self):
+        ids = iter(range(5))
+        self._run_threads(lambda: self.user.call_api('push/get', {'id': next(ids)}), 5)
+        self.assertEqual(len(self.calls), 5)
+
+        self.calls = []
+        self._run_threads(lambda: self.user.call_api('push/stop', {'id': data.push_id}), 5)
+        self.assertEqual(len(self.calls), 5)
+        self.assertEqual(self.single_flight.get_stats(), {'calls': 5, 'coalesced': 0})
+
+    def test_buffered_stream_calls_are_not_shared(self):
+        # Each call consumes its own interactions
+        self._run_threads(lambda: self.user.call_api('stream', {'hash': data.definition_hash}), 3)
+        self.assertEqual(len(self.calls), 3)
+
+    def test_later_calls_are_not_shared(self):
+        self.user.call_api('usage', {})
+        self.user.call_api('usage', {})
+        self.assertEqual(len(self.calls), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import logging
+import unittest
+from datasift.tests import data
+import datasift.user
+import datasift.mockapiclient
+from datasift.exc import APIError
+from datasift.retry import RetryPolicy
+from datasift.stats import ApiStats, Histogram
+
+
+class TestApiStats(unittest.TestCase):
+
+    def setUp(self):
+        self.user = datasift.user.User(data.username, data.api_key)
+        self.mock_api_client = datasift.mockapiclient.MockApiClient()
+        self.user.set_api_client(self.mock_api_client)
+        self.codes = []
+
+        def respond(endpoint, params):
+            code = self.codes.pop(0) if self.codes else 200
+            return {'response_code': code, 'data': {'error': 'Internal error'},
+                    'rate_limit': '200', 'rate_limit_remaining': '150',
+                    'request_bytes': 12, 'wire_bytes': 100, 'decoded_bytes': 400,
+                    'connect_time': None, 'first_byte_time': 0.003}
+
+        self.mock_api_client.set_response_callback(respond)
+
+    def test_histogram(self):
+        histogram = Histogram()
+        self.assertEqual(histogram.get_quantile(0.5), None)
+        for i in range(100):
+            histogram.record(0.0015 if i < 90 else 0.5)
+
+        stats = histogram.get_stats()
+        self.assertEqual(stats['count'], 100)
+        self.assertEqual(stats['p50'], 0.002)
+        self.assertEqual(stats['p95'], 0.5)
+        self.assertEqual(stats['min'], 0.0015)
+        self.assertAlmostEqual(stats['mean'], (90 * 0.0015 + 10 * 0.5) / 100)
+        self.assertEqual(sum(count for bound, count in stats['buckets']), 100)
+
+        histogram.record(1000)
+        self.assertEqual(histogram.get_quantile(1), 1000)
+
+    def test_calls_are_measured(self):
+        self.user.set_retry_policy(RetryPolicy(base_delay=0.001))
+        self.codes = [503, 200]
+        self.user.get_usage()
+        self.codes = [404]
+        self.assertRaises(APIError, self.user.call_api, 'push/get', {'id': 'x'})
+
+        stats = self.user.get_api_stats()
+        self.assertEqual(sorted(stats), ['push/get', 'usage'])
+        self.assertEqual(stats['usage']['calls'], 1)
+        self.assertEqual(stats['usage']['retries'], 1)
+        self.assertEqual(stats['usage']['errors'], 0)
+        self.assertEqual(stats['usage']['request_bytes'], 12)
+        self.assertEqual(stats['usage']['rate_limit_remaining'], 150)
+        self.assertEqual(stats['usage']['first_byte_time']['count'], 1)
+        self.assertEqual(stats['usage']['connect_time']['count'], 0)
+        self.assertEqual(stats['usage']['latency']['count'], 1)
+        self.assertEqual(stats['push/get']['status_codes'], {404: 1})
+        self.assertEqual(stats['push/get']['errors'], 1)
+
+    def test_hook(self):
+        measurements = []
+        self.user.set_api_call_hook(measurements.append)
+        self.assertEqual(self.user.get_api_call_hook(), measurements.append)
+        shared = ApiStats()
+        self.user.set_api_stats(shared)
+
+        self.user.get_usage()
+        self.assertEqual(len(measurements), 1)
+        self.assertEqual(measurements[0]['endpoint'], 'usage')
+        self.assertEqual(measurements[0]['status'], 200)
+        self.assertEqual(measurements[0]['response_bytes'], 100)
+        self.assertTrue(measurements[0]['latency'] >= 0)
+        self.assertEqual(shared.get_stats()['usage']['calls'], 1)
+
+        self.user.set_api_stats(None)
+        self.user.get_usage()
+        self.assertEqual(self.user.get_api_stats(), {})
+        self.assertEqual(len(measurements), 2)
+
+    def test_failing_hook(self):
+        def hook(measurement):
+            raise RuntimeError('Metrics system unavailable')
+
+        self.user.set_api_call_hook(hook)
+        logger = logging.getLogger('datasift.user')
+        logger.disabled = True
+        try:
+            # The hook's exception replaces neither the result nor the error
+            self.assertEqual(self.user.get_usage(), {'error': 'Internal error'})
+            self.codes = [404]
+            self.assertRaises(APIError, self.user.call_api, 'push/get', {'id': 'x'})
+
+        finally:
+            logger.disabled = False
+
+if __name__ == '__main__':
+    unittest.main()
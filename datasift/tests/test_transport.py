@@ -0,0 +1,206 @@
+import codecs
+import json
+import threading
+import unittest
+from datasift.tests import data
+from datasift.tests.test_apiclient import StandInServer, gzip_bytes
+import datasift.user
+import datasift.mockapiclient
+from datasift.apiclient import TransportApiClient
+from datasift.exc import APIError, TransportError
+from datasift.reconnect import ReconnectScheduler
+from datasift.streamconsumer import StreamConsumerEventHandler
+from datasift.streamconsumer_http import StreamConsumer_HTTP_Thread, LinearBackoffError
+from datasift.transport import HttpClientTransport, MemoryTransport, UrllibTransport
+
+
+class CollectingHandler(StreamConsumerEventHandler):
+
+    def __init__(self, stop_after):
+        self.interactions = []
+        self.warnings = []
+        self.errors = []
+        self.stop_after = stop_after
+
+    def on_interaction(self, consumer, interaction, hash_):
+        self.interactions.append(interaction)
+        if len(self.interactions) == self.stop_after:
+            consumer.stop()
+
+    def on_warning(self, consumer, msg):
+        self.warnings.append(msg)
+
+    def on_error(self, consumer, msg):
+        self.errors.append(msg)
+
+
+class DeadEndpointTransport(MemoryTransport):
+
+    def __init__(self, dead_base_url):
+        MemoryTransport.__init__(self)
+        self.dead_base_url = dead_base_url
+
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        if self.dead_base_url in url:
+            self._requests.append((method, url, body, headers))
+            raise TransportError('Connection refused')
+
+        return MemoryTransport.request(self, method, url, body, headers, timeout)
+
+
+class TestTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.user = datasift.user.User(data.username, data.api_key)
+        self.transport = MemoryTransport()
+
+    def test_api_client(self):
+        self.transport.set_response('https://api.datasift.com/usage.json',
+                                    gzip_bytes(b'{"streams": {}}'), 200,
+                                    {'Content-Encoding': 'gzip',
+                                     'X-RateLimit-Limit': '200',
+                                     'X-RateLimit-Remaining': '150'})
+        client = TransportApiClient(self.transport)
+        self.assertEqual(client.get_transport(), self.transport)
+        self.user.set_api_client(client)
+
+        self.assertEqual(self.user.get_usage(), {'streams': {}})
+        self.assertEqual(self.user.get_rate_limit_remaining(), '150')
+        method, url, body, headers = self.transport.get_requests()[0]
+        self.assertEqual((method, body), ('POST', b'period=hour'))
+        self.assertEqual(headers['Auth'], '%s:%s' % (data.username, data.api_key))
+
+        self.assertRaises(APIError, self.user.call_api, 'push/get', {})
+
+    def test_streamed_body(self):
+        entries = [{'id': i} for i in range(100)]
+        content = json.dumps({'count': 100, 'log_entries': entries}).encode('utf-8')
+        self.transport.set_response('https://api.datasift.com/push/log.json',
+                                    [content[i:i + 10] for i in range(0, len(content), 10)])
+        self.user.set_api_client(TransportApiClient(self.transport))
+        self.assertEqual(list(self.user.iter_api('push/log', {}, 'log_entries')), entries)
+
+    def test_stream_consumer(self):
+        self.user.set_api_client(datasift.mockapiclient.MockApiClient())
+        self.user.set_stream_transport(self.transport)
+        self.assertEqual(self.user.get_stream_transport(), self.transport)
+
+        lines = u''.join(u'{"hash": "%s", "data": {"interaction": {"id": %d, "content": "caf\u00e9"}}}\r\n'
+                        % (data.definition_hash, i) for i in range(5)).encode('utf-8')
+        self.transport.set_response('https://stream.datasift.com/multi?hashes=%s' % data.definition_hash,
+                                    [lines[i:i + 7] for i in range(0, len(lines), 7)])
+
+        handler = CollectingHandler(stop_after=3)
+        consumer = self.user.get_multi_consumer([data.definition_hash], handler)
+        consumer._state = consumer.STATE_RUNNING
+        thread = StreamConsumer_HTTP_Thread(consumer, auto_reconnect=False)
+        thread.run()
+
+        self.assertEqual([i['interaction']['id'] for i in handler.interactions], [0, 1, 2])
+        self.assertEqual(handler.interactions[0]['interaction']['content'], u'caf\u00e9')
+        self.assertEqual(self.transport.get_requests()[0][0], 'GET')
+
+        # The end of the body is a disconnection
+        handler = CollectingHandler(stop_after=10)
+        consumer = self.user.get_multi_consumer([data.definition_hash], handler)
+        consumer._state = consumer.STATE_RUNNING
+        StreamConsumer_HTTP_Thread(consumer, auto_reconnect=False).run()
+        self.assertEqual(len(handler.interactions), 5)
+        self.assertTrue('The stream was closed' in handler.warnings[0])
+
+    def test_stream_error_without_newline(self):
+        self.user.set_stream_transport(self.transport)
+        self.transport.set_response('https://stream.datasift.com/multi?hashes=%s' % data.definition_hash,
+                                    b'{"message": "Stream not found"}', 404)
+
+        handler = CollectingHandler(stop_after=1)
+        consumer = self.user.get_multi_consumer([data.definition_hash], handler)
+        consumer._state = consumer.STATE_RUNNING
+        StreamConsumer_HTTP_Thread(consumer).run()
+
+        # The error is reported once, without reconnecting
+        self.assertEqual(handler.errors, ['Stream not found'])
+        self.assertEqual(handler.warnings, [])
+        self.assertEqual(len(self.transport.get_requests()), 1)
+
+    def test_stream_endpoint_failover(self):
+        user = datasift.user.User(data.username, data.api_key, False,
+                                  ['dead.example.com/', 'live.example.com/'])
+        # Without probing the endpoints are tried in the order given
+        user.close()
+        user.set_reconnect_scheduler(ReconnectScheduler(
+            backoff={ReconnectScheduler.LINEAR: (0.01, 0.01, 16)}))
+        transport = DeadEndpointTransport('dead.example.com/')
+        transport.set_response('http://live.example.com/multi?hashes=%s' % data.definition_hash,
+                               ('{"hash": "%s", "data": {"interaction": {"id": 1}}}\r\n'
+                                % data.definition_hash).encode('utf-8'))
+        user.set_stream_transport(transport)
+
+        handler = CollectingHandler(stop_after=1)
+        consumer = user.get_multi_consumer([data.definition_hash], handler)
+        consumer._state = consumer.STATE_RUNNING
+        StreamConsumer_HTTP_Thread(consumer).run()
+
+        # The dead endpoint is retried until it is taken out of rotation,
+        # then the consumer fails over to the live one
+        self.assertEqual([i['interaction']['id'] for i in handler.interactions], [1])
+        self.assertEqual([url.split('/')[2] for method, url, body, headers in
+                          transport.get_requests()],
+                         ['dead.example.com', 'dead.example.com', 'live.example.com'])
+        self.assertTrue('retrying' in handler.warnings[0])
+        self.assertTrue('failing over' in handler.warnings[1])
+
+    def test_stream_lines(self):
+        url = 'https://stream.datasift.com/multi?hashes=%s' % data.definition_hash
+        self.transport.set_response(url, [b'line1\r\nline2\r\nli', b'ne3\r\n'])
+        self.user.set_stream_transport(self.transport)
+        consumer = self.user.get_multi_consumer([data.definition_hash], CollectingHandler(1))
+        thread = StreamConsumer_HTTP_Thread(consumer, auto_reconnect=False)
+        thread._response = self.transport.request('GET', url)
+        thread._decoder = codecs.getincrementaldecoder('utf-8')()
+
+        # Each read returns the next whole line, reading more only when the
+        # buffer holds no complete line
+        self.assertEqual(thread._raw_read_chunk(), 'line1')
+        self.assertEqual(thread._raw_read_chunk(), 'line2')
+        self.assertEqual(thread._buffer, 'li')
+        self.assertEqual(thread._raw_read_chunk(), 'line3')
+        self.assertRaises(LinearBackoffError, thread._raw_read_chunk)
+
+    def test_http_client_transport(self):
+        server = StandInServer()
+        thread = threading.Thread(target=server.serve_forever, args=(0.01,))
+        thread.daemon = True
+        thread.start()
+        try:
+            base_url = '127.0.0.1:%d/v1/' % server.server_address[1]
+            client = TransportApiClient(HttpClientTransport(), base_url, use_ssl=False)
+            res = client.call('user', 'key', 'validate', {'csdl': 'x'})
+            self.assertEqual(res['data'], {'path': '/v1/validate.json', 'params': 'csdl=x'})
+            self.assertEqual(res['rate_limit_remaining'], '9999')
+            self.assertTrue(res['connect_time'] >= 0)
+
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_urllib_transport_raw_socket(self):
+        server = StandInServer()
+        thread = threading.Thread(target=server.serve_forever, args=(0.01,))
+        thread.daemon = True
+        thread.start()
+        try:
+            url = 'http://127.0.0.1:%d/usage.json' % server.server_address[1]
+            resp = UrllibTransport().request('POST', url, b'period=hour')
+            self.assertEqual(resp.status, 200)
+            self.assertTrue(resp.fileno() is not None)
+            # The socket object shared with the standard library is untouched
+            self.assertFalse('recv' in vars(resp._get_raw()))
+            resp.close()
+
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
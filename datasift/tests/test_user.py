@@ -1,3 +1,5 @@
+import threading
+import time
 import unittest
 import json
 from datasift.tests import data
@@ -6,6 +8,12 @@ import datasift.user
 import datasift.exc
 from datasift import mockapiclient
 
+try:
+    from unittest import mock
+
+except ImportError:
+    import mock
+
 
 class TestUser(unittest.TestCase):
 
@@ -136,5 +144,114 @@ class TestUser(unittest.TestCase):
             (e, c) = xxx_todo_changeme2.args
             self.assertEqual(response['data']['error'], e.__str__(), '500 exception message is not as expected')
 
+    def test_call_api_many(self):
+        def respond(endpoint, params):
+            if params['id'] == 3:
+                return {'response_code': 404, 'data': {'error': 'Not found'},
+                        'rate_limit': 200, 'rate_limit_remaining': 150}
+
+            return {'response_code': 200, 'data': {'endpoint': endpoint, 'id': params['id']},
+                    'rate_limit': 200, 'rate_limit_remaining': 150}
+
+        self.mock_api_client.set_response_callback(respond)
+        results = self.user.call_api_many([('push/get', {'id': i}) for i in range(10)],
+                                          max_concurrency=4)
+
+        self.assertEqual(len(results), 10)
+        for i, res in enumerate(results):
+            if i == 3:
+                self.assertTrue(isinstance(res, datasift.exc.APIError))
+                self.assertEqual(res.args, ('Not found', 404))
+
+            else:
+                self.assertEqual(res, {'endpoint': 'push/get', 'id': i})
+
+        self.assertEqual(self.user.call_api_many([]), [])
+
+    def test_rate_limits_after_call_api_many(self):
+        self.mock_api_client.set_response({'response_code': 200, 'data': {},
+                                           'rate_limit': 200, 'rate_limit_remaining': 150})
+        self.user.call_api('usage', {})
+        self.assertEqual(self.user.get_rate_limit_remaining(), 150)
+
+        # Calls made on worker threads are still the last API call
+        self.mock_api_client.set_response({'response_code': 200, 'data': {},
+                                           'rate_limit': 200, 'rate_limit_remaining': 3})
+        self.user.call_api_many([('push/get', {'id': i}) for i in range(4)])
+        self.assertEqual(self.user.get_rate_limit_remaining(), 3)
+        self.assertEqual(self.user.get_thread_rate_limits()['rate_limit_remaining'], 150)
+
+    def test_prepare_historic_missing_field(self):
+        self.mock_api_client.set_response({
+            'response_code': 200,
+            'data': {'dpus': data.historic_dpus, 'availability': {}},
+            'rate_limit': 200,
+            'rate_limit_remaining': 150,
+        })
+        historic = self.user.create_historic(data.definition_hash, data.historic_start_date,
+                                             data.historic_end_date, data.historic_sources,
+                                             data.historic_sample, data.historic_name)
+        try:
+            historic.prepare()
+            self.fail('Expected APIError was not thrown')
+
+        except datasift.exc.APIError as e:
+            self.assertEqual(e.args, ('Unexpected APIError code: -1 [Prepared successfully '
+                                      'but no playback ID in the response]',))
+
+    def test_shared_between_threads(self):
+        def respond(endpoint, params):
+            time.sleep(0.001)
+            return {'response_code': 200, 'data': {'id': params['id']},
+                    'rate_limit': 200, 'rate_limit_remaining': params['id'],
+                    'wire_bytes': 10, 'decoded_bytes': 20}
+
+        self.mock_api_client.set_response_callback(respond)
+        errors = []
+
+        def work(thread_id):
+            for i in range(20):
+                self.user.call_api('push/stop', {'id': thread_id})
+                # Each thread sees the details of its own last call
+                if self.user.get_thread_rate_limits()['rate_limit_remaining'] != thread_id:
+                    errors.append(thread_id)
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(64)]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.user.get_transfer_stats(),
+                         {'wire_bytes': 64 * 20 * 10, 'decoded_bytes': 64 * 20 * 20})
+        # The latest call of any thread, which this one also falls back to
+        self.assertTrue(0 <= self.user.get_rate_limit_remaining() < 64)
+        self.assertEqual(self.user.get_thread_rate_limits(),
+                         {'rate_limit': 200,
+                          'rate_limit_remaining': self.user.get_rate_limit_remaining()})
+
+    def test_api_client_created_once(self):
+        created = []
+
+        class SlowApiClient(mockapiclient.MockApiClient):
+            def __init__(self):
+                time.sleep(0.01)
+                created.append(self)
+                self.set_response({'response_code': 200, 'data': {},
+                                   'rate_limit': 200, 'rate_limit_remaining': 150})
+
+        user = datasift.user.User(data.username, data.api_key)
+        with mock.patch('datasift.user.ApiClient', SlowApiClient):
+            threads = [threading.Thread(target=user.get_usage) for i in range(10)]
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(created), 1)
+
 if __name__ == '__main__':
     unittest.main()
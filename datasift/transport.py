@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import socket
+import time
+from . import urllib_request, HTTPError, URLError
+from .exc import TransportError
+
+try:
+    import http.client as http_client
+
+except ImportError:
+    import httplib as http_client
+
+try:
+    from urllib.parse import urlsplit
+
+except ImportError:
+    from urlparse import urlsplit
+
+try:
+    import ssl
+
+except ImportError:
+    ssl = None
+
+
+#-----------------------------------------------------------------------------
+# The transport interface.
+#-----------------------------------------------------------------------------
+class Transport(object):
+    """
+    A Transport sends HTTP requests for the API clients and stream
+    consumers. Subclasses implement request; UrllibTransport is used unless
+    another is set with TransportApiClient or User.set_stream_transport.
+    """
+
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        """
+        Send a request and return a TransportResponse once the response
+        headers have arrived. Error statuses are returned like any other;
+        TransportError is raised if no response could be received.
+        """
+        raise NotImplementedError()
+
+
+class TransportResponse(object):
+    """
+    A response from a Transport, whose body is a source of bytes that can
+    be read whole or as it arrives. The status is the HTTP status code and
+    headers is a mapping with case-insensitive keys. The connect_time is
+    the time in seconds taken to connect, if the transport knows it.
+    raw_chunked is True if read_some returns the body with its chunked
+    transfer framing still in place.
+    """
+
+    status = None
+    headers = None
+    connect_time = None
+    raw_chunked = False
+
+    def read(self, size=-1):
+        """
+        Read up to size bytes of the body, waiting until that many have
+        arrived or the body has ended. Returns b'' at the end of the body.
+        """
+        raise NotImplementedError()
+
+    def read_some(self, size):
+        """
+        Read up to size bytes of the body, returning as soon as any are
+        available. Returns b'' at the end of the body and raises
+        socket.timeout if nothing arrives within the timeout.
+        """
+        raise NotImplementedError()
+
+    def fileno(self):
+        """
+        Get a file descriptor that select can wait on until read_some has
+        data, or None if the body can't be waited on that way.
+        """
+        return None
+
+    def set_timeout(self, timeout):
+        """
+        Set the timeout of reads from the body.
+        """
+        pass
+
+    def close(self):
+        """
+        Close the response and the connection it came on.
+        """
+        pass
+
+
+class _Headers(dict):
+    """
+    A dict of headers with case-insensitive keys.
+    """
+
+    def __init__(self, headers=None):
+        dict.__init__(self)
+        for key, value in (headers or {}).items():
+            self[key] = value
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key.lower(), value)
+
+    def __getitem__(self, key):
+        return dict.__getitem__(self, key.lower())
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key.lower())
+
+    def get(self, key, default=None):
+        return dict.get(self, key.lower(), default)
+
+
+#-----------------------------------------------------------------------------
+# The UrllibTransport class.
+#-----------------------------------------------------------------------------
+class UrllibTransport(Transport):
+    """
+    A Transport that uses urllib. The opener, if given, is called as
+    opener(request, timeout) to open a urllib request instead of urlopen.
+    urllib chooses the method itself: POST if there is a body, otherwise
+    GET.
+    """
+
+    def __init__(self, opener=None):
+        self._opener = opener
+
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        req = urllib_request.Request(url, body, headers or {})
+        try:
+            if self._opener is None:
+                resp = urllib_request.urlopen(req, None, timeout)
+
+            else:
+                resp = self._opener(req, timeout)
+
+        except HTTPError as err:
+            resp = err
+
+        except URLError as err:
+            raise TransportError(err)
+
+        return _UrllibResponse(resp)
+
+
+class _UrllibResponse(TransportResponse):
+
+    def __init__(self, resp):
+        self._resp = resp
+        self.status = resp.getcode()
+        self.headers = resp.info()
+        self._raw = None
+        self._recv = None
+        self._raw_found = False
+
+    @property
+    def raw_chunked(self):
+        encoding = self.headers.get('Transfer-Encoding') or ''
+        return self._get_raw() is not None and 'chunked' in encoding
+
+    def read(self, size=-1):
+        return self._resp.read(size)
+
+    def read_some(self, size):
+        raw = self._get_raw()
+        if raw is None:
+            return self._resp.read(size)
+
+        return self._recv(size)
+
+    def fileno(self):
+        raw = self._get_raw()
+        if raw is None:
+            return None
+
+        return raw.fileno()
+
+    def set_timeout(self, timeout):
+        raw = self._get_raw()
+        try:
+            raw.settimeout(timeout)
+
+        except AttributeError:
+            pass
+
+    def close(self):
+        # Closing the raw socket first makes the response fail to flush
+        self._resp.close()
+        if self._raw is not None:
+            self._raw.close()
+
+    def _get_raw(self):
+        """
+        Get the raw socket under the response. Both urllib2 and httplib
+        buffer data, which was causing a bug where low throughput streams
+        would appear to not deliver interactions until enough data had been
+        received to trigger a buffer flush. Reading the raw socket directly
+        bypasses that buffering. Python 2 and 3 reach the raw socket, and
+        read from it, differently.
+        """
+        if not self._raw_found:
+            self._raw_found = True
+            try:
+                fp = self._resp.fp
+                if hasattr(fp, 'raw'):
+                    # Python 3, whose raw SocketIO reads with read
+                    self._raw = fp.raw
+                    self._recv = self._raw.read
+
+                else:
+                    self._raw = fp._sock.fp._sock
+                    self._recv = self._raw.recv
+
+            except AttributeError:
+                self._raw = None
+
+        return self._raw
+
+
+#-----------------------------------------------------------------------------
+# The HttpClientTransport class.
+#-----------------------------------------------------------------------------
+class HttpClientTransport(Transport):
+    """
+    A Transport that uses the standard library's http.client (httplib in
+    Python 2) directly, opening a new connection for each request. The body
+    is read through http.client, so chunked transfer framing is removed
+    before read_some returns it.
+    """
+
+    def __init__(self, ssl_context=None):
+        self._ssl_context = ssl_context
+
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        conn = self._connect(parts.scheme, parts.hostname, parts.port, timeout)
+        start = time.time()
+        try:
+            conn.connect()
+            connect_time = time.time() - start
+            conn.request(method, path, body, headers or {})
+            resp = conn.getresponse()
+
+        except (http_client.HTTPException, socket.error) as err:
+            conn.close()
+            raise TransportError(err)
+
+        return _HttpClientResponse(conn, resp, connect_time)
+
+    def _connect(self, scheme, host, port, timeout):
+        if scheme != 'https':
+            return http_client.HTTPConnection(host, port, timeout=timeout)
+
+        if self._ssl_context is None and hasattr(ssl, 'create_default_context'):
+            self._ssl_context = ssl.create_default_context()
+
+        if self._ssl_context is None:
+            return http_client.HTTPSConnection(host, port, timeout=timeout)
+
+        return http_client.HTTPSConnection(host, port, timeout=timeout,
+                                           context=self._ssl_context)
+
+
+class _HttpClientResponse(TransportResponse):
+
+    def __init__(self, conn, resp, connect_time):
+        self._conn = conn
+        self._resp = resp
+        self.status = resp.status
+        self.headers = resp.msg
+        self.connect_time = connect_time
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self._resp.read()
+
+        return self._resp.read(size)
+
+    def read_some(self, size):
+        # read1 returns what has arrived without waiting for more, but only
+        # exists in Python 3.5 and later
+        read1 = getattr(self._resp, 'read1', None)
+        if read1 is None:
+            return self._resp.read(size)
+
+        return read1(size)
+
+    def set_timeout(self, timeout):
+        if self._conn.sock is not None:
+            self._conn.sock.settimeout(timeout)
+
+    def close(self):
+        self._resp.close()
+        self._conn.close()
+
+
+#-----------------------------------------------------------------------------
+# The MemoryTransport class.
+#-----------------------------------------------------------------------------
+class MemoryTransport(Transport):
+    """
+    A Transport that answers requests from responses held in memory,
+    without any network access. Use it to test code that makes API calls or
+    consumes streams, or to measure the cost of parsing apart from the
+    network. Requests for URLs without a response get a 404.
+    """
+
+    def __init__(self):
+        self._responses = {}
+        self._requests = []
+
+    def set_response(self, url, body=b'', status=200, headers=None):
+        """
+        Set the response for a URL. The body is either bytes or an iterable
+        of byte chunks, each of which is returned by its own read_some call
+        as though it had arrived separately.
+        """
+        self._responses[url] = (status, body, headers)
+
+    def get_requests(self):
+        """
+        Get the (method, url, body, headers) tuples of the requests made.
+        """
+        return list(self._requests)
+
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        self._requests.append((method, url, body, headers))
+        if url not in self._responses:
+            return _MemoryResponse(404, [b'{"error": "Not found"}'], None)
+
+        status, body, headers = self._responses[url]
+        if isinstance(body, bytes):
+            body = [body]
+
+        return _MemoryResponse(status, body, headers)
+
+
+class _MemoryResponse(TransportResponse):
+
+    def __init__(self, status, chunks, headers):
+        self.status = status
+        self.headers = _Headers(headers)
+        self._chunks = iter(chunks)
+        self._pending = b''
+
+    def read(self, size=-1):
+        data = self._pending
+        while size is None or size < 0 or len(data) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+
+            data += chunk
+
+        if size is None or size < 0:
+            size = len(data)
+
+        self._pending = data[size:]
+        return data[:size]
+
+    def read_some(self, size):
+        if not self._pending:
+            self._pending = next(self._chunks, b'')
+
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import socket
+import threading
+from . import urllib_request
+
+try:
+    import http.client as http_client
+
+except ImportError:
+    import httplib as http_client
+
+try:
+    import ssl
+
+except ImportError:
+    ssl = None
+
+
+#-----------------------------------------------------------------------------
+# The StreamTuning class.
+#-----------------------------------------------------------------------------
+class StreamTuning(object):
+    """
+    A StreamTuning profile controls the sockets used for stream connections:
+    receive buffer size, TCP keepalive, read size and timeouts. It also keeps
+    the TLS sessions of previous connections so that reconnects can resume
+    them instead of doing a full handshake, and can look hosts up in a
+    DnsCache. Set one on a User to apply it to all of its consumers, or on a
+    single consumer.
+    """
+
+    def __init__(self, rcvbuf=None, keepalive=True, keepalive_idle=30,
+                 keepalive_interval=10, keepalive_count=3, read_size=16384,
+                 connect_timeout=30, receiving_timeout=5,
+                 reuse_tls_sessions=True, ssl_context=None, dns_cache=None):
+        """
+        Initialise a StreamTuning profile. Options the platform doesn't
+        support are silently skipped. TLS sessions can only be resumed with
+        the context that created them, so all connections made with this
+        profile share one SSL context.
+        """
+        self.rcvbuf = rcvbuf
+        self.keepalive = keepalive
+        self.keepalive_idle = keepalive_idle
+        self.keepalive_interval = keepalive_interval
+        self.keepalive_count = keepalive_count
+        self.read_size = read_size
+        self.connect_timeout = connect_timeout
+        self.receiving_timeout = receiving_timeout
+        self.reuse_tls_sessions = reuse_tls_sessions
+        self.dns_cache = dns_cache
+        self._ssl_context = ssl_context
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+        self._opener = None
+
+    def apply(self, sock):
+        """
+        Apply the socket options of this profile to a socket. The receive
+        buffer is only fully effective if this happens before connecting.
+        """
+        if self.rcvbuf is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+
+        if self.keepalive:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            # TCP_KEEPIDLE is called TCP_KEEPALIVE on OS X
+            idle = getattr(socket, 'TCP_KEEPIDLE', getattr(socket, 'TCP_KEEPALIVE', None))
+            for option, value in ((idle, self.keepalive_idle),
+                                  (getattr(socket, 'TCP_KEEPINTVL', None), self.keepalive_interval),
+                                  (getattr(socket, 'TCP_KEEPCNT', None), self.keepalive_count)):
+                if option is not None and value is not None:
+                    sock.setsockopt(socket.IPPROTO_TCP, option, value)
+
+    def create_connection(self, address, timeout=None, source_address=None):
+        """
+        Open a TCP connection to address, applying this profile's options
+        before connecting.
+        """
+        host, port = address
+        if self.dns_cache is None:
+            addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+
+        else:
+            addresses = self.dns_cache.resolve(host, port)
+
+        err = None
+        for family, socktype, proto, canonname, sockaddr in addresses:
+            sock = None
+            try:
+                sock = socket.socket(family, socktype, proto)
+                self.apply(sock)
+                if timeout is not None:
+                    sock.settimeout(timeout)
+
+                if source_address:
+                    sock.bind(source_address)
+
+                sock.connect(sockaddr)
+                return sock
+
+            except socket.error as e:
+                err = e
+                if sock is not None:
+                    sock.close()
+
+        if self.dns_cache is not None:
+            self.dns_cache.forget(host, port)
+
+        if err is not None:
+            raise err
+
+        raise socket.error('getaddrinfo returned an empty list')
+
+    def get_ssl_context(self):
+        """
+        Get the SSL context shared by connections made with this profile, or
+        None if this Python has no SSL contexts.
+        """
+        if self._ssl_context is None and hasattr(ssl, 'create_default_context'):
+            self._ssl_context = ssl.create_default_context()
+
+        return self._ssl_context
+
+    def wrap_tls(self, context, sock, host, port):
+        """
+        Wrap a connected socket in TLS, resuming the last session used for
+        the same host and port when there is one.
+        """
+        session = None
+        if self.reuse_tls_sessions:
+            session = self.get_tls_session(host, port)
+
+        try:
+            tls_sock = context.wrap_socket(sock, server_hostname=host,
+                                           session=session)
+
+        except TypeError:
+            # Sessions can't be passed in before Python 3.6
+            tls_sock = context.wrap_socket(sock, server_hostname=host)
+
+        self.store_tls_session(host, port, tls_sock)
+        return tls_sock
+
+    def get_tls_session(self, host, port):
+        """
+        Get the stored TLS session for the given host and port, if any.
+        """
+        with self._sessions_lock:
+            return self._sessions.get((host, port))
+
+    def store_tls_session(self, host, port, tls_sock):
+        """
+        Remember the TLS session of a socket for later reconnects.
+        """
+        try:
+            session = tls_sock.session
+
+        except (AttributeError, ValueError):
+            # No session support, or the socket has already gone away
+            return
+
+        if self.reuse_tls_sessions and session is not None:
+            with self._sessions_lock:
+                self._sessions[(host, port)] = session
+
+    def open(self, request):
+        """
+        Open a urllib request with connections that use this profile.
+        """
+        if self._opener is None:
+            handlers = [_TunedHTTPHandler(self)]
+            if ssl is not None:
+                handlers.append(_TunedHTTPSHandler(self))
+
+            self._opener = urllib_request.build_opener(*handlers)
+
+        return self._opener.open(request, None, self.connect_timeout)
+
+
+#-----------------------------------------------------------------------------
+# Connection classes and urllib handlers that use a StreamTuning profile.
+#-----------------------------------------------------------------------------
+class _TunedHTTPConnection(http_client.HTTPConnection):
+
+    def __init__(self, host, profile, **kwargs):
+        http_client.HTTPConnection.__init__(self, host, **kwargs)
+        self._profile = profile
+
+    def connect(self):
+        self.sock = self._profile.create_connection(
+            (self.host, self.port), self.timeout,
+            getattr(self, 'source_address', None))
+
+        if getattr(self, '_tunnel_host', None):
+            self._tunnel()
+
+
+class _TunedHTTPSConnection(_TunedHTTPConnection):
+
+    default_port = 443
+
+    def __init__(self, host, profile, context=None, **kwargs):
+        _TunedHTTPConnection.__init__(self, host, profile, **kwargs)
+        if context is None:
+            context = profile.get_ssl_context()
+
+        self._context = context
+
+    def connect(self):
+        _TunedHTTPConnection.connect(self)
+
+        if self._context is None:
+            # Python 2 before 2.7.9 has no SSL contexts
+            self.sock = ssl.wrap_socket(self.sock)
+
+        else:
+            self.sock = self._profile.wrap_tls(self._context, self.sock,
+                                               self.host, self.port)
+
+    def getresponse(self, *args, **kwargs):
+        # TLS 1.3 session tickets arrive after the handshake, so store the
+        # session again once the server has replied. Keep hold of the socket
+        # as the connection drops it if the response closes the connection.
+        sock = self.sock
+        resp = _TunedHTTPConnection.getresponse(self, *args, **kwargs)
+        if sock is not None:
+            self._profile.store_tls_session(self.host, self.port, sock)
+
+        return resp
+
+
+class _TunedHTTPHandler(urllib_request.HTTPHandler):
+
+    def __init__(self, profile):
+        urllib_request.HTTPHandler.__init__(self)
+        self._profile = profile
+
+    def _connection(self, host, **kwargs):
+        return _TunedHTTPConnection(host, self._profile, **kwargs)
+
+    def http_open(self, req):
+        return self.do_open(self._connection, req)
+
+
+class _TunedHTTPSHandler(urllib_request.HTTPSHandler):
+
+    def __init__(self, profile):
+        urllib_request.HTTPSHandler.__init__(self)
+        self._profile = profile
+
+    def _connection(self, host, **kwargs):
+        return _TunedHTTPSConnection(host, self._profile, **kwargs)
+
+    def https_open(self, req):
+        return self.do_open(self._connection, req)
@@ -1,7 +1,20 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
+import json
+import logging
+import socket
+import threading
+import time
 from . import USER_AGENT
-from .exc import APIError, RateLimitExceededError, AccessDeniedError
+from .exc import (
+    APIError,
+    RateLimitExceededError,
+    AccessDeniedError,
+    DeadlineExceededError,
+    InvalidDataError,)
+
+logger = logging.getLogger(__name__)
+
 #-----------------------------------------------------------------------------
 # Check for SSL support.
 #-----------------------------------------------------------------------------
@@ -21,24 +34,74 @@ else:
 class User(object):
     """
     A User instance represents a DataSift user and provides access to all of
-    the API functionality.
+    the API functionality. One instance can be shared by many threads making
+    API calls at once; give it a PooledApiClient so that they share a pool
+    of connections.
     """
 
-    def __init__(self, username, api_key, use_ssl=True, stream_base_url='stream.datasift.com/'):
+    def __init__(self, username, api_key, use_ssl=True, stream_base_url='stream.datasift.com/',
+                 prewarm=False):
         """
-        Initialise a User object with the given username and API key.
+        Initialise a User object with the given username and API key. The
+        stream_base_url may be a list of candidate stream endpoints, in which
+        case they are probed in the background once the first consumer
+        connects, and consumers connect to the fastest healthy one. Call
+        close to stop the probing. If prewarm is True, API calls are made
+        over a PooledApiClient and prewarm is run in the background.
         """
         self._username = username
         self._api_key = api_key
         self._use_ssl = use_ssl
-
-        if not stream_base_url.endswith('/'):
-            stream_base_url += '/'
-
-        self._stream_base_url = stream_base_url
+        self._stream_endpoints = None
+        self._closed = False
+
+        if isinstance(stream_base_url, (list, tuple)):
+            base_urls = [self._normalise_base_url(url) for url in stream_base_url]
+            if len(base_urls) == 0:
+                raise InvalidDataError('Please supply at least one stream base URL')
+
+            stream_base_url = base_urls[0]
+            if len(base_urls) > 1:
+                self._stream_endpoints = StreamEndpoints(self, base_urls)
+
+        self._stream_base_url = self._normalise_base_url(stream_base_url)
+        # Guards the lazily created objects and the totals below, while the
+        # rate limits of each thread's last call are also kept in _local
+        self._lock = threading.Lock()
+        self._local = threading.local()
         self._rate_limit = -1
         self._rate_limit_remaining = -1
+        self._wire_bytes = 0
+        self._decoded_bytes = 0
         self._api_client = None
+        self._rate_limiter = None
+        self._retry_policy = None
+        self._hedge_policy = None
+        self._api_timeouts = {}
+        self._compile_cache = None
+        self._single_flight = None
+        self._response_cache = None
+        self._api_stats = ApiStats()
+        self._api_call_hook = None
+        self._reconnect_scheduler = None
+        self._stream_tuning = None
+        self._stream_transport = None
+        self._dns_cache = None
+
+        if prewarm:
+            self._dns_cache = DnsCache()
+            self._api_client = PooledApiClient(use_ssl=self.use_ssl(),
+                                               dns_cache=self._dns_cache)
+            thread = threading.Thread(target=self.prewarm)
+            thread.daemon = True
+            thread.start()
+
+    @staticmethod
+    def _normalise_base_url(base_url):
+        if not base_url.endswith('/'):
+            base_url += '/'
+
+        return base_url
 
     def get_username(self):
         """
@@ -66,25 +129,338 @@ class User(object):
 
     def get_rate_limit(self):
         """
-        Get the rate limit returned by the last API call, or -1 if no API calls
-        have been made since this object was created.
+        Get the rate limit returned by the last API call, or -1 if no API
+        calls have been made since this object was created.
         """
         return self._rate_limit
 
     def get_rate_limit_remaining(self):
         """
-        Get the rate limit remaining as returned by the last API call, or -1 if
-        no API calls have been made since this object was created.
+        Get the rate limit remaining as returned by the last API call, or -1
+        if no API calls have been made since this object was created.
         """
         return self._rate_limit_remaining
 
+    def get_thread_rate_limits(self):
+        """
+        Get the rate limit and rate limit remaining returned by the last API
+        call made by the calling thread, as a dict. When several threads
+        share this object, the last call overall may have been made by
+        another one. Falls back to get_rate_limit and
+        get_rate_limit_remaining if this thread hasn't made a call.
+        """
+        return {'rate_limit': getattr(self._local, 'rate_limit', self._rate_limit),
+                'rate_limit_remaining': getattr(self._local, 'rate_limit_remaining',
+                                                self._rate_limit_remaining)}
+
+    def get_transfer_stats(self):
+        """
+        Get the total size of the API response bodies received so far, as
+        sent over the wire and after decompression.
+        """
+        with self._lock:
+            return {'wire_bytes': self._wire_bytes,
+                    'decoded_bytes': self._decoded_bytes}
+
     def set_api_client(self, api_client):
         """
         Set the object to be used as the API client. This must be a subclass
-        of the default API client class.
+        of the default API client class, such as PooledApiClient for calls
+        over persistent HTTPS connections.
         """
         self._api_client = api_client
 
+    def get_api_timeout(self, endpoint):
+        """
+        Get the timeout in seconds for calls to an API endpoint.
+        """
+        if endpoint in self._api_timeouts:
+            return self._api_timeouts[endpoint]
+
+        return get_timeout(endpoint)
+
+    def set_api_timeout(self, endpoint, timeout):
+        """
+        Set the timeout in seconds for calls to an API endpoint, overriding
+        the default for that endpoint. Pass None to go back to the default.
+        """
+        if timeout is None:
+            self._api_timeouts.pop(endpoint, None)
+
+        else:
+            self._api_timeouts[endpoint] = timeout
+
+    def get_api_stats(self):
+        """
+        Get the measurements of this user's API calls, as a dict mapping each
+        endpoint called to its totals and histograms. See ApiStats.
+        """
+        if self._api_stats is None:
+            return {}
+
+        return self._api_stats.get_stats()
+
+    def set_api_stats(self, api_stats):
+        """
+        Set the ApiStats collecting the measurements of this user's API
+        calls, which may be shared with other users. Pass None to stop
+        collecting them.
+        """
+        self._api_stats = api_stats
+
+    def get_api_call_hook(self):
+        """
+        Get the function called with the measurements of each API call, or
+        None if there is none.
+        """
+        return self._api_call_hook
+
+    def set_api_call_hook(self, hook):
+        """
+        Set a function to be called with a dict of measurements after each
+        API request, for sending them to a metrics system. The dict has the
+        endpoint, status (None if no response was received), request_bytes,
+        response_bytes, connect_time (None if an existing connection was
+        used or the client can't tell), first_byte_time and latency in
+        seconds, retries and rate_limit_remaining. The hook is called on the
+        calling thread, so it should be quick. An exception raised by the
+        hook is logged and doesn't affect the call. Pass None to remove the
+        hook.
+        """
+        self._api_call_hook = hook
+
+    def get_compile_cache(self):
+        """
+        Get the CompileCache holding the compile and validate results of
+        this user's definitions, or None if they are not cached.
+        """
+        return self._compile_cache
+
+    def set_compile_cache(self, compile_cache):
+        """
+        Set a CompileCache so that definitions with the same CSDL as one
+        already compiled or validated don't need another API call. Pass None
+        to stop caching.
+        """
+        self._compile_cache = compile_cache
+
+    def get_response_cache(self):
+        """
+        Get the ResponseCache serving repeated reads, or None if responses
+        are not cached.
+        """
+        return self._response_cache
+
+    def set_response_cache(self, response_cache):
+        """
+        Set a ResponseCache so that repeated calls to read endpoints are
+        answered locally until their TTL runs out. Pass None to stop caching
+        responses.
+        """
+        self._response_cache = response_cache
+
+    def get_single_flight(self):
+        """
+        Get the SingleFlight sharing identical concurrent API calls, or None
+        if every call makes its own request.
+        """
+        return self._single_flight
+
+    def set_single_flight(self, single_flight):
+        """
+        Set a SingleFlight so that identical calls to read endpoints made at
+        the same time by several threads share one request. Pass None to
+        stop sharing calls.
+        """
+        self._single_flight = single_flight
+
+    def get_rate_limiter(self):
+        """
+        Get the RateLimiter pacing this user's API calls, or None if calls
+        are not paced.
+        """
+        return self._rate_limiter
+
+    def set_rate_limiter(self, rate_limiter):
+        """
+        Set a RateLimiter to pace this user's API calls so that they stay
+        within the rate limit instead of failing once it has been used up.
+        Pass None to stop pacing calls.
+        """
+        self._rate_limiter = rate_limiter
+
+    def get_retry_policy(self):
+        """
+        Get the RetryPolicy used for this user's API calls, or None if failed
+        calls are not retried.
+        """
+        return self._retry_policy
+
+    def set_retry_policy(self, retry_policy):
+        """
+        Set a RetryPolicy to retry API calls that fail because of network or
+        temporary server errors. Pass None to stop retrying calls.
+        """
+        self._retry_policy = retry_policy
+
+    def get_hedge_policy(self):
+        """
+        Get the HedgePolicy used for this user's API calls, or None if calls
+        are not hedged.
+        """
+        return self._hedge_policy
+
+    def set_hedge_policy(self, hedge_policy):
+        """
+        Set a HedgePolicy to send a second request for slow calls to read
+        endpoints. Pass None to stop hedging calls.
+        """
+        self._hedge_policy = hedge_policy
+
+    def get_dns_cache(self):
+        """
+        Get the DnsCache filled by prewarm, or None if prewarm hasn't been
+        run and none has been set.
+        """
+        return self._dns_cache
+
+    def set_dns_cache(self, dns_cache):
+        """
+        Set the DnsCache that prewarm fills and gives to the stream tuning
+        profile.
+        """
+        self._dns_cache = dns_cache
+
+    def prewarm(self, connections=1):
+        """
+        Get ready for the first API call and stream connection ahead of
+        time: resolve the API host and open up to connections pooled API
+        connections, including the TLS handshake. Without an API client a
+        PooledApiClient using the DNS cache is set; other API clients don't
+        keep connections, so only a PooledApiClient can be prewarmed. Stream
+        connections only use the DNS cache through a StreamTuning profile, so
+        the stream hosts are only resolved when the user has one. Failures
+        are not raised, as the calls that follow report them. Returns the
+        number of hosts resolved and of API connections opened.
+        """
+        if self._dns_cache is None:
+            self._dns_cache = DnsCache()
+
+        resolved = 0
+        tuning = self.get_stream_tuning()
+        if tuning is not None:
+            if tuning.dns_cache is None:
+                tuning.dns_cache = self._dns_cache
+
+            base_urls = [self._stream_base_url]
+            if self._stream_endpoints is not None:
+                base_urls = self._stream_endpoints.get_base_urls()
+
+            for base_url in base_urls:
+                netloc = base_url.split('/', 1)[0]
+                port = 443 if self.use_ssl() else 80
+                if ':' in netloc:
+                    netloc, port = netloc.rsplit(':', 1)
+                    port = int(port)
+
+                try:
+                    tuning.dns_cache.resolve(netloc, port)
+                    resolved += 1
+
+                except socket.error:
+                    pass
+
+        with self._lock:
+            if self._api_client is None:
+                self._api_client = PooledApiClient(use_ssl=self.use_ssl(),
+                                                   dns_cache=self._dns_cache)
+
+            api_client = self._api_client
+
+        opened = 0
+        if isinstance(api_client, PooledApiClient):
+            if api_client.get_pool().resolve():
+                resolved += 1
+
+            opened = api_client.get_pool().prewarm(connections)
+
+        return {'resolved': resolved, 'connections': opened}
+
+    def get_stream_base_url(self):
+        """
+        Get the base URL for a new stream connection. With several candidate
+        endpoints this is the fastest healthy one.
+        """
+        if self._stream_endpoints is not None:
+            if not self._closed:
+                self._stream_endpoints.start()
+
+            return self._stream_endpoints.get_best()
+
+        return self._stream_base_url
+
+    def close(self):
+        """
+        Stop the background probing of the stream endpoints. Consumers that
+        connect afterwards use the results of the last probe.
+        """
+        self._closed = True
+        if self._stream_endpoints is not None:
+            self._stream_endpoints.stop()
+
+    def get_stream_endpoints(self):
+        """
+        Get the StreamEndpoints object managing the candidate stream
+        endpoints, or None if this user has a single stream base URL.
+        """
+        return self._stream_endpoints
+
+    def get_reconnect_scheduler(self):
+        """
+        Get the ReconnectScheduler shared by all stream consumers of this
+        user, creating the default one if none has been set.
+        """
+        with self._lock:
+            if self._reconnect_scheduler is None:
+                self._reconnect_scheduler = ReconnectScheduler()
+
+            return self._reconnect_scheduler
+
+    def set_reconnect_scheduler(self, scheduler):
+        """
+        Set the ReconnectScheduler used by the stream consumers of this user.
+        """
+        self._reconnect_scheduler = scheduler
+
+    def get_stream_transport(self):
+        """
+        Get the Transport used by the stream consumers of this user, or None
+        if they use the default urllib one.
+        """
+        return self._stream_transport
+
+    def set_stream_transport(self, transport):
+        """
+        Set the Transport used by the stream consumers of this user. A
+        StreamTuning profile only applies to the default transport. Pass None
+        to go back to the default.
+        """
+        self._stream_transport = transport
+
+    def get_stream_tuning(self):
+        """
+        Get the StreamTuning profile used by the stream consumers of this
+        user, or None if the default connection settings are used.
+        """
+        return self._stream_tuning
+
+    def set_stream_tuning(self, tuning):
+        """
+        Set the StreamTuning profile used by the stream consumers of this
+        user. Pass None to go back to the default connection settings.
+        """
+        self._stream_tuning = tuning
+
     def get_usage(self, period='hour'):
         """
         Get usage data for this user.
@@ -117,6 +493,20 @@ class User(object):
         """
         return Historic.list(self, page, per_page)
 
+    def list_all_historics(self, per_page=20, max_concurrency=8):
+        """
+        Get all of the Historics queries in your account, fetching the pages
+        after the first concurrently.
+        """
+        return Historic.list_all(self, per_page, max_concurrency)
+
+    def iter_historics(self, per_page=20, prefetch=1):
+        """
+        Iterate over all of the Historics queries in your account, fetching
+        up to prefetch pages ahead in the background.
+        """
+        return Historic.iter_list(self, per_page, prefetch)
+
     def create_push_definition(self):
         """
         Create a new Push definition for this user.
@@ -148,6 +538,41 @@ class User(object):
         return PushSubscription.list(self, page, per_page, order_by, order_dir,
                                      include_finished, hash_type, hash_)
 
+    def list_all_push_subscriptions(self, per_page=20, order_by=None,
+                                    order_dir=None, include_finished=False,
+                                    hash_type=None, hash_=None,
+                                    max_concurrency=8):
+        """
+        Get all of the Push subscriptions in your account, fetching the
+        pages after the first concurrently.
+        """
+        return PushSubscription.list_all(self, per_page, order_by, order_dir,
+                                         include_finished, hash_type, hash_,
+                                         max_concurrency)
+
+    def iter_push_subscription_log(self, subscription_id=False, per_page=20,
+                                   prefetch=1):
+        """
+        Iterate over the logs for all Push subscriptions or the given
+        subscription, fetching up to prefetch pages ahead in the background.
+        """
+        if subscription_id is False:
+            subscription_id = None
+
+        return PushSubscription.iter_all_logs(self, per_page, None, None,
+                                              subscription_id, prefetch)
+
+    def iter_push_subscriptions(self, per_page=20, order_by=None,
+                                order_dir=None, include_finished=False,
+                                hash_type=None, hash_=None, prefetch=1):
+        """
+        Iterate over all of the Push subscriptions in your account, fetching
+        up to prefetch pages ahead in the background.
+        """
+        return PushSubscription.iter_list(self, per_page, order_by, order_dir,
+                                          include_finished, hash_type, hash_,
+                                          prefetch)
+
     def get_consumer(self, hash_, event_handler, consumer_type='http'):
         """
         Get a StreamConsumer object for the given hash via the given consumer
@@ -171,18 +596,262 @@ class User(object):
         """
         return USER_AGENT
 
-    def call_api(self, endpoint, params):
+    def call_api(self, endpoint, params, deadline=None):
+        """
+        Make a call to a DataSift API endpoint. If a Deadline is given the
+        call, including any retries, gives up with DeadlineExceededError
+        once it has passed.
+        """
+        generation = None
+        if self._response_cache is not None:
+            data = self._response_cache.get(endpoint, params)
+            if data is not None:
+                return data
+
+            generation = self._response_cache.get_generation(endpoint, params)
+
+        if self._single_flight is not None:
+            return self._single_flight.run(
+                endpoint, params,
+                lambda: self._call_api(endpoint, params, deadline, generation),
+                deadline, generation)
+
+        return self._call_api(endpoint, params, deadline, generation)
+
+    def _call_api(self, endpoint, params, deadline=None, generation=None):
         """
-        Make a call to a DataSift API endpoint.
+        Make a call to a DataSift API endpoint and update the response
+        cache. The response is only cached if nothing has changed it since
+        the given generation of the cache.
         """
-        if self._api_client is None:
-            self._api_client = ApiClient()
+        attempts = {'count': 0, 'res': None}
+        start = time.time()
+        try:
+            data = self._handle_response(self._request(endpoint, params, deadline,
+                                                       attempts))
+
+        finally:
+            if self._response_cache is not None:
+                # Even a failed change may have been applied
+                self._response_cache.invalidate(endpoint, params)
+
+            if self._api_stats is not None or self._api_call_hook is not None:
+                self._record_call(endpoint, attempts, time.time() - start)
+
+        if self._response_cache is not None:
+            self._response_cache.put(endpoint, params, data, generation)
 
-        res = self._api_client.call(self.get_username(), self.get_api_key(),
-                                    endpoint, params, self.get_useragent())
+        return data
+
+    def _request(self, endpoint, params, deadline=None, attempts=None):
+        """
+        Get the API client's response to a call, retrying it if there is a
+        retry policy.
+        """
+        try:
+            if self._retry_policy is None:
+                return self._call_client(endpoint, params, deadline, attempts)
+
+            return self._retry_policy.run(
+                endpoint,
+                lambda: self._call_client(endpoint, params, deadline, attempts),
+                deadline)
+
+        except APIError:
+            if deadline is not None and deadline.expired():
+                # The request timed out because the deadline was near
+                raise DeadlineExceededError('The deadline passed during a call to %s' % endpoint)
+
+            raise
+
+    def call_api_many(self, calls, max_concurrency=8):
+        """
+        Make several independent API calls concurrently, using up to
+        max_concurrency threads. Takes a list of (endpoint, params) tuples and
+        returns a list of their results in the same order. The result of a
+        call that failed is the exception it raised. Use a PooledApiClient so
+        that the calls share connections.
+        """
+        return map_concurrent(lambda call: self.call_api(call[0], call[1]),
+                              calls, max_concurrency)
+
+    def _call_client(self, endpoint, params, deadline=None, attempts=None):
+        """
+        Make a single attempt at an API call, waiting for the rate limiter
+        first if there is one. The attempts dict, if given, counts the
+        attempts and holds the last response.
+        """
+        if attempts is not None:
+            attempts['count'] += 1
+            attempts['res'] = None
+
+        self._wait_for_rate_limiter(endpoint, deadline)
+        timeout = self._api_timeouts.get(endpoint)
+        if deadline is not None:
+            timeout = deadline.get_timeout(self.get_api_timeout(endpoint))
+
+        # The timeout is only passed when one was set, so API clients whose
+        # call doesn't take one keep working and use their own defaults
+        kwargs = {}
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+
+        api_client = self._get_api_client()
+
+        def request():
+            return api_client.call(self.get_username(), self.get_api_key(),
+                                   endpoint, params, self.get_useragent(),
+                                   **kwargs)
+
+        if self._hedge_policy is not None and self._hedge_policy.is_hedged(endpoint):
+            res = self._hedge_policy.run(self, endpoint, request)
+
+        else:
+            res = request()
+
+        if attempts is not None:
+            attempts['res'] = res
+
+        return res
+
+    def _record_call(self, endpoint, attempts, latency):
+        """
+        Pass the measurements of an API call to the ApiStats and the call
+        hook.
+        """
+        res = attempts['res'] or {}
+        rate_limit_remaining = res.get('rate_limit_remaining')
+        try:
+            rate_limit_remaining = int(rate_limit_remaining)
+
+        except (TypeError, ValueError):
+            rate_limit_remaining = None
+
+        measurement = {
+            'endpoint': endpoint,
+            'status': res.get('response_code'),
+            'request_bytes': res.get('request_bytes'),
+            'response_bytes': res.get('wire_bytes'),
+            'connect_time': res.get('connect_time'),
+            'first_byte_time': res.get('first_byte_time'),
+            'latency': latency,
+            'retries': max(0, attempts['count'] - 1),
+            'rate_limit_remaining': rate_limit_remaining,
+        }
+
+        if self._api_stats is not None:
+            self._api_stats.record(measurement)
+
+        if self._api_call_hook is not None:
+            # This runs while the call's result or error is on its way out,
+            # so the hook mustn't replace it
+            try:
+                self._api_call_hook(measurement)
+
+            except Exception:
+                logger.exception('The API call hook failed for %s', endpoint)
+
+    def _wait_for_rate_limiter(self, endpoint, deadline=None):
+        """
+        Wait until the rate limiter, if there is one, allows another call.
+        """
+        if self._rate_limiter is None:
+            return
+
+        delay = self._rate_limiter.reserve()
+        if deadline is not None and delay > deadline.remaining():
+            # The call won't be made, so its token can go to another
+            self._rate_limiter.cancel()
+            raise DeadlineExceededError('The rate limit allows no call to %s before the deadline' % endpoint)
+
+        if delay > 0:
+            time.sleep(delay)
+
+    def iter_api(self, endpoint, params, key=None):
+        """
+        Make a call to a DataSift API endpoint whose response holds a large
+        list, and return an iterator over the items of the list that parses
+        each one as it arrives instead of reading the whole response first.
+        The list is the whole response, or the value of the given key in it,
+        which must be present. An error response raises here, before any
+        items are returned. The call is paced by the rate limiter, but is
+        not retried, shared or cached. Close the iterator to stop reading
+        before the end.
+        """
+        self._wait_for_rate_limiter(endpoint)
+        res = self._get_api_client().call_stream(
+            self.get_username(), self.get_api_key(), endpoint, params,
+            self.get_useragent(), self.get_api_timeout(endpoint))
+        body = res.pop('body')
+        if not 200 <= res['response_code'] <= 299:
+            content = b''.join(body)
+            res['data'] = {}
+            if len(content) > 0:
+                try:
+                    res['data'] = json.loads(content.decode('utf-8'))
+
+                except ValueError:
+                    pass
+
+            self._handle_response(res)
+
+        res['data'] = None
+        self._handle_response(res)
+        return self._iter_items(body, key, res['response_code'])
+
+    @staticmethod
+    def _iter_items(body, key, response_code):
+        try:
+            for item in iter_items(body, key):
+                yield item
+
+            # Read the rest of the body so the connection can be reused
+            for chunk in body:
+                pass
+
+        except ValueError as err:
+            raise APIError('Failed to decode the response: %s' % err, response_code)
+
+        except KeyError:
+            raise APIError('No data in the response', -1)
+
+        finally:
+            close = getattr(body, 'close', None)
+            if close is not None:
+                close()
+
+    def _get_api_client(self):
+        """
+        Get the API client, creating the default one if none has been set.
+        """
+        api_client = self._api_client
+        if api_client is None:
+            with self._lock:
+                if self._api_client is None:
+                    self._api_client = ApiClient()
+
+                api_client = self._api_client
+
+        return api_client
+
+    def _handle_response(self, res):
+        """
+        Record the rate limit details from an API client response and return
+        its data, raising the appropriate exception for an error response.
+        """
+        rate_limit = res['rate_limit']
+        rate_limit_remaining = res['rate_limit_remaining']
+        self._local.rate_limit = rate_limit
+        self._local.rate_limit_remaining = rate_limit_remaining
+        with self._lock:
+            self._rate_limit = rate_limit
+            self._rate_limit_remaining = rate_limit_remaining
+            if 'wire_bytes' in res:
+                self._wire_bytes += res['wire_bytes']
+                self._decoded_bytes += res['decoded_bytes']
 
-        self._rate_limit = res['rate_limit']
-        self._rate_limit_remaining = res['rate_limit_remaining']
+        if self._rate_limiter is not None:
+            self._rate_limiter.update(rate_limit, rate_limit_remaining)
 
         if 200 <= res['response_code'] <= 299:
             retval = res['data']
@@ -196,7 +865,7 @@ class User(object):
 
         else:
             if res['response_code'] == 403:
-                if self._rate_limit_remaining == 0:
+                if rate_limit_remaining == 0:
                     raise RateLimitExceededError(res['data']['comment'])
 
             errmsg = 'Unknown error (%d)' % res['response_code']
@@ -210,6 +879,12 @@ class User(object):
 
 from .definition import Definition
 from .historic import Historic
-from .apiclient import ApiClient
+from .apiclient import ApiClient, PooledApiClient, get_timeout
+from .reconnect import ReconnectScheduler
+from .endpoints import StreamEndpoints
+from .workers import map_concurrent
+from .jsonstream import iter_items
+from .stats import ApiStats
+from .resolver import DnsCache
 from .streamconsumer import StreamConsumer
 from .push import PushDefinition, PushSubscription
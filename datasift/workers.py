@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import threading
+
+
+def map_concurrent(func, items, max_concurrency=8):
+    """
+    Call func for each of the items using up to max_concurrency threads.
+    Returns the results in the order of the items. If a call raises an
+    exception, the exception object takes the place of its result.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    if not items:
+        return results
+
+    lock = threading.Lock()
+    indexes = iter(range(len(items)))
+
+    def worker():
+        while True:
+            with lock:
+                index = next(indexes, None)
+
+            if index is None:
+                return
+
+            try:
+                results[index] = func(items[index])
+
+            except Exception as e:
+                results[index] = e
+
+    threads = [threading.Thread(target=worker)
+               for i in range(min(max_concurrency, len(items)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return results
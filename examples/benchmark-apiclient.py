@@ -0,0 +1,71 @@
+# encoding: utf-8
+
+# This script compares the per-call latency of the default ApiClient, which
+# opens a new connection for every call, with the PooledApiClient, which
+# keeps connections alive. Both talk to a local stand-in for the API so the
+# numbers reflect connection handling rather than the real API.
+#
+# Usage: python benchmark-apiclient.py [calls]
+
+from __future__ import print_function
+import json
+import sys
+import threading
+import time
+import datasift.apiclient
+from datasift.apiclient import ApiClient, PooledApiClient
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send headers and body without waiting for delayed ACKs
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = json.dumps({'hash': '947b690ec9dca525fb8724645e088d79',
+                           'created_at': '2011-12-13 14:15:16',
+                           'dpu': 10}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def timed(client, calls):
+    started = time.time()
+    for i in range(calls):
+        client.call('username', 'api_key', 'compile', {'csdl': 'interaction.content contains "datasift"'})
+
+    return (time.time() - started) / calls
+
+
+calls = 500
+if len(sys.argv) > 1:
+    calls = int(sys.argv[1])
+
+server = HTTPServer(('127.0.0.1', 0), StandInHandler)
+thread = threading.Thread(target=server.serve_forever)
+thread.daemon = True
+thread.start()
+
+base_url = '127.0.0.1:%d/' % server.server_address[1]
+# The default client always talks to API_BASE_URL over plain HTTP
+datasift.apiclient.API_BASE_URL = base_url
+
+default = timed(ApiClient(), calls)
+pooled = timed(PooledApiClient(base_url, use_ssl=False), calls)
+
+print('Calls per client: %d' % calls)
+print('ApiClient:        %.3f ms per call' % (default * 1000))
+print('PooledApiClient:  %.3f ms per call' % (pooled * 1000))
+print('Speed-up:         %.1fx' % (default / pooled))